@@ -1,16 +1,22 @@
 import argparse
 import json
 import os
+import signal
 import sys
 import time
 
-from .src import Compiler, CompilerOptions, errors, plugin
+from . import client
 
 DEFAULT_FILE_NAME = "__stdin__.py"
 PROG_NAME = "python-compiler"
+# arguments which don't change the output, so they aren't sent to a daemon
+CLIENT_ARGUMENTS = ["input", "output", "output_dir", "json", "watch",
+                    "watch_interval", "daemon", "socket", "local", "bytecode"]
 
 
 def format_error(name: str, msg: str, output_json: bool = False):
+    # imported here so that forwarding to a daemon doesn't import the compiler
+    from .src import errors
     if output_json:
         return json.dumps({
             "error": True,
@@ -21,20 +27,290 @@ def format_error(name: str, msg: str, output_json: bool = False):
         return f"{errors._terminal_colors.BOLD}{PROG_NAME}: error({errors._terminal_colors.FAIL}{name}{errors._terminal_colors.ENDC}{errors._terminal_colors.BOLD}):{errors._terminal_colors.ENDC} {msg}"
 
 
-def format_compiler_error(error: errors.CompilerError, output_json: bool = False):
+def format_compiler_error(error, output_json: bool = False):
     return format_error(error.errcode, str(error), output_json)
 
 
+def report_compression(merged: str, output_json: bool = False):
+    # generated code never starts with a comment, so only import the compiler
+    # for outputs which can be compressed stubs
+    if not merged.startswith("# "):
+        return
+    from .src.plugin import compress
+    sizes = compress.read_sizes(merged)
+    if sizes is None:
+        return
+    plain_size, compressed_size = sizes
+    if output_json:
+        print(json.dumps({
+            "plain_size": plain_size,
+            "compressed_size": compressed_size,
+            "output_size": len(merged.encode())
+        }), file=sys.stderr)
+    else:
+        print(f"{PROG_NAME}: compressed {plain_size} bytes of code to {compressed_size} "
+              f"({compressed_size / max(plain_size, 1):.1%}), {len(merged.encode())} bytes with the stub",
+              file=sys.stderr)
+
+
+def report_minify(reports: list[dict], output_json: bool = False):
+    for report in reports:
+        if report["verify_ms"] is None:
+            continue
+        if output_json:
+            print(json.dumps(report), file=sys.stderr)
+        else:
+            print(f"{PROG_NAME}: verified {report['verified_statements']} of {report['total_statements']} "
+                  f"top-level statements of the minified code ({report['verify']}) in {report['verify_ms']:.1f}ms",
+                  file=sys.stderr)
+
+
+def finish(compiler, output_json: bool = False):
+    """ waits for work plugins deferred until the output was written """
+    from .src import plugin
+    compiler.finish()
+    for item in compiler.options.plugins:
+        if isinstance(item, plugin.MinifyPlugin):
+            report_minify(item.report(), output_json)
+
+
+def write_output(output, merged: str, output_json: bool = False, optimize: int | None = None):
+    report_compression(merged, output_json)
+    if optimize is not None:
+        # write the output next to the file, which becomes its launcher
+        from .src import bytecode
+        merged = bytecode.write_bytecode(merged, output.name, optimize)
+    if output.name != "<stdout>":
+        # rewrite the whole file when rebuilding in watch mode
+        output.seek(0)
+        output.truncate()
+    if output_json and output.name == "<stdout>":
+        output.write(json.dumps({
+            "output": merged
+        }))
+    else:
+        output.write(merged)
+    output.flush()
+
+
+def watch(compiler, output, interval: float, output_json: bool = False, optimize: int | None = None):
+    from .src import errors, plugin
+    failed_stamps = None
+    while True:
+        time.sleep(interval)
+        changed = compiler.poll()
+        if len(changed) == 0:
+            continue
+        # don't retry a failed build until something changes again
+        stamps = [(path, os.stat(path).st_mtime_ns if os.path.exists(path) else None)
+                  for path in changed]
+        if stamps == failed_stamps:
+            continue
+        start = time.perf_counter()
+        try:
+            merged = compiler()
+            write_output(output, merged, output_json, optimize)
+            finish(compiler, output_json)
+        except errors.CompilerError as err:
+            failed_stamps = stamps
+            print(format_compiler_error(err, output_json), file=sys.stderr)
+            continue
+        except plugin.constants.AssignmentToConstantError as err:
+            failed_stamps = stamps
+            print(format_error("assignment-to-constant",
+                  str(err), output_json), file=sys.stderr)
+            continue
+        failed_stamps = None
+        elapsed = (time.perf_counter() - start) * 1000
+        if output_json:
+            print(json.dumps({
+                "rebuilt": changed,
+                "ms": elapsed
+            }), file=sys.stderr)
+        else:
+            print(f"{PROG_NAME}: rebuilt {len(changed)} changed module(s) in {elapsed:.1f}ms",
+                  file=sys.stderr)
+
+
+def create_options(args: argparse.Namespace):
+    from .src import CompilerOptions, plugin
+    constants: dict[str, bool | str | int | float] = {
+        "__COMPILED__": True
+    }
+    for [constant_name, constant_value] in args.define_constant:
+        if constant_value.lower() == "true":
+            constants[constant_name] = True
+        elif constant_value.lower() == "false":
+            constants[constant_name] = False
+        else:
+            try:
+                if "." in constant_value:
+                    constants[constant_name] = float(constant_value)
+                else:
+                    constants[constant_name] = int(constant_value)
+            except ValueError:
+                constants[constant_name] = constant_value
+    for [constant_name] in args.define:
+        constants[constant_name] = 1
+    current_time = (" at %s" % time.strftime(
+        "%a, %d %b %Y %H:%M:%S", time.localtime())) if args.time else ""
+    plugins: list[plugin.Plugin] = []
+    plugins.append(plugin.ConstantsPlugin(constants=constants))
+    plugins.append(plugin.SimplifyIfPlugin())
+    if args.localize:
+        # after branches on constants are folded, so they aren't counted
+        plugins.append(plugin.LocalizePlugin())
+    if args.prelude is not None:
+        plugins.append(plugin.PreludePlugin(prelude=args.prelude))
+    if args.minify:
+        plugins.append(plugin.MinifyPlugin(verify=args.minify_verify))
+    if args.compress is not None:
+        # last, so it compresses what the other plugins output
+        plugins.append(plugin.CompressPlugin(
+            algorithm=args.compress, bytecode=bool(args.compress_bytecode), optimize=args.optimize))
+    return CompilerOptions(
+        ignore_imports=args.ignore_imports,
+        remove_imports=args.remove_imports,
+        docstring=f""" Generated by {PROG_NAME}{current_time} """ if args.docstring else None,
+        export_dictionary_mode=args.export_dictionary_mode,
+        export_names_mode=args.export_names_mode,
+        short_generated_names=args.minify,
+        hash_length=args.module_hash_length,
+        cache_dir=args.cache_dir,
+        cache_max_size=args.cache_max_size,
+        jobs=args.jobs,
+        lazy_modules=bool(args.lazy_modules),
+        lazy_builtins=args.lazy_builtins,
+        tree_shaking=bool(args.tree_shaking),
+        prune_imports=bool(args.prune_imports),
+        side_effect_free_imports=args.side_effect_free_imports,
+        direct_imports=bool(args.direct_imports),
+        propagate_constants=bool(args.propagate_constants),
+        inline_functions=bool(args.inline_functions),
+        inline_max_size=args.inline_max_size,
+        profile_imports=bool(args.profile_imports),
+        scope_hoisting=bool(args.scope_hoisting),
+        plugins=plugins
+    )
+
+
+def serve(socket_path: str):
+    from .src.daemon import BuildDaemon
+    daemon = BuildDaemon(socket_path, lambda fields: create_options(
+        argparse.Namespace(**fields)))
+    # exit normally when terminated so the socket is cleaned up
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        client.make_socket_directory(socket_path)
+        print(f"{PROG_NAME}: build daemon listening on {socket_path}",
+              file=sys.stderr)
+        daemon.serve_forever()
+    except OSError as err:
+        print(format_error("daemon", str(err)), file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+
+def get_optimize(args: argparse.Namespace) -> int | None:
+    """ the optimization level to compile the output with, None to write it as is """
+    return args.optimize if args.bytecode else None
+
+
+def forward(args: argparse.Namespace, source: str, path: str) -> bool:
+    """ builds using a running build daemon, returns False if there isn't one """
+    options = {name: value for name, value in vars(args).items()
+               if name not in CLIENT_ARGUMENTS}
+    if options["cache_dir"] is not None:
+        # the daemon might be running in another directory
+        options["cache_dir"] = os.path.abspath(options["cache_dir"])
+    response = client.request_build(args.socket, {
+        "path": path,
+        "source": source,
+        "options": options,
+        # modules are resolved the way they would be in this process
+        "cwd": os.getcwd(),
+        "search_path": sys.path[1:]
+    })
+    if response is None:
+        return False
+    if "error" in response:
+        print(format_error(response["name"], response["msg"], args.json),
+              file=sys.stderr)
+        sys.exit(1)
+    write_output(args.output, response["output"], args.json, get_optimize(args))
+    report_minify(response.get("minify", []), args.json)
+    return True
+
+
+def build_entries(args: argparse.Namespace):
+    from .src import MultiEntryCompiler, errors, plugin
+    entries: list[tuple[str, str]] = []
+    output_paths: list[str] = []
+    for input in args.input:
+        with input:
+            entries.append(
+                (input.read(), os.path.join(os.getcwd(), input.name)))
+        output_path = os.path.join(
+            args.output_dir, os.path.basename(input.name))
+        if output_path in output_paths:
+            print(format_error("output-collision",
+                               f"several inputs would be written to {output_path}", args.json),
+                  file=sys.stderr)
+            sys.exit(1)
+        output_paths.append(output_path)
+    compiler = MultiEntryCompiler(entries, create_options(args))
+    try:
+        outputs = compiler()
+    except errors.CompilerError as err:
+        print(
+            format_compiler_error(err, args.json),
+            file=sys.stderr)
+        sys.exit(1)
+    except plugin.constants.AssignmentToConstantError as err:
+        print(
+            format_error("assignment-to-constant", str(err), args.json),
+            file=sys.stderr)
+        sys.exit(1)
+    os.makedirs(args.output_dir, exist_ok=True)
+    for output_path, merged in zip(output_paths, outputs):
+        with open(output_path, "w") as output:
+            write_output(output, merged, optimize=get_optimize(args))
+    try:
+        finish(compiler, args.json)
+    except errors.CompilerError as err:
+        print(
+            format_compiler_error(err, args.json),
+            file=sys.stderr)
+        sys.exit(1)
+
+
 def main(argv: list[str]):
     parser = argparse.ArgumentParser(
         prog=PROG_NAME,
         description="Compiles/merges Python files.")
-    parser.add_argument("-i", "--input", required=True,
+    parser.add_argument("-i", "--input", nargs="+",
                         type=argparse.FileType('r'),
-                        help="the input file, can be - for stdin")
+                        help="the input file, can be - for stdin. when given several entry points, modules they share are only processed once and each is written to --output-dir")
     parser.add_argument("-o", "--output", nargs="?",
                         type=argparse.FileType('w'), default=sys.stdout,
                         help="the output file. Defaults to stdout")
+    parser.add_argument("--output-dir",
+                        default=None,
+                        help="a directory to write each entry point's output to, named after the entry point. required with several inputs")
+    parser.add_argument("--bytecode", action="store_true",
+                        help="writes the output as a module precompiled to bytecode next to the output file, and the output file as a small launcher which runs it. starts faster since the output isn't compiled again on every run")
+    parser.add_argument("--optimize",
+                        type=int,
+                        choices=[0, 1, 2],
+                        default=0,
+                        help="the optimization level to compile the output with when using --bytecode or --compress-bytecode, like python's -O (1) and -OO (2)")
+    parser.add_argument("--compress",
+                        default=None,
+                        choices=["zlib", "lzma"],
+                        help="writes the output as a small stub which decompresses the code and runs it, reporting the compressed size. lzma compresses better, zlib decompresses faster")
+    parser.add_argument("--compress-bytecode", action=argparse.BooleanOptionalAction,
+                        help="compresses the output compiled to bytecode with --compress instead of its code, so it isn't compiled when it runs. only runs on the same version of python")
     parser.add_argument("--ignore-imports", nargs="+",
                         default=[],
                         help="modules for which to ignore transforming imports for (i.e., leave them untouched)")
@@ -54,6 +330,10 @@ def main(argv: list[str]):
                         help="equivalent to defining a constant to be 1 using --define-constant.")
     parser.add_argument("-m", "--minify", action=argparse.BooleanOptionalAction,
                         help="minifies the result")
+    parser.add_argument("--minify-verify",
+                        choices=["full", "sampled", "deferred", "off"],
+                        default="full",
+                        help="how --minify checks that the minified code parses back into the bundled code. 'sampled' only compares some top-level statements, 'deferred' compares all of them while the output is written and fails afterwards")
     parser.add_argument("-j", "--json", action=argparse.BooleanOptionalAction,
                         help="outputs messages as json")
     parser.add_argument("-t", "--time", action=argparse.BooleanOptionalAction,
@@ -68,75 +348,119 @@ def main(argv: list[str]):
                         help="the length of the hash used for making modules unique")
     parser.add_argument("--export-dictionary-mode",
                         default="dict",
-                        choices=["dict", "munch", "class", "class_instance"],
-                        help="the method that export dictionaries are converted to dot-accessible objects")
+                        choices=["dict", "munch", "class", "class_instance", "module"],
+                        help="the method that export dictionaries are converted to dot-accessible objects. 'module' is the fastest to use: real module objects, or classes with __slots__ with --export-names-mode static")
     parser.add_argument("--export-names-mode",
                         default="locals",
                         choices=["locals", "static"],
                         help="how module exports are determined. use 'locals' for compatibility with existing code. forced to 'static' if --export-dictionary-mode is set to 'class' or 'class_instance'")
+    parser.add_argument("--cache-dir",
+                        default=None,
+                        help="a directory to cache processed modules in between builds. modules whose source, options and plugins haven't changed aren't parsed or transformed again")
+    parser.add_argument("--cache-max-size",
+                        type=int,
+                        default=256 * 1024 * 1024,
+                        help="the maximum size of the cache directory in bytes. least recently used modules are evicted first")
+    parser.add_argument("--jobs",
+                        type=int,
+                        default=1,
+                        help="the number of worker processes used to parse and transform modules. 0 uses one per CPU. the output is the same as with 1")
+    parser.add_argument("--lazy-modules", action=argparse.BooleanOptionalAction,
+                        help="only initializes each bundled module when one of its attributes is first used, instead of all of them at startup. like lazy imports, a module's side effects are deferred until then")
+    parser.add_argument("--lazy-builtins", nargs="+",
+                        default=[],
+                        help="standard library modules (and their submodules) to only import when one of their attributes is first used, e.g. email asyncio decimal http.client")
+    parser.add_argument("--tree-shaking", action=argparse.BooleanOptionalAction,
+                        help="drops top-level functions, classes, imports and assignments of bundled modules which nothing uses")
+    parser.add_argument("--prune-imports", action=argparse.BooleanOptionalAction,
+                        help="drops imports which nothing references from the generated code, along with bundled modules which aren't imported anymore if they don't have side effects")
+    parser.add_argument("--side-effect-free-imports", nargs="+",
+                        default=[],
+                        help="modules to treat as not having side effects when pruning imports, e.g. standard library modules")
+    parser.add_argument("--direct-imports", action=argparse.BooleanOptionalAction,
+                        help="passes imported modules to factories under their alias, and attributes of them which can't change as separate arguments, so using them is as fast as a local variable")
+    parser.add_argument("--propagate-constants", action=argparse.BooleanOptionalAction,
+                        help="inlines literals which bundled modules assign once and never change where other modules use them, so branches on them can be folded")
+    parser.add_argument("--inline-functions", action=argparse.BooleanOptionalAction,
+                        help="replaces calls of small functions which only return an expression of their arguments with the expression, where the function called can't change")
+    parser.add_argument("--inline-max-size",
+                        type=int,
+                        default=16,
+                        help="the most AST nodes the expression of a function inlined by --inline-functions can have")
+    parser.add_argument("--profile-imports", action=argparse.BooleanOptionalAction,
+                        help="times the initialization of each bundled module, like python's -X importtime. the output prints a JSON tree of the times at exit, or writes it to the file named by $PYTHON_COMPILER_IMPORTTIME")
+    parser.add_argument("--scope-hoisting", action=argparse.BooleanOptionalAction,
+                        help="emits the top-level names of bundled modules as globals of the output, renamed to be unique, instead of wrapping each module in a function. names shared between modules are used directly, functions read them as globals instead of closure variables, and global statements work")
+    parser.add_argument("--localize", action=argparse.BooleanOptionalAction,
+                        help="binds built-ins and names of enclosing scopes which functions use in loops to local variables at the start of the functions, where they can't change while the functions run")
+    parser.add_argument("-w", "--watch", action="store_true",
+                        help="keeps running, rebuilding the output whenever a module it depends on changes")
+    parser.add_argument("--watch-interval",
+                        type=float,
+                        default=0.5,
+                        help="how often to check for changes in watch mode, in seconds")
+    parser.add_argument("--daemon", action="store_true",
+                        help="runs a build daemon which keeps the compiler loaded and modules processed between builds. later invocations forward their builds to it")
+    parser.add_argument("--socket",
+                        default=client.default_socket_path(),
+                        help=f"the Unix socket the build daemon listens on. defaults to ${client.SOCKET_ENV_VAR}, or a socket in $XDG_RUNTIME_DIR or in a private directory in the temporary directory")
+    parser.add_argument("--local", action="store_true",
+                        help="builds in this process even if a build daemon is running")
     args = parser.parse_args(argv)
-    constants: dict[str, bool | str | int | float] = {
-        "__COMPILED__": True
-    }
-    for [constant_name, constant_value] in args.define_constant:
-        if constant_value.lower() == "true":
-            constants[constant_name] = True
-        elif constant_value.lower() == "false":
-            constants[constant_name] = False
-        else:
-            try:
-                if "." in constant_value:
-                    constants[constant_name] = float(constant_value)
-                else:
-                    constants[constant_name] = int(constant_value)
-            except ValueError:
-                constants[constant_name] = constant_value
-    for [constant_name] in args.define:
-        constants[constant_name] = 1
-    current_time = (" at %s" % time.strftime(
-        "%a, %d %b %Y %H:%M:%S", time.localtime())) if args.time else ""
-    with args.input as input:
-        try:
-            plugins: list[plugin.Plugin] = []
-            plugins.append(plugin.ConstantsPlugin(constants=constants))
-            plugins.append(plugin.SimplifyIfPlugin())
-            if args.prelude is not None:
-                plugins.append(plugin.PreludePlugin(prelude=args.prelude))
-            if args.minify:
-                plugins.append(plugin.MinifyPlugin())
-            merged = Compiler(
-                source=input.read(),
-                path=os.path.join(os.getcwd(),
-                                  input.name if input.name != "<stdin>" else DEFAULT_FILE_NAME),
-                options=CompilerOptions(
-                    ignore_imports=args.ignore_imports,
-                    remove_imports=args.remove_imports,
-                    docstring=f""" Generated by {PROG_NAME}{current_time} """ if args.docstring else None,
-                    export_dictionary_mode=args.export_dictionary_mode,
-                    export_names_mode=args.export_names_mode,
-                    short_generated_names=args.minify,
-                    hash_length=args.module_hash_length,
-                    plugins=plugins
-                ))()
-            if args.json:
-                if args.output.name == "<stdout>":
-                    args.output.write(json.dumps({
-                        "output": merged
-                    }))
-                else:
-                    args.output.write(merged)
-            else:
-                args.output.write(merged)
-        except errors.CompilerError as err:
-            print(
-                format_compiler_error(err, args.json),
-                file=sys.stderr)
-            sys.exit(1)
-        except plugin.constants.AssignmentToConstantError as err:
-            print(
-                format_error("assignment-to-constant", str(err), args.json),
-                file=sys.stderr)
-            sys.exit(1)
+    if args.daemon:
+        serve(args.socket)
+        return
+    if args.input is None:
+        parser.error("the following arguments are required: -i/--input")
+    if args.bytecode and args.output_dir is None and args.output.name == "<stdout>":
+        parser.error("--bytecode needs -o/--output or --output-dir")
+    if args.compress_bytecode and args.compress is None:
+        parser.error("--compress-bytecode needs --compress")
+    if args.scope_hoisting and args.lazy_modules:
+        parser.error("--scope-hoisting can't be used with --lazy-modules")
+    if args.scope_hoisting and args.profile_imports:
+        parser.error("--scope-hoisting can't be used with --profile-imports")
+    if len(args.input) > 1 or args.output_dir is not None:
+        if args.output_dir is None:
+            parser.error("--output-dir is required when building several inputs")
+        if args.watch:
+            parser.error("--watch can only be used with one input")
+        if any(input.name == "<stdin>" for input in args.input):
+            parser.error("several inputs can't be read from stdin")
+        build_entries(args)
+        return
+    [input] = args.input
+    if args.watch and input.name == "<stdin>":
+        parser.error("--watch can't be used when reading the input from stdin")
+    with input:
+        source = input.read()
+        path = os.path.join(os.getcwd(),
+                            input.name if input.name != "<stdin>" else DEFAULT_FILE_NAME)
+    if not args.watch and not args.local and forward(args, source, path):
+        return
+    from .src import Compiler, IncrementalCompiler, errors, plugin
+    try:
+        compiler = (IncrementalCompiler if args.watch else Compiler)(
+            source=source,
+            path=path,
+            options=create_options(args))
+        write_output(args.output, compiler(), args.json, get_optimize(args))
+        finish(compiler, args.json)
+        if isinstance(compiler, IncrementalCompiler):
+            watch(compiler, args.output, args.watch_interval, args.json, get_optimize(args))
+    except errors.CompilerError as err:
+        print(
+            format_compiler_error(err, args.json),
+            file=sys.stderr)
+        sys.exit(1)
+    except plugin.constants.AssignmentToConstantError as err:
+        print(
+            format_error("assignment-to-constant", str(err), args.json),
+            file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        # stopping watch mode
+        pass
 
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+"""
+Compares how fast bundled modules' exports are to use in each
+`--export-dictionary-mode` and `--export-names-mode`.
+
+Run it with any Python, from anywhere:
+
+    python benchmarks/export_modes.py [--exports N] [--number N]
+
+It bundles a small program for every combination of modes with the CLI,
+runs it and prints how long reading an exported constant and calling an
+exported function take, and how many bytes the exports object takes.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DICTIONARY_MODES = ["dict", "munch", "class", "class_instance", "module"]
+NAMES_MODES = ["locals", "static"]
+
+MAIN_SOURCE = """
+import json
+import sys
+import timeit
+import lib
+
+
+def read():
+    return lib.value
+
+
+def call():
+    return lib.function_0()
+
+
+def size(exports):
+    total = sys.getsizeof(exports)
+    if hasattr(exports, "__dict__") and not isinstance(exports, type):
+        total += sys.getsizeof(exports.__dict__)
+    return total
+
+
+print(json.dumps([
+    min(timeit.repeat(read, number={number}, repeat=5)) / {number} * 1e9,
+    min(timeit.repeat(call, number={number}, repeat=5)) / {number} * 1e9,
+    size(lib),
+]))
+"""
+
+
+def write_sources(directory: str, exports: int, number: int) -> str:
+    with open(os.path.join(directory, "lib.py"), "w") as file:
+        file.write("value = 1\n")
+        for index in range(exports):
+            file.write(f"def function_{index}():\n    return {index}\n")
+    main_path = os.path.join(directory, "main.py")
+    with open(main_path, "w") as file:
+        file.write(MAIN_SOURCE.format(number=number))
+    return main_path
+
+
+def run(main_path: str, dictionary_mode: str, names_mode: str) -> list[float] | str:
+    compiled = subprocess.run(
+        [sys.executable, "-m", os.path.basename(REPO_ROOT), "-i", main_path,
+         "--no-time", "--local",
+         "--export-dictionary-mode", dictionary_mode,
+         "--export-names-mode", names_mode],
+        cwd=os.path.dirname(REPO_ROOT), capture_output=True, text=True)
+    if compiled.returncode != 0:
+        return compiled.stderr.strip().splitlines()[-1]
+    result = subprocess.run([sys.executable, "-c", compiled.stdout],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return result.stderr.strip().splitlines()[-1]
+    return json.loads(result.stdout)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--exports", type=int, default=50,
+                        help="the number of functions the bundled module exports")
+    parser.add_argument("--number", type=int, default=1_000_000,
+                        help="how many times to time each operation")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        main_path = write_sources(directory, args.exports, args.number)
+        print(f"{'mode':<26}{'read (ns)':>12}{'call (ns)':>12}{'size (B)':>10}")
+        for dictionary_mode in DICTIONARY_MODES:
+            for names_mode in NAMES_MODES:
+                result = run(main_path, dictionary_mode, names_mode)
+                mode = f"{dictionary_mode}/{names_mode}"
+                if isinstance(result, str):
+                    print(f"{mode:<26}failed: {result}")
+                else:
+                    read, call, size = result
+                    print(f"{mode:<26}{read:>12.1f}{call:>12.1f}{size:>10}")
+
+
+if __name__ == "__main__":
+    main()
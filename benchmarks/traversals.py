@@ -0,0 +1,195 @@
+"""
+Compares the throughput and the deepest supported nesting of the minifier's
+AST traversals with those of another revision.
+
+Run it with any Python, from anywhere in the repository:
+
+    python benchmarks/traversals.py [--baseline REV] [--functions N] [--max-depth N]
+
+It loads `python_minifier` from the working tree and from `REV` (which must
+still have the same functions), times `add_namespace`, `resolve_names`,
+`all_bindings`, `add_assigned` and `compare_ast` on a module with many
+functions, and finds how deeply functions can be nested before each of them
+raises a `RecursionError` with the default recursion limit.
+"""
+import argparse
+import ast
+import copy
+import gc
+import importlib.util
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from io import BytesIO
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSES = ["add_namespace", "resolve_names",
+          "all_bindings", "add_assigned", "compare_ast"]
+
+FUNCTION_SOURCE = """
+def function_{index}(alpha, beta=3, *args, **kwargs):
+    total = 0
+    for item in range(alpha):
+        if item % 3 == 0 and beta:
+            total += item * beta - len(args)
+        else:
+            total -= len([key for key in kwargs if key != 'key_{index}'])
+    return {{'value': total, 'nested': [(a, b) for a in range(2) for b in range(a)]}}
+"""
+
+
+def load_minifier(directory: str, name: str):
+    """ imports the `python_minifier` package in `directory` as `name` """
+    path = os.path.join(directory, "src", "python_minifier")
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(path, "__init__.py"), submodule_search_locations=[path])
+    module = importlib.util.module_from_spec(spec)  # type: ignore
+    sys.modules[name] = module
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+def extract_revision(revision: str, directory: str) -> None:
+    archive = subprocess.run(
+        ["git", "archive", revision, "src/python_minifier"],
+        cwd=REPO_ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=BytesIO(archive)) as tar:
+        tar.extractall(directory)
+
+
+def nested_module(depth: int) -> ast.Module:
+    """ `depth` nested functions, the innermost returning a global """
+    body: list[ast.stmt] = [ast.Return(ast.Name("value", ast.Load()))]
+    for index in reversed(range(depth)):
+        function = ast.FunctionDef(
+            name=f"function_{index}", args=ast.arguments(
+                posonlyargs=[], args=[], kwonlyargs=[], kw_defaults=[], defaults=[]),
+            body=body, decorator_list=[], returns=None, type_comment=None)
+        body = [function, ast.Return(
+            ast.Name(f"function_{index}", ast.Load()))]
+    body.insert(0, ast.Assign(
+        [ast.Name("value", ast.Store())], ast.Constant(1)))
+    return ast.fix_missing_locations(ast.Module(body=body, type_ignores=[]))
+
+
+def prepare(minifier, module: ast.Module, name: str):
+    """ runs the passes `name` depends on, returning its arguments """
+    rename = sys.modules[minifier.__name__ + ".rename"]
+    if name == "compare_ast":
+        return (module, copy.deepcopy(module))
+    rename.add_namespace(module)
+    if name == "add_namespace":
+        return None
+    rename.bind_names(module)
+    if name != "resolve_names":
+        rename.resolve_names(module)
+    return (module,)
+
+
+def run_pass(minifier, name: str, arguments) -> None:
+    rename = sys.modules[minifier.__name__ + ".rename"]
+    renamer = sys.modules[minifier.__name__ + ".rename.renamer"]
+    if name == "add_namespace":
+        rename.add_namespace(arguments)
+    elif name == "resolve_names":
+        rename.resolve_names(*arguments)
+    elif name == "all_bindings":
+        for _ in renamer.all_bindings(*arguments):
+            pass
+    elif name == "add_assigned":
+        renamer.add_assigned(*arguments)
+    else:
+        minifier.compare_ast(*arguments)
+
+
+def throughput(minifier, source: str, name: str, repeat: int = 3) -> float:
+    """ the fastest time `name` took on `source`, in seconds """
+    best = float("inf")
+    for _ in range(repeat):
+        module = ast.parse(source)
+        arguments = prepare(minifier, module, name)
+        if arguments is None:
+            arguments = module
+        # collections of the whole heap would make the timings noisy
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        run_pass(minifier, name, arguments)
+        best = min(best, time.perf_counter() - start)
+        gc.enable()
+    return best
+
+
+def supports_depth(minifier, name: str, depth: int) -> bool:
+    # building the tree and the other passes are still recursive, so they
+    # get a high limit
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(1_000_000)
+    try:
+        module = nested_module(depth)
+        arguments = prepare(minifier, module, name)
+    finally:
+        sys.setrecursionlimit(limit)
+    try:
+        run_pass(minifier, name, module if arguments is None else arguments)
+    except RecursionError:
+        return False
+    return True
+
+
+def max_depth(minifier, name: str, limit: int) -> int:
+    """ the deepest nesting up to `limit` which `name` supports """
+    low, high = 0, 1
+    while high <= limit and supports_depth(minifier, name, high):
+        low, high = high, high * 2
+    if high > limit:
+        if supports_depth(minifier, name, limit):
+            return limit
+        high = limit
+    while high - low > 1:
+        middle = (low + high) // 2
+        if supports_depth(minifier, name, middle):
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def benchmark(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        extract_revision(args.baseline, directory)
+        versions = [(args.baseline, load_minifier(directory, "baseline_minifier")),
+                    ("working tree", load_minifier(REPO_ROOT, "current_minifier"))]
+        source = "".join(FUNCTION_SOURCE.format(index=index)
+                         for index in range(args.functions))
+        print(f"{'pass':<16}{'version':<16}{'time (ms)':>12}{'max depth':>12}")
+        for name in PASSES:
+            for label, minifier in versions:
+                elapsed = throughput(minifier, source, name) * 1000
+                depth = max_depth(minifier, name, args.max_depth)
+                shown = f">={depth}" if depth == args.max_depth else str(depth)
+                print(f"{name:<16}{label:<16}{elapsed:>12.1f}{shown:>12}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline", default="HEAD",
+                        help="the git revision to compare the working tree with")
+    parser.add_argument("--functions", type=int, default=1000,
+                        help="the number of functions in the module timed")
+    parser.add_argument("--max-depth", type=int, default=20_000,
+                        help="the deepest nesting tried")
+    args = parser.parse_args()
+    # preparing deep trees recurses deeply in C too
+    threading.stack_size(512 * 1024 * 1024)
+    thread = threading.Thread(target=benchmark, args=(args,))
+    thread.start()
+    thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import json
+import os
+import socket
+import stat
+import tempfile
+
+# this module is imported before anything else in the package, so it mustn't
+# import the compiler: forwarding a build to a running daemon should only cost
+# the interpreter's startup
+
+SOCKET_ENV_VAR = "PYTHON_COMPILER_SOCKET"
+
+
+def default_socket_path() -> str:
+    if SOCKET_ENV_VAR in os.environ:
+        return os.environ[SOCKET_ENV_VAR]
+    # the socket has to be somewhere other users can't create it first
+    if "XDG_RUNTIME_DIR" in os.environ:
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "python-compiler.sock")
+    user = os.getuid() if hasattr(os, "getuid") else os.getlogin()
+    return os.path.join(tempfile.gettempdir(), f"python-compiler-{user}", "daemon.sock")
+
+
+def _is_private_directory(path: str) -> bool:
+    """ whether only this user (or root) can create files in `path` """
+    try:
+        status = os.stat(path)
+    except OSError:
+        return False
+    return (status.st_uid in (0, os.getuid())
+            and status.st_mode & (stat.S_IWGRP | stat.S_IWOTH) == 0)
+
+
+def is_trusted_socket(socket_path: str) -> bool:
+    """
+    whether the socket at `socket_path` was created by this user in a
+    directory nobody else can write to, so no other user's process can be
+    listening on it
+    """
+    if not hasattr(os, "getuid"):
+        return False
+    try:
+        owner = os.stat(socket_path).st_uid
+    except OSError:
+        return False
+    return owner == os.getuid() and _is_private_directory(
+        os.path.dirname(os.path.abspath(socket_path)))
+
+
+def make_socket_directory(socket_path: str) -> None:
+    """
+    creates the directory of `socket_path` only this user can access if it
+    doesn't exist, raising OSError if other users could write to it, since
+    clients wouldn't trust a socket there
+    """
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not hasattr(os, "getuid") or not _is_private_directory(directory):
+        raise OSError(
+            f"{directory} can be written to by other users, so clients won't connect to a socket in it")
+
+
+def send_message(connection: socket.socket, message: dict) -> None:
+    connection.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def receive_message(file) -> dict | None:
+    """ reads one newline-delimited JSON message, None if the peer hung up """
+    line = file.readline()
+    if len(line) == 0:
+        return None
+    return json.loads(line)
+
+
+def request_build(socket_path: str, request: dict) -> dict | None:
+    """
+    sends a build request to the daemon listening on `socket_path` and
+    returns its response, or None if no daemon is running there
+    """
+    if not hasattr(socket, "AF_UNIX") or not is_trusted_socket(socket_path):
+        # anyone could be listening on a socket we don't own, and would get
+        # the source and send back the output
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(socket_path)
+            send_message(connection, request)
+            with connection.makefile("rb") as file:
+                return receive_message(file)
+    except OSError:
+        # no daemon, a stale socket or the daemon went away mid-build, so
+        # the caller builds locally instead
+        return None
@@ -1,5 +1,8 @@
 from . import errors, plugin
 from .compiler import Compiler
+from .incremental import IncrementalCompiler
+from .multientry import MultiEntryCompiler
 from .options import CompilerOptions
 
-__all__ = ["plugin", "errors", "Compiler", "CompilerOptions"]
+__all__ = ["plugin", "errors", "Compiler", "IncrementalCompiler",
+           "MultiEntryCompiler", "CompilerOptions"]
@@ -0,0 +1,73 @@
+import importlib.util
+import os
+import py_compile
+
+# Python never caches the bytecode of the script it runs, so running a large
+# output directly parses and compiles all of it every time. instead, it's
+# written next to a launcher as `<launcher>_bundle.py` and compiled to a
+# hash-based `.pyc`, which the launcher unmarshals and runs. it falls back to
+# compiling the source if the `.pyc` is missing, was made by another version
+# of Python or doesn't match the source anymore
+BUNDLE_SUFFIX = "_bundle"
+
+# this only uses modules which are loaded when Python starts, so running it
+# costs next to nothing over running the bundle itself
+LAUNCHER_TEMPLATE = """\
+# Runs {bundle_name}, precompiled to {bytecode_name}
+from _frozen_importlib_external import MAGIC_NUMBER, _RAW_MAGIC_NUMBER
+from _imp import source_hash
+from marshal import loads
+from os.path import abspath, dirname, join
+d = dirname(abspath(__file__))
+s = join(d, {bundle_name!r})
+with open(s, 'rb') as f:
+    source = f.read()
+try:
+    with open(join(d, {bytecode_name!r}), 'rb') as f:
+        data = f.read()
+except OSError:
+    data = b''
+if data[:4] == MAGIC_NUMBER and data[8:16] == source_hash(_RAW_MAGIC_NUMBER, source):
+    code = loads(memoryview(data)[16:])
+else:
+    code = compile(source, s, 'exec', optimize={optimize})
+exec(code, {{'__name__': '__main__', '__file__': s, '__builtins__': __builtins__}})
+"""
+
+
+def get_bundle_path(launcher_path: str) -> str:
+    """ returns the path of the bundle which the launcher at `launcher_path` runs """
+    return os.path.splitext(launcher_path)[0] + BUNDLE_SUFFIX + ".py"
+
+
+def get_bytecode_path(bundle_path: str, optimize: int) -> str:
+    """ returns where the bytecode of the bundle at `bundle_path` is written """
+    return importlib.util.cache_from_source(bundle_path, optimization=optimize if optimize > 0 else "")
+
+
+def generate_launcher(launcher_path: str, optimize: int) -> str:
+    """ returns the source of a launcher at `launcher_path` """
+    directory = os.path.dirname(os.path.abspath(launcher_path))
+    bundle_path = get_bundle_path(os.path.abspath(launcher_path))
+    return LAUNCHER_TEMPLATE.format(
+        bundle_name=os.path.relpath(bundle_path, directory),
+        bytecode_name=os.path.relpath(
+            get_bytecode_path(bundle_path, optimize), directory),
+        optimize=optimize)
+
+
+def write_bytecode(source: str, launcher_path: str, optimize: int = 0) -> str:
+    """
+    writes `source` as the bundle run by a launcher at `launcher_path` and
+    compiles it with the optimization level `optimize` (like `python -O`),
+    returning the source of the launcher, which the caller writes
+    """
+    bundle_path = get_bundle_path(launcher_path)
+    with open(bundle_path, "w") as file:
+        file.write(source)
+    py_compile.compile(bundle_path,
+                       cfile=get_bytecode_path(bundle_path, optimize),
+                       doraise=True,
+                       optimize=optimize,
+                       invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH)
+    return generate_launcher(launcher_path, optimize)
@@ -0,0 +1,184 @@
+import ast
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+
+from .options import CompilerOptions
+from .transformers import FoundImport
+
+# bump this whenever the shape of a cache entry changes
+CACHE_FORMAT_VERSION = 1
+CACHE_ENTRY_SUFFIX = ".pickle"
+
+
+def options_fingerprint(options: CompilerOptions) -> str:
+    """
+    generates a string capturing every option that affects the contents of a
+    cache entry (the post-plugin AST and the list of imports). options only
+    used during code generation are left out so they can be changed without
+    invalidating the cache.
+    """
+    return repr((
+        sorted(options.ignore_imports),
+        sorted(options.remove_imports),
+        [plugin.fingerprint() for plugin in options.plugins]
+    ))
+
+
+class ModuleCache:
+    """
+    A persistent, content-addressed cache of processed modules.
+
+    Each entry stores a module's AST after `hook_module` has run along with the
+    imports found in it, keyed by a hash of the module's source, its path, the
+    running Python version and `options_fingerprint`. Entries are stored as
+    pickles (which are fast to load) in a single directory and evicted least
+    recently used first once the directory grows over `max_size` bytes.
+    """
+    directory: str
+    max_size: int
+    fingerprint: str
+    # lazily loaded map of entry file name to (last use time, size)
+    _entries: dict[str, tuple[float, int]] | None
+    _size: int
+
+    def __init__(self, directory: str, max_size: int, options: CompilerOptions) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.fingerprint = options_fingerprint(options)
+        self._entries = None
+        self._size = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, source: str, path: str) -> str:
+        hasher = hashlib.sha256(usedforsecurity=False)
+        for part in (str(CACHE_FORMAT_VERSION), sys.version, self.fingerprint, path, source):
+            hasher.update(part.encode("utf-8", "surrogatepass"))
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_ENTRY_SUFFIX)
+
+    def get(self, key: str) -> tuple[ast.Module, list[FoundImport]] | None:
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rb") as file:
+                module, imports = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # the entry is corrupt or from an incompatible version, so treat
+            # it as a miss and let `put` overwrite it
+            return None
+        try:
+            # mark the entry as recently used for eviction
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return module, imports
+
+    def put(self, key: str, module: ast.Module, imports: list[FoundImport]) -> None:
+        data = pickle.dumps((module, imports), protocol=pickle.HIGHEST_PROTOCOL)
+        # write to a temporary file first so concurrent readers never see a
+        # partially written entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, self._entry_path(key))
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            return
+        entries = self._load_entries()
+        name = key + CACHE_ENTRY_SUFFIX
+        if name in entries:
+            self._size -= entries[name][1]
+        entries[name] = (os.path.getmtime(self._entry_path(key)), len(data))
+        self._size += len(data)
+        if self._size > self.max_size:
+            self.evict()
+
+    def _load_entries(self) -> dict[str, tuple[float, int]]:
+        if self._entries is None:
+            self._entries = {}
+            self._size = 0
+            with os.scandir(self.directory) as scanner:
+                for entry in scanner:
+                    if entry.name.endswith(CACHE_ENTRY_SUFFIX):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        self._entries[entry.name] = (
+                            stat.st_mtime, stat.st_size)
+                        self._size += stat.st_size
+        return self._entries
+
+    def evict(self) -> None:
+        """ removes the least recently used entries until the cache fits in `max_size` """
+        entries = self._load_entries()
+        for name, (_, size) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if self._size <= self.max_size:
+                break
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                # someone else got to it first
+                pass
+            except OSError:
+                continue
+            del entries[name]
+            self._size -= size
+
+
+class ModuleCacheTestMethods(unittest.TestCase):
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ModuleCache(directory, 1 << 20, CompilerOptions())
+            key = cache.key("import os\n", "/a.py")
+            self.assertIsNone(cache.get(key))
+            module = ast.parse("import os\n")
+            imports = [FoundImport("os", None, "/a.py", None, False, True)]
+            cache.put(key, module, imports)
+            cached = cache.get(key)
+            assert cached is not None
+            self.assertEqual(ast.dump(cached[0]), ast.dump(module))
+            self.assertEqual(cached[1], imports)
+
+    def test_key_depends_on_options(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ModuleCache(directory, 1 << 20, CompilerOptions())
+            other = ModuleCache(directory, 1 << 20, CompilerOptions(
+                ignore_imports=["os"]))
+            self.assertNotEqual(cache.key("x = 1", "/a.py"),
+                                other.key("x = 1", "/a.py"))
+            self.assertNotEqual(cache.key("x = 1", "/a.py"),
+                                cache.key("x = 2", "/a.py"))
+
+    def test_eviction(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ModuleCache(directory, 1 << 20, CompilerOptions())
+            module = ast.parse("x = 1\n")
+            keys = [cache.key(str(i), "/a.py") for i in range(3)]
+            for i, key in enumerate(keys):
+                cache.put(key, module, [])
+                # make sure the first entry is the oldest
+                os.utime(cache._entry_path(key), (i, i))
+            cache._entries = None
+            cache.max_size = cache._load_entries()[
+                keys[0] + CACHE_ENTRY_SUFFIX][1] * 2
+            cache.evict()
+            self.assertIsNone(cache.get(keys[0]))
+            self.assertIsNotNone(cache.get(keys[1]))
+            self.assertIsNotNone(cache.get(keys[2]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,33 +1,126 @@
 import ast
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import unittest
 import warnings
 
-from . import exporthelper, graph
-from .errors import CircularDependencyError, NestedModuleRecursionError
+from . import exporthelper, graph, hoisting
+from .cache import ModuleCache
+from .errors import (AsteriskImportError, CircularDependencyError, CompilerError,
+                     InternalCompilerError, NestedModuleRecursionError)
+from .link import (TreeShaker, drop_statements, find_direct_imports,
+                   inline_functions, propagate_constants, prune_modules,
+                   set_direct_imports)
 from .options import CompilerOptions
-from .processedmodule import ProcessedModule
+from .parallel import ParallelResolver
+from .plugin import LocalizePlugin, Plugin
+from .processedmodule import ModuleLocation, ProcessedModule
+from .resolver import ModuleResolver
 
 
 class Compiler:
     source: str
     path: str
     options: CompilerOptions
+    resolver: ModuleResolver
 
     def __init__(self, source: str, path: str, options: CompilerOptions = CompilerOptions()) -> None:
         self.source = source
         self.path = path
         self.options = options
+        self.resolver = ModuleResolver()
 
     def __call__(self) -> str:
         try:
+            cache = self._open_cache()
+
             # get the main module
             main_processed_module = ProcessedModule(
-                self.source, self.path, "__main__", self.options)
+                self.source, self.path, "__main__", self.options, cache)
 
             # sort out all the dependencies and find a good linear order for them to
             # be loaded in using `graph.py`
             dependency_tree_edges: dict[str, list[str]] = {}
             dependency_tree_modules: dict[str, ProcessedModule] = {}
-            dependency_queue: list[ProcessedModule] = [main_processed_module]
+            self._walk_dependencies(
+                [main_processed_module], dependency_tree_edges, dependency_tree_modules, cache)
+            dependencies = self._sort_dependencies(dependency_tree_edges)
+            self._link(dependency_tree_edges, dependency_tree_modules,
+                       [(main_processed_module, dependency_tree_edges[self.path])])
+            dependencies, dependency_tree_edges = self._prune(
+                self.path, dependencies, dependency_tree_edges, dependency_tree_modules)
+
+            return self._generate_output(dependencies, dependency_tree_edges, dependency_tree_modules)
+        except RecursionError:
+            raise NestedModuleRecursionError()
+
+    def finish(self) -> None:
+        """
+        Finishes the last build once its output was written, running every
+        plugin's `hook_finish`. Raises if work a plugin deferred failed.
+        """
+        for plugin in self.options.plugins:
+            plugin.hook_finish()
+
+    def _open_cache(self) -> ModuleCache | None:
+        if self.options.cache_dir is None:
+            return None
+        return ModuleCache(self.options.cache_dir,
+                           self.options.cache_max_size, self.options)
+
+    def _walk_dependencies(self,
+                           dependency_queue: list[ProcessedModule],
+                           dependency_tree_edges: dict[str, list[str]],
+                           dependency_tree_modules: dict[str, ProcessedModule],
+                           cache: ModuleCache | None) -> None:
+        """
+        adds the modules in `dependency_queue` and everything they import to
+        the dependency tree, skipping modules which are already in it
+        """
+        # resolution only depends on the importing directory, so it's memoized
+        # by that, and modules are memoized by their resolved path, so each
+        # module is only read, parsed and transformed once no matter how many
+        # times it's imported
+        locations: dict[tuple[str, str], ModuleLocation] = {}
+        # files may have been added or removed since the last walk
+        self.resolver.invalidate()
+        known_modules: dict[str, ProcessedModule] = dict(
+            dependency_tree_modules)
+        for module in dependency_queue:
+            known_modules.setdefault(module.path, module)
+
+        def locate(module: str, context_path: str) -> ModuleLocation:
+            key = (module, os.path.dirname(context_path))
+            if key not in locations:
+                locations[key] = ProcessedModule.locate(
+                    module, context_path, self.options, self.resolver)
+            return locations[key]
+
+        parallel_resolver = None
+        if self.options.jobs != 1:
+            parallel_resolver = ParallelResolver(
+                self.options.jobs, self.options)
+
+        def prefetch(module: ProcessedModule):
+            # start loading the module's imports in the background
+            assert parallel_resolver is not None
+            for item in module.imports:
+                try:
+                    location = locate(item.module, module.path)
+                except CompilerError:
+                    # raise it when the walk gets here so errors are the same
+                    # as in a serial build
+                    continue
+                if location.path not in known_modules:
+                    parallel_resolver.submit(location, module.path)
+
+        try:
+            if parallel_resolver is not None:
+                for module in dependency_queue:
+                    prefetch(module)
             while len(dependency_queue) > 0:
                 module = dependency_queue.pop()
                 if module.path not in dependency_tree_modules:
@@ -35,70 +128,426 @@ class Compiler:
                     dependency_tree_modules[module.path] = module
                     dependency_tree_edges[module.path] = []
                     for item in module.imports:
-                        processed_module = ProcessedModule.resolve(
-                            item.module, module.path, self.options)
+                        location = locate(item.module, module.path)
+                        if location.path not in known_modules:
+                            if parallel_resolver is not None:
+                                parallel_resolver.submit(location, module.path)
+                                loaded_module = parallel_resolver.result(
+                                    location.path)
+                                prefetch(loaded_module)
+                            else:
+                                loaded_module = ProcessedModule.load(
+                                    location, module.path, self.options, cache)
+                            known_modules[location.path] = loaded_module
+                        processed_module = known_modules[location.path]
                         dependency_tree_edges[module.path].append(
                             processed_module.path)
                         dependency_queue.append(processed_module)
-            try:
-                dependencies = list(reversed(graph.Graph(
-                    dependency_tree_edges).topological_sort()))
-            except graph.TopologicalSortError as err:
-                raise CircularDependencyError(err.remaining_modules)
-
-            output: list[ast.AST] = []
-
-            # add helpers needed by the module factories for each mode
-            if self.options.export_dictionary_mode == "munch":
-                output.append(exporthelper.get_export_helper(use_munch=True))
-            elif self.options.export_dictionary_mode == "dict":
-                output.append(exporthelper.get_export_helper(use_munch=False))
-            else:
-                # export_dictionary_mode == "class", we don't need a helper
-                pass
-
-            # actually do the code generation
-            for dependency in dependencies:
+        finally:
+            if parallel_resolver is not None:
+                parallel_resolver.close()
+
+    def _sort_dependencies(self, dependency_tree_edges: dict[str, list[str]]) -> list[str]:
+        try:
+            return list(reversed(graph.Graph(
+                dependency_tree_edges).topological_sort()))
+        except graph.TopologicalSortError as err:
+            raise CircularDependencyError(err.remaining_modules)
+
+    def _link(self,
+              dependency_tree_edges: dict[str, list[str]],
+              dependency_tree_modules: dict[str, ProcessedModule],
+              entries: list[tuple[ProcessedModule, list[str]]]) -> None:
+        """
+        runs the link-time passes enabled in the options over the whole
+        dependency tree. `entries` are the main modules with their imports
+        """
+        stale: list[str] = []
+        # entries which aren't in the dependency tree, e.g. with several of them
+        other_entries = [entry for entry in entries
+                         if dependency_tree_modules.get(entry[0].path) is not entry[0]]
+        if self.options.propagate_constants or self.options.inline_functions:
+            # these come first so that the other passes see what's left
+            modules = [(dependency_tree_modules[path], dependency_tree_edges[path])
+                       for path in self._sort_dependencies(dependency_tree_edges)]
+            modules.extend(other_entries)
+            # lazy modules have to be initialized to look their names up
+            if self.options.propagate_constants:
+                stale.extend(propagate_constants(
+                    modules, self.options, inline_attributes=not self.options.lazy_modules))
+            if self.options.inline_functions and len(stale) == 0:
+                # this inlines functions with constants already inlined
+                stale.extend(inline_functions(
+                    modules, self.options, inline_attributes=not self.options.lazy_modules))
+        if (self.options.tree_shaking or self.options.prune_imports) and len(stale) == 0:
+            # pruning needs to know which imports nothing references, which
+            # is tree shaking restricted to import statements
+            tree_shaker = TreeShaker(dependency_tree_edges, dependency_tree_modules,
+                                     imports_only=not self.options.tree_shaking)
+            unused_statements = [(entry, tree_shaker.add_entry(entry, entry_edges))
+                                 for entry, entry_edges in entries]
+            unused_statements.extend((dependency_tree_modules[path], unused)
+                                     for path, unused in tree_shaker.unused_statements().items())
+            for module, unused in unused_statements:
+                if not drop_statements(module, frozenset(unused)):
+                    stale.append(module.path)
+        if self.options.direct_imports and len(stale) == 0:
+            # this looks at what's left after dropping statements
+            modules = [(module, dependency_tree_edges[path])
+                       for path, module in dependency_tree_modules.items()]
+            modules.extend(other_entries)
+            # lazy modules can't be looked into before they're used
+            direct_imports = find_direct_imports(
+                modules, self.options, hoist_attributes=not self.options.lazy_modules)
+            for module, _ in modules:
+                if id(module) in direct_imports and not set_direct_imports(module, *direct_imports[id(module)]):
+                    stale.append(module.path)
+        if len(stale) > 0:
+            self._reload_modules(stale, dependency_tree_modules)
+            # entries which were reloaded are in the dependency tree too
+            self._link(dependency_tree_edges, dependency_tree_modules,
+                       [(dependency_tree_modules[entry.path] if entry.path in stale else entry, entry_edges)
+                        for entry, entry_edges in entries])
+
+    def _prune(self,
+               entry_path: str,
+               dependencies: list[str],
+               dependency_tree_edges: dict[str, list[str]],
+               dependency_tree_modules: dict[str, ProcessedModule]) -> tuple[list[str], dict[str, list[str]]]:
+        """
+        returns the dependencies to generate code for, in order, and the
+        edges to pass to their factories, without the imports and modules
+        nothing uses if `prune_imports` is set. must run after `_link`
+        """
+        if not self.options.prune_imports:
+            return dependencies, dependency_tree_edges
+        return prune_modules(entry_path, dependencies, dependency_tree_edges,
+                             dependency_tree_modules, self.options.side_effect_free_imports)
+
+    def _reload_modules(self, paths: list[str], dependency_tree_modules: dict[str, ProcessedModule]) -> None:
+        """
+        processes the modules at `paths` again because a link-time pass needs
+        to change them differently than it did in an earlier build
+        """
+        raise InternalCompilerError(
+            f"modules were linked more than once: {', '.join(paths)}")
+
+    def _generate_helpers(self) -> list[ast.AST]:
+        # add helpers needed by the module factories for each mode
+        helpers: list[ast.AST] = []
+        if self.options.scope_hoisting:
+            # modules without source are the only ones left with factories,
+            # and they return the imported module
+            helpers.append(exporthelper.get_hoisted_helper())
+        elif self.options.export_dictionary_mode == "munch":
+            helpers.append(exporthelper.get_export_helper(use_munch=True))
+        elif self.options.export_dictionary_mode == "dict":
+            helpers.append(exporthelper.get_export_helper(use_munch=False))
+        elif self.options.export_dictionary_mode == "module" and self.options.export_names_mode == "locals":
+            helpers.append(exporthelper.get_module_helper())
+        # export_dictionary_mode == "class", we don't need a helper
+        if self.options.lazy_modules or len(self.options.lazy_builtins) > 0:
+            helpers.append(exporthelper.get_lazy_helper())
+        if self.options.profile_imports:
+            helpers.append(exporthelper.get_profile_helper())
+        return helpers
+
+    def _generate_factory(self, module: ProcessedModule) -> ast.AST:
+        return module.generate_factory_ast()
+
+    def _generate_evaluated_factory(self,
+                                    module: ProcessedModule,
+                                    dependency_tree_edges: dict[str, list[str]],
+                                    dependency_tree_modules: dict[str, ProcessedModule]) -> ast.AST:
+        return module.generate_evaluated_factory_ast(
+            [
+                dependency_tree_modules[dependency].name_generator.get_evaluated_factory(
+                ) for dependency in dependency_tree_edges[module.path]
+            ],
+            [
+                (dependency_tree_modules[path].name_generator.get_evaluated_factory(), attribute)
+                for _, attribute, path in module.direct_attributes or []
+            ],
+            dependency_tree_edges[module.path]
+            + [path for _, _, path in module.direct_attributes or []],
+        )
+
+    def _generate_docstring(self) -> ast.Expr:
+        return ast.Expr(
+            ast.Constant(
+                value=self.options.docstring)
+        )
+
+    def _generate_output(self,
+                         dependencies: list[str],
+                         dependency_tree_edges: dict[str, list[str]],
+                         dependency_tree_modules: dict[str, ProcessedModule]) -> str:
+        output: list[ast.AST] = self._generate_helpers()
+
+        # actually do the code generation
+        for dependency in dependencies:
+            module = dependency_tree_modules[dependency]
+            if self.options.scope_hoisting and module.module is not None:
+                output.extend(hoisting.generate_hoisted_ast(
+                    module, dependency_tree_edges, dependency_tree_modules))
+                continue
+            output.append(self._generate_factory(module))
+            output.append(self._generate_evaluated_factory(
+                module, dependency_tree_edges, dependency_tree_modules))
+
+        # put the output into a Module
+        output_ast = ast.Module(
+            body=output,
+            type_ignores=[]
+        )
+
+        # let plugins do their thing
+        for plugin in self.options.plugins:
+            output_ast = plugin.hook_output(output_ast)
+
+        # add the docstring at the top
+        if self.options.docstring != None:
+            output.insert(0, self._generate_docstring())
+
+        # actually generate the output code string
+        output_str = None
+        for plugin in self.options.plugins:
+            unparsed = plugin.hook_unparse(output_ast)
+            if unparsed is not None:
+                if output_str is not None:
+                    warnings.warn(
+                        "The AST unparse operation was overwritten "
+                        "multiple times, resulting in only the last "
+                        "plugin's hook_unparse hook being used."
+                    )
+                output_str = unparsed
+        if output_str is None:
+            output_str = ast.unparse(ast.fix_missing_locations(output_ast))
+        return self._finish_output(output_str)
+
+    def _finish_output(self, output_str: str) -> str:
+        for plugin in self.options.plugins:
+            output_str = plugin.hook_output_source(output_str)
+        return output_str
+
+
+def _unparse_statement(statement: ast.AST, first: bool) -> str:
+    # mirrors how `ast.unparse` separates top-level statements so that joining
+    # the chunks gives exactly the same output as unparsing the whole module
+    code = ast.unparse(statement)
+    if not first and isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        code = "\n" + code
+    return code
+
+
+class FactoryCachingCompiler(Compiler):
+    """
+    A `Compiler` which keeps the factory of every module it generates, along
+    with its unparsed code, so later builds can reuse them. Subclasses must
+    drop the entries of modules which changed from `factories` and
+    `factory_sources`, and the entries of modules whose imports changed from
+    `factory_sources`.
+    """
+    # factory ASTs and unparsed factories (with their evaluation) by path
+    factories: dict[str, ast.AST]
+    factory_sources: dict[str, str]
+
+    def __init__(self, source: str, path: str, options: CompilerOptions = CompilerOptions()) -> None:
+        super().__init__(source, path, options)
+        self.factories = {}
+        self.factory_sources = {}
+
+    def _plugins_modify_output(self) -> bool:
+        return any(
+            type(plugin).hook_output is not Plugin.hook_output
+            or type(plugin).hook_unparse is not Plugin.hook_unparse
+            for plugin in self.options.plugins)
+
+    def _generate_factory(self, module: ProcessedModule) -> ast.AST:
+        if module.path not in self.factories:
+            self.factories[module.path] = module.generate_factory_ast()
+        # plugins can modify the output in place, so they get a copy. pickling
+        # is a lot faster than `copy.deepcopy` for ASTs
+        return pickle.loads(pickle.dumps(self.factories[module.path], pickle.HIGHEST_PROTOCOL))
+
+    def _generate_output(self,
+                         dependencies: list[str],
+                         dependency_tree_edges: dict[str, list[str]],
+                         dependency_tree_modules: dict[str, ProcessedModule]) -> str:
+        # hoisted modules' code depends on the names of the modules they
+        # import, so it isn't kept between builds
+        if self._plugins_modify_output() or self.options.scope_hoisting:
+            return super()._generate_output(dependencies, dependency_tree_edges, dependency_tree_modules)
+
+        # no plugin needs to see the whole output AST, so we can reuse the
+        # unparsed code of every unchanged module
+        chunks: list[str] = []
+        if self.options.docstring != None:
+            chunks.append(ast.unparse(ast.Module(
+                body=[self._generate_docstring()], type_ignores=[])))
+        for helper in self._generate_helpers():
+            chunks.append(_unparse_statement(helper, len(chunks) == 0))
+        for dependency in dependencies:
+            if dependency not in self.factory_sources:
                 module = dependency_tree_modules[dependency]
-                output.append(module.generate_factory_ast())
-                output.append(module.generate_evaluated_factory_ast(
-                    [
-                        dependency_tree_modules[module].name_generator.get_evaluated_factory(
-                        ) for module in dependency_tree_edges[module.path]
-                    ],
-                ))
-
-            # put the output into a Module
-            output_ast = ast.Module(
-                body=output,
-                type_ignores=[]
-            )
-
-            # let plugins do their thing
-            for plugin in self.options.plugins:
-                output_ast = plugin.hook_output(output_ast)
-
-            # add the docstring at the top
-            if self.options.docstring != None:
-                output.insert(0, ast.Expr(
-                    ast.Constant(
-                        value=self.options.docstring)
-                ))
-
-            # actually generate the output code string
-            output_str = None
-            for plugin in self.options.plugins:
-                unparsed = plugin.hook_unparse(output_ast)
-                if unparsed is not None:
-                    if output_str is not None:
-                        warnings.warn(
-                            "The AST unparse operation was overwritten "
-                            "multiple times, resulting in only the last "
-                            "plugin's hook_unparse hook being used."
-                        )
-                    output_str = unparsed
-            if output_str is None:
-                output_str = ast.unparse(ast.fix_missing_locations(output_ast))
-            return output_str
-        except RecursionError:
-            raise NestedModuleRecursionError()
+                if dependency not in self.factories:
+                    self.factories[dependency] = module.generate_factory_ast()
+                evaluated_factory = self._generate_evaluated_factory(
+                    module, dependency_tree_edges, dependency_tree_modules)
+                self.factory_sources[dependency] = "\n".join([
+                    _unparse_statement(ast.fix_missing_locations(
+                        self.factories[dependency]), True),
+                    _unparse_statement(ast.fix_missing_locations(
+                        evaluated_factory), False)
+                ])
+            # factories are function definitions, which `ast.unparse`
+            # separates with an empty line
+            chunks.append(("" if len(chunks) == 0 else "\n") +
+                          self.factory_sources[dependency])
+        return self._finish_output("\n".join(chunks))
+
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), "tests", "data")
+# the programs in `TEST_DATA_DIR` which print something when run directly
+TEST_PROGRAMS = ["main.py", "conditional_imports.py", "const.py"]
+
+
+class CompilerTestMethods(unittest.TestCase):
+    def _compile(self, path: str, **options) -> str:
+        with open(path) as file:
+            source = file.read()
+        return Compiler(source, path, CompilerOptions(**options))()
+
+    def _run(self, arguments: list[str], cwd: str) -> str:
+        return subprocess.run([sys.executable, "-B", *arguments], cwd=cwd,
+                              capture_output=True, text=True, check=True).stdout
+
+    def _run_files(self, files: dict[str, str], **options) -> str:
+        """ compiles and runs the program in `files`, whose entry is main.py """
+        with tempfile.TemporaryDirectory() as directory:
+            for name, source in files.items():
+                with open(os.path.join(directory, name), "w") as file:
+                    file.write(source)
+            return self._run(["-c", self._compile(
+                os.path.join(directory, "main.py"), **options)], directory)
+
+    def _assert_same_output(self, **options):
+        """ compiles each test program with `options` and runs it """
+        for program in TEST_PROGRAMS:
+            with self.subTest(program=program):
+                path = os.path.join(TEST_DATA_DIR, program)
+                expected = self._run([path], TEST_DATA_DIR)
+                # run it somewhere the modules it imports can't be found
+                with tempfile.TemporaryDirectory() as directory:
+                    self.assertEqual(self._run(
+                        ["-c", self._compile(path, **options)], directory), expected)
+
+    def test_default(self):
+        self._assert_same_output()
+
+    def test_lazy_modules(self):
+        self._assert_same_output(lazy_modules=True)
+
+    def test_direct_imports(self):
+        self._assert_same_output(direct_imports=True)
+        self._assert_same_output(direct_imports=True, lazy_modules=True)
+
+    def test_direct_imports_stable_names(self):
+        # rebuilds in the same process have to name the arguments the same
+        path = os.path.join(TEST_DATA_DIR, "main.py")
+        options = {"direct_imports": True, "short_generated_names": True}
+        first = self._compile(path, **options)
+        self.assertIn("__0__", first)
+        self.assertEqual(self._compile(path, **options), first)
+
+    def test_tree_shaking(self):
+        self._assert_same_output(tree_shaking=True)
+
+    def test_tree_shaking_rebound_names(self):
+        # kept statements assigning to a name need its earlier bindings
+        libraries = {
+            "count": "count = 0\ncount += 1\n",
+            "total": "total = 0\nfor i in range(4):\n    total += i\n",
+            "items": "items = [1]\nitems += [2]\n"
+        }
+        for name, library in libraries.items():
+            with self.subTest(name=name):
+                files = {"lib.py": library + "def f():\n    return 'f'\n",
+                         "main.py": "import lib\nprint(lib.f())\n"}
+                self.assertEqual(self._run_files(
+                    files, tree_shaking=True), "f\n")
+
+    def test_tree_shaking_star_import(self):
+        # the star import must be kept to be reported, not dropped as unused
+        with self.assertRaises(AsteriskImportError):
+            self._compile(os.path.join(
+                TEST_DATA_DIR, "asterisk.py"), tree_shaking=True)
+
+    def test_tree_shaking_module_escapes(self):
+        # each of these can look up any name of the module
+        lookups = ["lib.__dict__['unused']", "vars(lib)['unused']",
+                   "getattr(lib, name)"]
+        for lookup in lookups:
+            with self.subTest(lookup=lookup):
+                self.assertEqual(self._run_files({
+                    "lib.py": "def unused():\n    return 'kept'\n",
+                    "main.py": f"import lib\nname = 'unused'\nprint({lookup}())\n"
+                }, tree_shaking=True), "kept\n")
+
+    def test_prune_imports(self):
+        self._assert_same_output(prune_imports=True)
+
+    def test_prune_imports_star_import(self):
+        with self.assertRaises(AsteriskImportError):
+            self._compile(os.path.join(
+                TEST_DATA_DIR, "asterisk.py"), prune_imports=True)
+
+    def test_propagate_constants(self):
+        self._assert_same_output(propagate_constants=True)
+        self._assert_same_output(propagate_constants=True, lazy_modules=True)
+        files = {
+            "lib.py": "LIMIT = 3\nNAME = 'name'\nSTEP = 1\nSTEP += 1\n",
+            "main.py": "import lib\nprint(lib.LIMIT * 2, lib.NAME, lib.STEP)\n"
+        }
+        # `STEP` is reassigned, so it must not be propagated
+        self.assertEqual(self._run_files(
+            files, propagate_constants=True), "6 name 2\n")
+
+    def test_inline_functions(self):
+        self._assert_same_output(inline_functions=True)
+        self._assert_same_output(
+            inline_functions=True, propagate_constants=True)
+
+    def test_inline_functions_named_expression(self):
+        # inlining must not change when the walruses bind `x` and `y`
+        self.assertEqual(self._run_files({
+            "lib.py": "def rsub(a, b):\n    return b - a\n"
+                      "def twice(a, b):\n    return a + b + a\n",
+            "main.py": "import lib\ndef main():\n    x = 3\n"
+                       "    print(lib.rsub(x, (x := 10)))\n    y = 1\n"
+                       "    print(lib.twice(y, (y := 10)))\nmain()\n"
+        }, inline_functions=True), "7\n12\n")
+
+    def test_scope_hoisting(self):
+        self._assert_same_output(scope_hoisting=True)
+        self._assert_same_output(scope_hoisting=True, tree_shaking=True,
+                                 propagate_constants=True, inline_functions=True)
+        # the modules' names share one namespace, so they must not clash
+        self.assertEqual(self._run_files({
+            "lib.py": "value = 'lib'\ndef get():\n    return value\n",
+            "main.py": "import lib\nvalue = 'main'\nprint(value, lib.value, lib.get())\n"
+        }, scope_hoisting=True), "main lib lib\n")
+
+    def test_scope_hoisting_localize_globals(self):
+        # `global` is allowed when hoisting, so `X` isn't constant
+        self.assertEqual(self._run_files({"main.py": (
+            "X = 1\ndef bump():\n    global X\n    X += 10\n"
+            "def f():\n    seen = []\n    for _ in range(3):\n"
+            "        seen.append(X)\n        bump()\n    return seen\n"
+            "print(f())\n")}, scope_hoisting=True, plugins=[LocalizePlugin()]),
+            "[1, 11, 21]\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
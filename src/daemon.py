@@ -0,0 +1,117 @@
+import json
+import os
+import socket
+import socketserver
+from collections import OrderedDict
+from typing import Callable
+
+from .errors import CompilerError
+from .incremental import IncrementalCompiler
+from .options import CompilerOptions
+from .plugin.constants import AssignmentToConstantError
+from .plugin.minify import MinifyPlugin
+from .resolver import ModuleResolver
+
+# creates the options for a build from the CLI arguments in a request
+OptionsFactory = Callable[[dict], CompilerOptions]
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: "_UnixServer"
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            response = self.server.daemon.build(json.loads(line))
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.UnixStreamServer):
+    daemon: "BuildDaemon"
+
+
+class BuildDaemon:
+    """
+    Serves builds over a Unix domain socket, keeping the compiler warm.
+
+    Every request is a line of JSON holding the input's `path` and `source`,
+    the CLI `options` to build it with, and the client's `cwd` and
+    `search_path` (its `sys.path` without the first entry) to resolve modules
+    with, and gets a line of JSON back with either the `output` or an error
+    in the same shape as the CLI's `--json` errors. The daemon keeps an
+    `IncrementalCompiler` for each recently built (input, options, cwd,
+    search path), so repeated builds only re-process the modules which
+    changed, and nothing has to be imported again.
+
+    Requests are handled one at a time since builds share global state.
+    """
+    socket_path: str
+    create_options: OptionsFactory
+    compilers: OrderedDict[str, IncrementalCompiler]
+    max_compilers: int
+
+    def __init__(self, socket_path: str, create_options: OptionsFactory, max_compilers: int = 32) -> None:
+        self.socket_path = socket_path
+        self.create_options = create_options
+        self.compilers = OrderedDict()
+        self.max_compilers = max_compilers
+
+    def build(self, request: dict) -> dict:
+        """ builds one request, returning the response to send back """
+        # relative entries are relative to the client's directory
+        search_path = [os.path.normpath(os.path.join(request["cwd"], entry))
+                       for entry in request["search_path"]]
+        key = json.dumps([request["path"], request["options"], request["cwd"], search_path],
+                         sort_keys=True)
+        try:
+            options = self.create_options(request["options"])
+            compiler = self.compilers.get(key)
+            if compiler is None or (compiler.source != request["source"]
+                                    and not os.path.exists(request["path"])):
+                # a file's changes are picked up by the compiler itself, but
+                # stdin has no file to watch
+                compiler = IncrementalCompiler(
+                    request["source"], request["path"], options)
+                compiler.resolver = ModuleResolver(search_path)
+            else:
+                # identical options only differ in the docstring's build time
+                compiler.options.docstring = options.docstring
+            self.compilers[key] = compiler
+            self.compilers.move_to_end(key)
+            while len(self.compilers) > self.max_compilers:
+                self.compilers.popitem(last=False)
+            output = compiler()
+            # the output is only sent once it's verified, since a failed build
+            # can't be reported after that
+            compiler.finish()
+            return {"output": output, "minify": [
+                report for plugin in compiler.options.plugins
+                if isinstance(plugin, MinifyPlugin) for report in plugin.report()]}
+        except CompilerError as err:
+            # the compiler's graph is left as it was before the failed build,
+            # so it can still be used for the next request
+            return {"error": True, "name": err.errcode, "msg": str(err)}
+        except AssignmentToConstantError as err:
+            return {"error": True, "name": "assignment-to-constant", "msg": str(err)}
+
+    def serve_forever(self) -> None:
+        """ listens on the socket until interrupted """
+        self._remove_stale_socket()
+        with _UnixServer(self.socket_path, _RequestHandler) as server:
+            server.daemon = self
+            try:
+                server.serve_forever()
+            finally:
+                os.unlink(self.socket_path)
+
+    def _remove_stale_socket(self) -> None:
+        if not os.path.exists(self.socket_path):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            try:
+                connection.connect(self.socket_path)
+            except OSError:
+                # left behind by a daemon which didn't shut down cleanly
+                os.unlink(self.socket_path)
+                return
+        raise OSError(f"a build daemon is already listening on {self.socket_path}")
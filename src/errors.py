@@ -29,6 +29,12 @@ class _terminal_colors:
 class CompilerError(Exception):
     errcode: str
 
+    def __reduce__(self):
+        # errors are constructed with keyword arguments, which `Exception`
+        # doesn't remember, so restore them from `__dict__` instead when
+        # unpickling (e.g. when an error is raised in a worker process)
+        return (self.__class__.__new__, (self.__class__,), self.__dict__)
+
 
 class TransformError(CompilerError):
     path: str
@@ -72,6 +78,24 @@ class GlobalError(TransformError):
         return f"unsupported: global statements aren't supported by python-compiler\n  {_terminal_colors.OKGREEN}{_terminal_colors.BOLD}help:{_terminal_colors.ENDC} mutating global variables are bad practice and disallowed in some thread-safe languages. try refactoring your code to pass the variable as an argument instead.\n  at {self.path} {self.lineno}:{self.colno}"
 
 
+class ScopeHoistingError(TransformError):
+    name: str
+    path: str
+    lineno: int
+    colno: int
+
+    errcode = "scope-hoisting"
+
+    def __init__(self, name: str, path: str, lineno: int, colno: int) -> None:
+        self.name = name
+        self.path = path
+        self.lineno = lineno
+        self.colno = colno
+
+    def __str__(self) -> str:
+        return f"unsupported: modules can't look up their globals by name with scope hoisting\n  {_terminal_colors.OKBLUE}{_terminal_colors.BOLD}note:{_terminal_colors.ENDC} the module's globals are renamed in the output, but {_terminal_colors.OKCYAN}{self.name}(){_terminal_colors.ENDC} would see them under their new names\n  {_terminal_colors.OKGREEN}{_terminal_colors.BOLD}help:{_terminal_colors.ENDC} pass the namespace explicitly, or build without --scope-hoisting\n  at {self.path} {self.lineno}:{self.colno}"
+
+
 class ReservedIdentifierError(TransformError):
     ident: str
     path: str
@@ -133,6 +157,18 @@ class InternalCompilerError(CompilerError):
         return f"{_terminal_colors.BOLD}internal compiler error:{_terminal_colors.ENDC} {self.message if self.message is not None else 'something went wrong'}\n  note: this is a bug. if you wouldn't mind, please report it at {_terminal_colors.UNDERLINE}https://github.com/zabackary/python-compiler/issues{_terminal_colors.ENDC}\n  {_terminal_colors.OKBLUE}{_terminal_colors.BOLD}note:{_terminal_colors.ENDC} this is a logical precondition invalidation, not a crash"
 
 
+class MinificationError(CompilerError):
+    reason: str
+
+    errcode = "unstable-minification"
+
+    def __init__(self, reason: str) -> None:
+        self.reason = reason
+
+    def __str__(self) -> str:
+        return f"the minified output doesn't parse back into the bundled code\n  {_terminal_colors.OKBLUE}{_terminal_colors.BOLD}note:{_terminal_colors.ENDC} {self.reason}\n  {_terminal_colors.OKBLUE}{_terminal_colors.BOLD}note:{_terminal_colors.ENDC} this is a bug in the minifier\n  {_terminal_colors.OKGREEN}{_terminal_colors.BOLD}help:{_terminal_colors.ENDC} build without --minify"
+
+
 class NestedModuleRecursionError(CompilerError):
     errcode = "recursion"
 
@@ -9,30 +9,122 @@ class {EXPORT_HELPER_NAME}:
 # Used to make the locals() dictionary into a attribute-accessible module
 EXPORT_HELPER_CONTENTS_MUNCH = f"""
 class {EXPORT_HELPER_NAME}(dict):
-	C=KeyError
-	A=AttributeError
 	def __init__(A,C):A.update(**C)
 	def __getattr__(B,k):
 		try:return object.__getattribute__(B,k)
-		except A:
+		except AttributeError:
 			try:return B[k]
-			except C:raise A(k)
+			except KeyError:raise AttributeError(k)
 	def __setattr__(B,k,v):
 		try:object.__getattribute__(B,k)
-		except A:
+		except AttributeError:
 			try:B[k]=v
-			except:raise A(k)
+			except:raise AttributeError(k)
 		else:object.__setattr__(B,k,v)
 	def __delattr__(B,k):
 		try:object.__getattribute__(B,k)
-		except A:
+		except AttributeError:
 			try:del B[k]
-			except C:raise A(k)
+			except KeyError:raise AttributeError(k)
 		else:object.__delattr__(B,k)
 """
+MODULE_HELPER_NAME = "__generated_helper_module__"
+# makes a real module object out of the locals() dictionary. the module type
+# is taken from `sys`, which is always loaded
+MODULE_HELPER_CONTENTS = f"""
+def {MODULE_HELPER_NAME}(A,B,C=type(__import__('sys'))):
+	A=C(A);A.__dict__.update(B);return A
+"""
+
+LAZY_HELPER_NAME = "__generated_helper_lazy__"
+# a stand-in for a module which only calls its factory the first time one of
+# its attributes is used, at most once even with several threads
+LAZY_HELPER_CONTENTS = f"""
+class {LAZY_HELPER_NAME}:
+	__slots__='_f','_a','_l','_m'
+	def __init__(A,f,*a):
+		import _thread;B=object.__setattr__;B(A,'_f',f);B(A,'_a',a);B(A,'_l',_thread.allocate_lock())
+	def _load(A):
+		B=object.__getattribute__
+		try:return B(A,'_m')
+		except AttributeError:pass
+		with B(A,'_l'):
+			try:return B(A,'_m')
+			except AttributeError:pass
+			C=B(A,'_f')(*B(A,'_a'));object.__setattr__(A,'_m',C);return C
+	def __getattribute__(A,k):return getattr({LAZY_HELPER_NAME}._load(A),k)
+	def __setattr__(A,k,v):setattr({LAZY_HELPER_NAME}._load(A),k,v)
+	def __delattr__(A,k):delattr({LAZY_HELPER_NAME}._load(A),k)
+	def __dir__(A):return dir({LAZY_HELPER_NAME}._load(A))
+"""
+
+HOISTED_HELPER_NAME = "__generated_helper_hoisted__"
+# makes a module object for a module whose top-level names were hoisted into
+# the bundle's globals, out of the globals `B` maps its names to. names the
+# module never bound are left out. functions can still rebind the names in
+# `E` with `global`, so they're looked up each time they're used instead
+HOISTED_HELPER_CONTENTS = f"""
+def {HOISTED_HELPER_NAME}(A,B,E={{}},C=globals(),D=type(__import__('sys'))):
+	A=D(A);A.__dict__.update({{k:C[v] for k,v in B.items() if v in C}})
+	if E:
+		def F(k):
+			try:return C[E[k]]
+			except KeyError:raise AttributeError(k) from None
+		A.__getattr__=F
+	return A
+"""
+
+PROFILE_HELPER_NAME = "__generated_helper_profile__"
+PROFILE_ENV_VAR = "PYTHON_COMPILER_IMPORTTIME"
+# calls a module's factory `f`, timing it. `p` is the module's path and `d`
+# the paths it imports. at exit, it writes a JSON tree like `-X importtime`'s
+# to the file named by the environment variable, or stderr. a module is
+# nested under the module whose initialization ran it (with lazy modules), or
+# else the first module importing it which ran after it
+PROFILE_HELPER_CONTENTS = f"""
+def {PROFILE_HELPER_NAME}(p,d,f,*a,S=[],R={{}},T=__import__('time').perf_counter_ns):
+	if not R:
+		def W():
+			import json,os,sys;O=list(R);K={{}};G=set()
+			for i,k in enumerate(O):
+				P=R[k][0]
+				if P is None:P=next((j for j in O[i+1:] if k in R[j][2]),None)
+				K.setdefault(P,[]).append(k)
+			def N(k):
+				G.add(k);M=Q=R[k][1];D=[]
+				for c in K.get(k,()):
+					if c in G:continue
+					E,F=N(c);D.append(E);Q+=F
+					if R[c][0]==k:M-=R[c][1];Q-=R[c][1]
+				return{{'module':k,'self_us':M//1000,'cumulative_us':Q//1000,'imports':D}},Q
+			B=[N(k)[0] for k in K.get(None,[])];B+=[N(k)[0] for k in O if k not in G];s=json.dumps(B,indent=1);C=os.environ.get('{PROFILE_ENV_VAR}')
+			if C:
+				with open(C,'w') as F:F.write(s)
+			else:print(s,file=sys.stderr)
+		__import__('atexit').register(W)
+	R[p]=[S[-1] if S else None,0,d];S.append(p);C=T()
+	try:return f(*a)
+	finally:R[p][1]=T()-C;S.pop()
+"""
 
 
 def get_export_helper(use_munch: bool = False):
     return ast.parse(
         EXPORT_HELPER_CONTENTS_MUNCH if use_munch else EXPORT_HELPER_CONTENTS_SELF_DICT,
         mode="exec").body[0]
+
+
+def get_lazy_helper():
+    return ast.parse(LAZY_HELPER_CONTENTS, mode="exec").body[0]
+
+
+def get_module_helper():
+    return ast.parse(MODULE_HELPER_CONTENTS, mode="exec").body[0]
+
+
+def get_hoisted_helper():
+    return ast.parse(HOISTED_HELPER_CONTENTS, mode="exec").body[0]
+
+
+def get_profile_helper():
+    return ast.parse(PROFILE_HELPER_CONTENTS, mode="exec").body[0]
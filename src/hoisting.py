@@ -0,0 +1,401 @@
+import ast
+import pickle
+from typing import Any, Iterator
+
+from .errors import ScopeHoistingError
+from .exporthelper import HOISTED_HELPER_NAME
+from .options import CompilerOptions
+from .processedmodule import ProcessedModule
+from .transformers import FoundImport, ModuleTransformer
+
+_FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+# calls which look up the module's globals by name, so they'd see the hoisted
+# names. `globals()` does anywhere, the others only at the top level
+_GLOBALS_CALLS = frozenset(["globals"])
+_TOP_LEVEL_GLOBALS_CALLS = frozenset(["locals", "vars", "exec", "eval"])
+
+
+def _own_children(node: ast.AST) -> list[ast.AST]:
+    """
+    returns the children of `node` which are evaluated in the scope `node` is
+    in, which for nested scopes is only what's evaluated when they're created
+    """
+    if isinstance(node, _FUNCTIONS):
+        arguments = node.args
+        annotations = [argument.annotation for argument in [
+            *arguments.posonlyargs, *arguments.args, *arguments.kwonlyargs,
+            arguments.vararg, arguments.kwarg] if argument is not None]
+        return [*node.decorator_list, *arguments.defaults,
+                *[default for default in arguments.kw_defaults if default is not None],
+                *[annotation for annotation in annotations if annotation is not None],
+                *([node.returns] if node.returns is not None else [])]
+    if isinstance(node, ast.Lambda):
+        return [*node.args.defaults,
+                *[default for default in node.args.kw_defaults if default is not None]]
+    if isinstance(node, ast.ClassDef):
+        return [*node.decorator_list, *node.bases, *node.keywords]
+    if isinstance(node, _COMPREHENSIONS):
+        return [node.generators[0].iter]
+    return list(ast.iter_child_nodes(node))
+
+
+def _scope_children(node: ast.AST) -> list[ast.AST]:
+    """ returns the children of `node` which are evaluated in its own scope """
+    if isinstance(node, ast.Lambda):
+        return [node.body]
+    if isinstance(node, _COMPREHENSIONS):
+        children: list[ast.AST] = ([node.key, node.value] if isinstance(node, ast.DictComp)
+                                   else [node.elt])
+        for index, generator in enumerate(node.generators):
+            children.extend([generator.target, *generator.ifs])
+            if index > 0:
+                children.append(generator.iter)
+        return children
+    return list(node.body)  # type: ignore[attr-defined]
+
+
+def _own_nodes(roots: list[ast.AST]) -> Iterator[ast.AST]:
+    stack = list(reversed(roots))
+    while len(stack) > 0:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(_own_children(node)))
+
+
+def _walrus_targets(node: ast.AST) -> list[str]:
+    """
+    returns the names assignment expressions in the comprehension `node`
+    bind, which are bound in the scope enclosing it
+    """
+    names: list[str] = []
+    for child in _own_nodes(_scope_children(node)):
+        if isinstance(child, ast.NamedExpr) and isinstance(child.target, ast.Name):
+            names.append(child.target.id)
+        elif isinstance(child, _COMPREHENSIONS):
+            names.extend(_walrus_targets(child))
+    return names
+
+
+def _bound_names(node: ast.AST) -> list[str]:
+    """ returns the names `node` binds in the scope it's in """
+    if isinstance(node, ast.Name):
+        return [node.id] if not isinstance(node.ctx, ast.Load) else []
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return [alias.asname if alias.asname is not None else alias.name.partition(".")[0]
+                for alias in node.names if alias.name != "*"]
+    if isinstance(node, (*_FUNCTIONS, ast.ClassDef)):
+        return [node.name]
+    if isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar)):
+        return [node.name] if node.name is not None else []
+    if isinstance(node, ast.MatchMapping):
+        return [node.rest] if node.rest is not None else []
+    if isinstance(node, ast.Nonlocal):
+        return list(node.names)
+    if isinstance(node, _COMPREHENSIONS):
+        return _walrus_targets(node)
+    return []
+
+
+class _Scope:
+    """ the names a module, function, class or comprehension binds """
+    is_module: bool
+    is_class: bool
+    bound: set[str]
+    # names declared `global` in the scope
+    declared_global: set[str]
+
+    def __init__(self, node: ast.AST) -> None:
+        self.is_module = isinstance(node, ast.Module)
+        self.is_class = isinstance(node, ast.ClassDef)
+        self.bound = set()
+        self.declared_global = set()
+        if isinstance(node, (*_FUNCTIONS, ast.Lambda)):
+            arguments = node.args
+            self.bound.update(argument.arg for argument in [
+                *arguments.posonlyargs, *arguments.args, *arguments.kwonlyargs,
+                arguments.vararg, arguments.kwarg] if argument is not None)
+        nodes = list(_own_nodes(_scope_children(node)))
+        # assignment expressions in comprehensions bind in the enclosing scope
+        walrus_targets = ({id(child.target) for child in nodes if isinstance(child, ast.NamedExpr)}
+                          if isinstance(node, _COMPREHENSIONS) else set())
+        for child in nodes:
+            if isinstance(child, ast.Global):
+                self.declared_global.update(child.names)
+            elif id(child) not in walrus_targets:
+                self.bound.update(_bound_names(child))
+
+
+def find_top_level_names(module: ast.Module) -> list[str]:
+    """
+    returns the names bound at the top level of `module`, including the ones
+    functions declare `global`, in the order they're first bound
+    """
+    names: dict[str, None] = {}
+    for child in _own_nodes(list(module.body)):
+        for name in _bound_names(child):
+            names.setdefault(name)
+    for child in ast.walk(module):
+        if isinstance(child, ast.Global):
+            for name in child.names:
+                names.setdefault(name)
+    return list(names)
+
+
+def get_hoisted_names(module: ProcessedModule) -> list[str]:
+    if module.hoisted_names is None:
+        if module.module is None:
+            module.hoisted_names = []
+        else:
+            module.hoisted_names = find_top_level_names(module.module)
+    return module.hoisted_names
+
+
+def _check_globals_calls(module: ast.Module, path: str, names: set[str]) -> None:
+    top_level = {id(child) for child in _own_nodes(list(module.body))}
+    for child in ast.walk(module):
+        if (isinstance(child, ast.Call) and isinstance(child.func, ast.Name)
+                and child.func.id not in names
+                and (child.func.id in _GLOBALS_CALLS
+                     or (child.func.id in _TOP_LEVEL_GLOBALS_CALLS and id(child) in top_level
+                         and len(child.args) < (2 if child.func.id in ("exec", "eval") else 1)
+                         and len(child.keywords) == 0))):
+            raise ScopeHoistingError(
+                child.func.id, path, child.lineno, child.col_offset)
+
+
+class _HoistingTransformer(ModuleTransformer):
+    """
+    a `ModuleTransformer` which binds names imported from hoisted modules to
+    their hoisted names, and leaves `global` statements alone
+    """
+    # hoisted names to bind `from module import name` to, by module and name
+    imported_names: dict[tuple[str, str], str]
+
+    def __init__(self, path: str, imports: list[FoundImport], argument_import_names: list[str], name: str, options: CompilerOptions, attribute_arguments: dict[tuple[str, str], str], imported_names: dict[tuple[str, str], str]) -> None:
+        super().__init__(path, imports, argument_import_names,
+                         name, options, attribute_arguments)
+        self.imported_names = imported_names
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> Any:
+        output = super().visit_ImportFrom(node)
+        if isinstance(output, list):
+            for alias, assign in zip(node.names, output):
+                hoisted_name = self.imported_names.get((node.module, alias.name))
+                if hoisted_name is not None:
+                    assign.value = ast.Name(id=hoisted_name, ctx=ast.Load())
+        return output
+
+    def visit_Global(self, node: ast.Global) -> Any:
+        return node
+
+
+class _GlobalRenamer(ast.NodeTransformer):
+    """ renames the global names of a module wherever they're used """
+    names: dict[str, str]
+    scopes: list[_Scope]
+
+    def __init__(self, names: dict[str, str]) -> None:
+        super().__init__()
+        self.names = names
+        self.scopes = []
+
+    def _is_global(self, name: str) -> bool:
+        for index, scope in enumerate(reversed(self.scopes)):
+            if scope.is_module or name in scope.declared_global:
+                return True
+            # names used in nested scopes don't resolve to classes' names
+            if scope.is_class and index > 0:
+                continue
+            if name in scope.bound:
+                return False
+        return True
+
+    def _rename(self, name: str) -> str:
+        if name in self.names and self._is_global(name):
+            return self.names[name]
+        return name
+
+    def _visit_scope(self, node: ast.AST) -> None:
+        self.scopes.append(_Scope(node))
+        if isinstance(node, ast.Lambda):
+            node.body = self.visit(node.body)
+        elif isinstance(node, _COMPREHENSIONS):
+            for child in _scope_children(node):
+                self.visit(child)
+        else:
+            self.generic_visit(node)
+        self.scopes.pop()
+
+    def visit_Module(self, node: ast.Module) -> Any:
+        self._visit_scope(node)
+        return node
+
+    def _visit_function(self, node: ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef) -> Any:
+        for child in _own_children(node):
+            self.visit(child)
+        node.name = self._rename(node.name)
+        self.scopes.append(_Scope(node))
+        node.body = [statement for child in node.body
+                     for statement in _as_list(self.visit(child))]
+        self.scopes.pop()
+        return node
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_ClassDef = _visit_function
+
+    def _visit_nested(self, node: ast.AST) -> Any:
+        for child in _own_children(node):
+            self.visit(child)
+        self._visit_scope(node)
+        return node
+
+    visit_Lambda = visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_nested
+
+    def visit_Name(self, node: ast.Name) -> Any:
+        node.id = self._rename(node.id)
+        return node
+
+    def visit_Global(self, node: ast.Global) -> Any:
+        node.names = [self._rename(name) for name in node.names]
+        return node
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> Any:
+        if node.name is not None:
+            node.name = self._rename(node.name)
+        return self.generic_visit(node)
+
+    def visit_MatchAs(self, node: ast.MatchAs) -> Any:
+        if node.name is not None:
+            node.name = self._rename(node.name)
+        return self.generic_visit(node)
+
+    visit_MatchStar = visit_MatchAs
+
+    def visit_MatchMapping(self, node: ast.MatchMapping) -> Any:
+        if node.rest is not None:
+            node.rest = self._rename(node.rest)
+        return self.generic_visit(node)
+
+    def visit_Import(self, node: ast.Import) -> Any:
+        output: list[ast.stmt] = []
+        for alias in node.names:
+            name = alias.asname if alias.asname is not None else alias.name.partition(".")[0]
+            hoisted_name = self._rename(name)
+            if hoisted_name == name:
+                output.append(ast.Import(names=[alias]))
+            elif alias.asname is not None or "." not in alias.name:
+                output.append(ast.Import(
+                    names=[ast.alias(name=alias.name, asname=hoisted_name)]))
+            else:
+                # `import a.b` binds `a`, which is what `__import__` returns
+                output.append(ast.Assign(
+                    targets=[ast.Name(id=hoisted_name, ctx=ast.Store())],
+                    value=ast.Call(
+                        func=ast.Name(id="__import__", ctx=ast.Load()),
+                        args=[ast.Constant(value=alias.name)],
+                        keywords=[]
+                    )
+                ))
+        return output
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> Any:
+        for alias in node.names:
+            if alias.name != "*":
+                name = alias.asname if alias.asname is not None else alias.name
+                hoisted_name = self._rename(name)
+                if hoisted_name != name:
+                    alias.asname = hoisted_name
+        return node
+
+
+def _names_dict(names: dict[str, str]) -> ast.Dict:
+    return ast.Dict(
+        keys=[ast.Constant(value=name) for name in names],
+        values=[ast.Constant(value=hoisted_name) for hoisted_name in names.values()]
+    )
+
+
+def _as_list(node: Any) -> list[ast.AST]:
+    if node is None:
+        return []
+    return node if isinstance(node, list) else [node]
+
+
+def generate_hoisted_ast(module: ProcessedModule,
+                         dependency_tree_edges: dict[str, list[str]],
+                         dependency_tree_modules: dict[str, ProcessedModule]) -> list[ast.AST]:
+    """
+    generates the statements of a module with source for a scope hoisted
+    output: the module's code with its top-level names renamed to their
+    hoisted names and the names it imports from other hoisted modules bound
+    to theirs, followed by the module object for other modules to import
+    """
+    if module.module is None:
+        raise ValueError("only modules with source can be hoisted")
+    imports = [item for index, item in enumerate(module.imports)
+               if module.pruned_imports is None or index not in module.pruned_imports]
+    targets = [dependency_tree_modules[path]
+               for path in dependency_tree_edges[module.path]]
+    imported_names: dict[tuple[str, str], str] = {}
+    for item, target in zip(imports, targets):
+        if item.is_module_import or target.module is None:
+            continue
+        target_names = set(get_hoisted_names(target))
+        for alias in item.imports or []:
+            if alias.name in target_names:
+                imported_names[(item.module, alias.name)] = target.name_generator.get_hoisted_name(
+                    alias.name)
+    attribute_names: dict[tuple[str, str], str] = {}
+    for alias, attribute, path in module.direct_attributes or []:
+        target = dependency_tree_modules[path]
+        if attribute in get_hoisted_names(target):
+            attribute_names[(alias, attribute)] = target.name_generator.get_hoisted_name(
+                attribute)
+
+    # the module can be generated again by later builds, so it's left as it is
+    transformed_module: ast.Module = _HoistingTransformer(
+        module.path,
+        imports,
+        [target.name_generator.get_evaluated_factory() for target in targets],
+        module.name,
+        module.options,
+        attribute_names,
+        imported_names
+    ).visit(pickle.loads(pickle.dumps(module.module, pickle.HIGHEST_PROTOCOL)))
+
+    body: list[ast.AST] = []
+    if module.name == "__main__":
+        # the main module's names are the output's own globals, like they'd
+        # be if it was run directly
+        body.extend(transformed_module.body)
+    else:
+        names = get_hoisted_names(module)
+        _check_globals_calls(transformed_module, module.path, set(names))
+        hoisted_names = {name: module.name_generator.get_hoisted_name(name)
+                         for name in names}
+        # names which functions rebind can change after the module ran
+        changing_names = {name for child in ast.walk(transformed_module)
+                          if isinstance(child, ast.Global) for name in child.names}
+        body.extend(_GlobalRenamer(hoisted_names).visit(
+            transformed_module).body)
+        body.append(ast.Assign(
+            targets=[ast.Name(
+                id=module.name_generator.get_evaluated_factory(), ctx=ast.Store())],
+            value=ast.Call(
+                func=ast.Name(id=HOISTED_HELPER_NAME, ctx=ast.Load()),
+                args=[
+                    ast.Constant(value=module.name),
+                    _names_dict({name: hoisted_name for name, hoisted_name in hoisted_names.items()
+                                 if name not in changing_names}),
+                    *([_names_dict({name: hoisted_name for name, hoisted_name in hoisted_names.items()
+                                    if name in changing_names})] if len(changing_names) > 0 else [])
+                ],
+                keywords=[]
+            )
+        ))
+
+    # let plugins do their thing with the processed body
+    for plugin in module.options.plugins:
+        body = plugin.hook_module_post_transform(
+            module.path, body, module.name_generator)
+    return body
@@ -0,0 +1,255 @@
+import hashlib
+import os
+import tempfile
+import unittest
+
+from .compiler import Compiler, FactoryCachingCompiler
+from .errors import ImportResolutionError, NestedModuleRecursionError
+from .options import CompilerOptions
+from .processedmodule import ProcessedModule
+
+FileStamp = tuple[int, int]
+
+
+def _file_stamp(path: str) -> FileStamp | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _hash_source(source: str) -> str:
+    return hashlib.sha1(source.encode("utf-8", "surrogatepass"),
+                        usedforsecurity=False).hexdigest()
+
+
+class IncrementalCompiler(FactoryCachingCompiler):
+    """
+    A long-lived `Compiler` which remembers the module graph between builds.
+
+    The first call does a full build. After that, each call stats every module
+    in the graph and only re-processes the ones whose contents changed (and
+    resolves their imports again), reusing the factories generated for all the
+    other modules. Use `poll` to cheaply check whether a rebuild is needed.
+
+    Note that unchanged modules aren't resolved again, so adding a file which
+    would shadow an existing import's resolution needs a new compiler.
+    """
+    dependency_tree_edges: dict[str, list[str]]
+    dependency_tree_modules: dict[str, ProcessedModule]
+    # stats and source hashes of the modules that are real files
+    stamps: dict[str, FileStamp]
+    hashes: dict[str, str]
+
+    def __init__(self, source: str, path: str, options: CompilerOptions = CompilerOptions()) -> None:
+        super().__init__(source, path, options)
+        self.dependency_tree_edges = {}
+        self.dependency_tree_modules = {}
+        self.stamps = {}
+        self.hashes = {}
+
+    def __call__(self) -> str:
+        try:
+            if len(self.dependency_tree_modules) == 0:
+                self._build()
+            else:
+                self._update(self._changed_sources())
+            dependencies = self._sort_dependencies(self.dependency_tree_edges)
+            self._link(self.dependency_tree_edges, self.dependency_tree_modules,
+                       [(self.dependency_tree_modules[self.path], self.dependency_tree_edges[self.path])])
+            # pruning doesn't change the graph, which is kept as it was walked
+            dependencies, dependency_tree_edges = self._prune(
+                self.path, dependencies, self.dependency_tree_edges, self.dependency_tree_modules)
+            return self._generate_output(dependencies, dependency_tree_edges, self.dependency_tree_modules)
+        except RecursionError:
+            raise NestedModuleRecursionError()
+
+    def poll(self) -> list[str]:
+        """ returns the paths of modules which might have changed since the last build """
+        return [path for path, stamp in self.stamps.items()
+                if _file_stamp(path) != stamp]
+
+    def _build(self) -> None:
+        cache = self._open_cache()
+        main_processed_module = ProcessedModule(
+            self.source, self.path, "__main__", self.options, cache)
+        self._walk_dependencies(
+            [main_processed_module], self.dependency_tree_edges, self.dependency_tree_modules, cache)
+        for path in self.dependency_tree_modules:
+            self._record(path, None)
+
+    def _reload_modules(self, paths: list[str], dependency_tree_modules: dict[str, ProcessedModule]) -> None:
+        cache = self._open_cache()
+        for path in paths:
+            if path == self.path:
+                # the main module might not be a file
+                source = self.source
+            else:
+                try:
+                    with open(path, "r") as file:
+                        source = file.read()
+                except OSError:
+                    raise ImportResolutionError(
+                        path=path, module=dependency_tree_modules[path].name, os_error_read_path=path)
+            dependency_tree_modules[path] = ProcessedModule(
+                source, path, dependency_tree_modules[path].name, self.options, cache)
+            self.factories.pop(path, None)
+            self.factory_sources.pop(path, None)
+
+    def _record(self, path: str, source: str | None) -> None:
+        """ remembers the current stat and contents of the module at `path` """
+        stamp = _file_stamp(path)
+        if stamp is None:
+            # built-in or virtual module, nothing to watch
+            return
+        if source is None:
+            if path == self.path:
+                source = self.source
+            else:
+                try:
+                    with open(path, "r") as file:
+                        source = file.read()
+                except OSError:
+                    return
+        self.stamps[path] = stamp
+        self.hashes[path] = _hash_source(source)
+
+    def _changed_sources(self) -> dict[str, str | None]:
+        """
+        finds the modules whose contents changed since the last build and
+        returns their new source, or None if they were deleted
+        """
+        changed: dict[str, str | None] = {}
+        for path in self.poll():
+            try:
+                with open(path, "r") as file:
+                    source = file.read()
+            except OSError:
+                changed[path] = None
+                continue
+            if _hash_source(source) != self.hashes[path]:
+                changed[path] = source
+            else:
+                # only the stat changed (e.g. the file was touched)
+                self.stamps[path] = _file_stamp(path) or self.stamps[path]
+        return changed
+
+    def _update(self, changed: dict[str, str | None]) -> None:
+        if len(changed) == 0:
+            return
+        cache = self._open_cache()
+        # work on copies so a failed build leaves the last good graph intact
+        dependency_tree_edges = dict(self.dependency_tree_edges)
+        dependency_tree_modules = dict(self.dependency_tree_modules)
+        dependency_queue: list[ProcessedModule] = []
+        invalidated: set[str] = set()
+        # modules whose imports are resolved again, so only their factory's
+        # evaluation needs to be regenerated
+        reresolved: set[str] = set()
+        for path, source in changed.items():
+            old_module = dependency_tree_modules.pop(path)
+            del dependency_tree_edges[path]
+            invalidated.add(path)
+            if source is None:
+                if path == self.path:
+                    raise ImportResolutionError(
+                        path=path, module=old_module.name, os_error_read_path=path)
+                # resolve the deleted module's importers again so they either
+                # find it somewhere else or fail to resolve it
+                for importer, edges in self.dependency_tree_edges.items():
+                    if path in edges and importer in dependency_tree_modules:
+                        reresolved.add(importer)
+                        dependency_queue.append(
+                            dependency_tree_modules.pop(importer))
+                        del dependency_tree_edges[importer]
+            else:
+                dependency_queue.append(ProcessedModule(
+                    source, path, old_module.name, self.options, cache))
+        self._walk_dependencies(
+            dependency_queue, dependency_tree_edges, dependency_tree_modules, cache)
+
+        # forget modules that aren't imported anymore
+        reachable: set[str] = set()
+        stack = [self.path]
+        while len(stack) > 0:
+            path = stack.pop()
+            if path not in reachable:
+                reachable.add(path)
+                stack.extend(dependency_tree_edges[path])
+        for path in list(dependency_tree_modules):
+            if path not in reachable:
+                del dependency_tree_modules[path]
+                del dependency_tree_edges[path]
+                invalidated.add(path)
+
+        # commit the new graph
+        for path in reresolved:
+            self.factory_sources.pop(path, None)
+        for path in invalidated:
+            self.factories.pop(path, None)
+            self.factory_sources.pop(path, None)
+            self.stamps.pop(path, None)
+            self.hashes.pop(path, None)
+        for path in dependency_tree_modules:
+            if path not in self.dependency_tree_modules or path in changed:
+                self._record(path, changed.get(path))
+        if self.path in changed and changed[self.path] is not None:
+            self.source = changed[self.path]  # type: ignore
+        self.dependency_tree_edges = dependency_tree_edges
+        self.dependency_tree_modules = dependency_tree_modules
+
+
+class IncrementalCompilerTestMethods(unittest.TestCase):
+    # the sources of main.py, lib.py and other.py after each edit
+    EDITS: list[dict[str, str]] = [
+        {
+            "main.py": "import lib\nprint(lib.f())\n",
+            "lib.py": "LIMIT = 3\ndef f():\n    return LIMIT\ndef g():\n    return 'g'\n",
+            "other.py": "def h():\n    return 'h'\n"
+        },
+        # the imported module changes
+        {"lib.py": "LIMIT = 4\ndef f():\n    return LIMIT + 1\ndef g():\n    return 'g'\n"},
+        # the importer uses more of it and imports another module
+        {"main.py": "import lib\nimport other\nprint(lib.f(), lib.g(), other.h())\n"},
+        # both change at once
+        {
+            "main.py": "import lib\nprint(lib.g())\n",
+            "lib.py": "import other\nLIMIT = 5\ndef f():\n    return LIMIT\n"
+                      "def g():\n    return other.h() + 'g'\n"
+        },
+        # the importer stops using what the imported module imports
+        {"main.py": "import lib\nprint(lib.f())\n"}
+    ]
+
+    def _write(self, directory: str, files: dict[str, str], time: int) -> None:
+        for name, source in files.items():
+            path = os.path.join(directory, name)
+            with open(path, "w") as file:
+                file.write(source)
+            # edits are seen by their stat, which might not change otherwise
+            os.utime(path, ns=(time, time))
+
+    def test_rebuilds(self):
+        for options in [{}, {"tree_shaking": True}, {"propagate_constants": True},
+                        {"direct_imports": True}, {"scope_hoisting": True},
+                        {"tree_shaking": True, "propagate_constants": True,
+                         "direct_imports": True, "scope_hoisting": True}]:
+            with self.subTest(options=options), tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "main.py")
+                compiler = None
+                for time, files in enumerate(self.EDITS):
+                    self._write(directory, files, (time + 1) * 10 ** 9)
+                    with open(path) as file:
+                        source = file.read()
+                    if compiler is None:
+                        compiler = IncrementalCompiler(source, path, CompilerOptions(**options))
+                    else:
+                        self.assertIn(path if "main.py" in files else os.path.join(
+                            directory, "lib.py"), compiler.poll())
+                    self.assertEqual(compiler(), Compiler(
+                        source, path, CompilerOptions(**options))(), f"after edit {time}")
+
+
+if __name__ == "__main__":
+    unittest.main()
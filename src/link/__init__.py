@@ -0,0 +1,23 @@
+"""
+Link-time passes, which run over the whole dependency tree after every
+module has been processed and before any code is generated.
+"""
+from .constants import ModuleConstants, get_constants, propagate_constants
+from .direct import (ModuleBindings, find_bindings, find_direct_imports,
+                     find_unsealed, get_bindings, set_direct_imports)
+from .inlining import (InlinableFunction, ModuleFunctions, get_functions,
+                       inline_functions)
+from .pruning import (get_pruned_imports, is_side_effect_free, prune_edges,
+                      prune_modules)
+from .summary import (ModuleSummary, StatementSummary, get_import_targets,
+                      get_summary, is_removable, summarize_module)
+from .treeshaking import TreeShaker, drop_statements
+
+__all__ = ["ModuleSummary", "StatementSummary", "get_import_targets",
+           "get_summary", "is_removable", "summarize_module", "TreeShaker",
+           "drop_statements", "get_pruned_imports", "is_side_effect_free",
+           "prune_edges", "prune_modules", "ModuleBindings", "find_bindings",
+           "find_direct_imports", "get_bindings", "set_direct_imports",
+           "find_unsealed", "ModuleConstants", "get_constants",
+           "propagate_constants", "InlinableFunction", "ModuleFunctions",
+           "get_functions", "inline_functions"]
@@ -0,0 +1,214 @@
+import ast
+import math
+from dataclasses import dataclass, field
+from typing import Any
+
+from ..options import CompilerOptions
+from ..processedmodule import ProcessedModule
+from .direct import ModuleBindings, _find_final_names, find_bindings, find_unsealed
+from .summary import get_import_targets
+
+# strings and bytes longer than this aren't copied to every use
+MAX_INLINED_LENGTH = 64
+
+
+@dataclass
+class ModuleConstants:
+    """ what a module binds and imports at the top level before anything is inlined into it """
+    bindings: ModuleBindings
+    # `import module as alias` and `from module import name as alias` which
+    # nothing else binds or uses before them, as `alias: (module, name, index)`
+    # with `name` None for the former
+    imports: dict[str, tuple[str, str | None, int]] = field(default_factory=dict)
+    # literals the module binds once, as `name: (value, index)`
+    literals: dict[str, tuple[Any, int]] = field(default_factory=dict)
+    # the literals the module exports once other modules' are inlined into it
+    exported: dict[str, Any] | None = None
+
+
+def _literal(node: ast.expr | None) -> ast.Constant | None:
+    """ returns `node` as a constant if it's a literal worth inlining """
+    if (isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub))
+            and isinstance(node.operand, ast.Constant)
+            and type(node.operand.value) in (int, float, complex)):
+        value = node.operand.value
+        return ast.Constant(value=-value if isinstance(node.op, ast.USub) else value)
+    if not isinstance(node, ast.Constant):
+        return None
+    if isinstance(node.value, (str, bytes)):
+        return node if len(node.value) <= MAX_INLINED_LENGTH else None
+    if node.value is None or type(node.value) in (bool, int, float, complex):
+        return node
+    return None
+
+
+def _constant_node(value: Any) -> ast.expr:
+    # `ast.unparse` doesn't parenthesize negative constants, so `(-1) ** 2`
+    # would come out as `-1 ** 2`
+    if type(value) in (int, float) and math.copysign(1, value) < 0:
+        return ast.UnaryOp(op=ast.USub(), operand=ast.Constant(value=-value))
+    return ast.Constant(value=value)
+
+
+def _find_literals(module: ast.Module, bindings: ModuleBindings) -> dict[str, tuple[Any, int]]:
+    literals: dict[str, tuple[Any, int]] = {}
+    if bindings.dynamic:
+        return literals
+    for index, statement in enumerate(module.body):
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+            target, value = statement.targets[0], statement.value
+        elif isinstance(statement, ast.AnnAssign) and statement.simple == 1:
+            target, value = statement.target, statement.value
+        else:
+            continue
+        constant = _literal(value)
+        if (constant is not None and isinstance(target, ast.Name)
+                and bindings.bindings[target.id] == 1 and target.id not in bindings.deleted):
+            literals[target.id] = (constant.value, index)
+    return literals
+
+
+def _find_imports(module: ast.Module, bindings: ModuleBindings, targets: set[str]) -> dict[str, tuple[str, str | None, int]]:
+    first_reference: dict[str, int] = {}
+    for index, statement in enumerate(module.body):
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name):
+                first_reference.setdefault(node.id, index)
+    imports: dict[str, tuple[str, str | None, int]] = {}
+    for index, statement in enumerate(module.body):
+        if isinstance(statement, ast.Import):
+            found = [(alias.asname if alias.asname is not None else alias.name, alias.name, None)
+                     for alias in statement.names]
+        elif isinstance(statement, ast.ImportFrom) and statement.module is not None:
+            found = [(alias.asname if alias.asname is not None else alias.name, statement.module, alias.name)
+                     for alias in statement.names if alias.name != "*"]
+        else:
+            continue
+        for bound, imported_module, name in found:
+            if ("." not in bound and imported_module in targets
+                    and bindings.bindings[bound] == 1
+                    and first_reference.get(bound, index) >= index):
+                imports[bound] = (imported_module, name, index)
+    return imports
+
+
+def get_constants(module: ProcessedModule) -> ModuleConstants:
+    """
+    returns what constant propagation needs to know about `module` (which
+    must have source), found the first time it's linked
+    """
+    assert module.module is not None
+    if module.link_constants is None:
+        bindings = find_bindings(module.module)
+        module.link_constants = ModuleConstants(
+            bindings,
+            _find_imports(module.module, bindings, {item.module for item in module.imports}),
+            _find_literals(module.module, bindings))
+    return module.link_constants
+
+
+class _ConstantInliner(ast.NodeTransformer):
+    names: dict[str, Any]
+    attributes: dict[tuple[str, str], Any]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.names = {}
+        self.attributes = {}
+
+    def visit_Name(self, node: ast.Name) -> Any:
+        if isinstance(node.ctx, ast.Load) and node.id in self.names:
+            return ast.copy_location(_constant_node(self.names[node.id]), node)
+        return node
+
+    def visit_Attribute(self, node: ast.Attribute) -> Any:
+        if (isinstance(node.ctx, ast.Load) and isinstance(node.value, ast.Name)
+                and (node.value.id, node.attr) in self.attributes):
+            return ast.copy_location(_constant_node(self.attributes[(node.value.id, node.attr)]), node)
+        self.generic_visit(node)
+        return node
+
+
+def _inline(module: ast.Module,
+            names: dict[str, tuple[Any, int]],
+            attributes: dict[tuple[str, str], tuple[Any, int]]) -> None:
+    # each name is only replaced after the statement binding it, where it
+    # can't be anything else
+    bound_by: dict[int, list[tuple[str | tuple[str, str], Any]]] = {}
+    for name, (value, index) in names.items():
+        bound_by.setdefault(index, []).append((name, value))
+    for key, (value, index) in attributes.items():
+        bound_by.setdefault(index, []).append((key, value))
+    inliner = _ConstantInliner()
+    for index, statement in enumerate(module.body):
+        inliner.visit(statement)
+        for key, value in bound_by.get(index, []):
+            if isinstance(key, tuple):
+                inliner.attributes[key] = value
+            else:
+                inliner.names[key] = value
+
+
+def propagate_constants(modules: list[tuple[ProcessedModule, list[str]]],
+                        options: CompilerOptions,
+                        inline_attributes: bool) -> list[str]:
+    """
+    inlines the literals which bundled modules bind once at the top level and
+    never change, where they're used in the modules importing them (by `from
+    module import name`, or as `alias.name` with `inline_attributes`) and in
+    the modules themselves. `modules` (with their edges) must be ordered so
+    that every module comes after the ones it imports. plugins'
+    `hook_module_post_link` then get to simplify the modules which changed.
+
+    returns the paths of the modules which were already linked with other
+    literals, which have to be processed again
+    """
+    constants: dict[int, ModuleConstants] = {}
+    targets: dict[int, dict[str, str]] = {}
+    for module, edges in modules:
+        if module.module is not None:
+            constants[id(module)] = get_constants(module)
+            targets[id(module)] = get_import_targets(module, edges)
+    unsealed = find_unsealed(
+        modules, {key: value.bindings for key, value in constants.items()}, targets)
+    by_path = {module.path: module for module, _ in modules}
+
+    stale: list[str] = []
+    for module, _ in modules:
+        if module.module is None:
+            continue
+        module_constants = constants[id(module)]
+        names = dict(module_constants.literals)
+        attributes: dict[tuple[str, str], tuple[Any, int]] = {}
+        for alias, (imported_module, name, index) in module_constants.imports.items():
+            path = targets[id(module)][imported_module]
+            if path in unsealed:
+                continue
+            exported = constants[id(by_path[path])].exported or {}
+            if name is not None:
+                if name in exported:
+                    names[alias] = (exported[name], index)
+            elif inline_attributes:
+                for attribute, value in exported.items():
+                    if (alias, attribute) in module_constants.bindings.attribute_loads:
+                        attributes[(alias, attribute)] = (value, index)
+        # `repr` tells apart values which compare equal, like 1 and True
+        inlined = {name: repr(value) for name, (value, _) in names.items()}
+        inlined.update((f"{alias}.{attribute}", repr(value))
+                       for (alias, attribute), (value, _) in attributes.items())
+        if module.propagated_constants is not None:
+            if module.propagated_constants != inlined:
+                stale.append(module.path)
+            continue
+        module.propagated_constants = inlined
+        if len(inlined) > 0:
+            _inline(module.module, names, attributes)
+            for plugin in options.plugins:
+                module.module = plugin.hook_module_post_link(
+                    module.path, module.module)
+        bindings = find_bindings(module.module)
+        final_names = _find_final_names(module.module, bindings, options)
+        module_constants.exported = {name: value for name, (value, _)
+                                     in _find_literals(module.module, bindings).items()
+                                     if name in final_names}
+    return stale
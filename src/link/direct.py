@@ -0,0 +1,289 @@
+import ast
+from collections import Counter
+from dataclasses import dataclass, field
+
+from ..options import CompilerOptions
+from ..processedmodule import ProcessedModule
+from .summary import DYNAMIC_NAMES, MODULE_HOOK_NAMES, _assigned_names, get_import_targets
+
+
+@dataclass
+class ModuleBindings:
+    """ how a module binds and uses names, in every scope """
+    # how many times each name is bound (or deleted) anywhere in the module
+    bindings: Counter = field(default_factory=Counter)
+    deleted: set[str] = field(default_factory=set)
+    # `name.attribute` loads, and names used in any other way, including
+    # `name.attribute` stores and deletions
+    attribute_loads: set[tuple[str, str]] = field(default_factory=set)
+    bare_uses: set[str] = field(default_factory=set)
+    # `import module as alias` anywhere in the module as `(alias, module)`
+    imports: list[tuple[str, str]] = field(default_factory=list)
+    # names imported with `from module import name`
+    from_imported: set[str] = field(default_factory=set)
+    # whether the module looks up or changes names dynamically
+    dynamic: bool = False
+    # see `_find_direct_aliases` and `_find_final_names`
+    direct_aliases: dict[str, str] = field(default_factory=dict)
+    final_names: set[str] = field(default_factory=set)
+
+
+class _BindingVisitor(ast.NodeVisitor):
+    bindings: ModuleBindings
+
+    def __init__(self, bindings: ModuleBindings) -> None:
+        super().__init__()
+        self.bindings = bindings
+
+    def _bind(self, name: str) -> None:
+        self.bindings.bindings[name] += 1
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Load):
+            self.bindings.bare_uses.add(node.id)
+            if node.id in DYNAMIC_NAMES:
+                self.bindings.dynamic = True
+        else:
+            self._bind(node.id)
+            if isinstance(node.ctx, ast.Del):
+                self.bindings.deleted.add(node.id)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if not isinstance(node.value, ast.Name):
+            self.visit(node.value)
+        elif isinstance(node.ctx, ast.Load):
+            self.bindings.attribute_loads.add((node.value.id, node.attr))
+        else:
+            self.bindings.bare_uses.add(node.value.id)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        self._bind(node.name)
+        if node.name in MODULE_HOOK_NAMES:
+            self.bindings.dynamic = True
+        self.generic_visit(node)
+
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
+        self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_arg(self, node: ast.arg) -> None:
+        self._bind(node.arg)
+        self.generic_visit(node)
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            bound = alias.asname if alias.asname is not None else alias.name
+            self._bind(bound)
+            self.bindings.imports.append((bound, alias.name))
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        for alias in node.names:
+            self._bind(alias.asname if alias.asname is not None else alias.name)
+            self.bindings.from_imported.add(alias.name)
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> None:
+        if node.name is not None:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchAs(self, node: ast.MatchAs) -> None:
+        if node.name is not None:
+            self._bind(node.name)
+        self.generic_visit(node)
+
+    def visit_MatchStar(self, node: ast.MatchStar) -> None:
+        if node.name is not None:
+            self._bind(node.name)
+
+    def visit_MatchMapping(self, node: ast.MatchMapping) -> None:
+        if node.rest is not None:
+            self._bind(node.rest)
+        self.generic_visit(node)
+
+    def visit_Nonlocal(self, node: ast.Nonlocal) -> None:
+        for name in node.names:
+            self._bind(name)
+
+
+def find_bindings(module: ast.Module) -> ModuleBindings:
+    bindings = ModuleBindings()
+    _BindingVisitor(bindings).visit(module)
+    return bindings
+
+
+def _find_direct_aliases(module: ast.Module, bindings: ModuleBindings, targets: set[str]) -> dict[str, str]:
+    """
+    maps the bundled modules imported by `module` to the alias of a top-level
+    `import module as alias` which nothing else binds or uses before it, so
+    it can be a parameter of the factory from the start
+    """
+    first_reference: dict[str, int] = {}
+    for index, statement in enumerate(module.body):
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name):
+                first_reference.setdefault(node.id, index)
+    aliases: dict[str, str] = {}
+    for index, statement in enumerate(module.body):
+        if not isinstance(statement, ast.Import):
+            continue
+        for alias in statement.names:
+            bound = alias.asname if alias.asname is not None else alias.name
+            if ("." not in bound and alias.name in targets
+                    and bindings.bindings[bound] == 1
+                    and first_reference.get(bound, index) >= index):
+                aliases.setdefault(alias.name, bound)
+    return aliases
+
+
+def _find_final_names(module: ast.Module, bindings: ModuleBindings, options: CompilerOptions) -> set[str]:
+    """
+    returns the exported names which every run of the module binds at the top
+    level and nothing rebinds or deletes once it's done
+    """
+    static = (options.export_names_mode == "static"
+              or options.export_dictionary_mode in ("class", "class_instance"))
+    names: set[str] = set()
+    for statement in module.body:
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(statement.name)
+        elif isinstance(statement, ast.Assign):
+            for target in statement.targets:
+                # only plain names are exported statically
+                target_names = [target.id] if isinstance(target, ast.Name) else (
+                    None if static else _assigned_names(target))
+                names.update(target_names or [])
+        elif (isinstance(statement, ast.AnnAssign) and statement.value is not None
+              and isinstance(statement.target, ast.Name)):
+            names.add(statement.target.id)
+        elif isinstance(statement, ast.Import):
+            names.update(alias.asname if alias.asname is not None else alias.name
+                         for alias in statement.names)
+        elif isinstance(statement, ast.ImportFrom):
+            names.update(alias.asname if alias.asname is not None else alias.name
+                         for alias in statement.names)
+    return {name for name in names
+            if name not in bindings.deleted and "." not in name
+            and not (name.startswith("__") and name.endswith("__"))
+            and not (static and name.startswith("_"))}
+
+
+def get_bindings(module: ProcessedModule, options: CompilerOptions) -> ModuleBindings:
+    """
+    returns the bindings of `module` (which must have source), found the first
+    time it's linked. factories are generated from the same tree in place, so
+    it can't be looked at again once they are
+    """
+    assert module.module is not None
+    if module.link_bindings is None:
+        bindings = find_bindings(module.module)
+        bindings.direct_aliases = _find_direct_aliases(
+            module.module, bindings, {item.module for item in module.imports})
+        bindings.final_names = _find_final_names(
+            module.module, bindings, options)
+        module.link_bindings = bindings
+    return module.link_bindings
+
+
+def find_unsealed(modules: list[tuple[ProcessedModule, list[str]]],
+                  bindings: dict[int, ModuleBindings],
+                  targets: dict[int, dict[str, str]]) -> set[str]:
+    """
+    returns the paths of the bundled modules among `modules` (with their
+    edges) whose exports might change after they're created, given the
+    bindings and import targets of each module with source by `id`. a module
+    is sealed if it doesn't look up names dynamically, and every module
+    importing it only ever loads attributes of its aliases, which aren't
+    special or exported themselves
+    """
+    by_path = {module.path: module for module, _ in modules if module.name != "__main__"}
+    unsealed: set[str] = {path for path, module in by_path.items()
+                          if module.module is None or bindings[id(module)].dynamic}
+    aliases_of: dict[str, set[str]] = {}
+    accessed: set[str] = set()
+    for module, _ in modules:
+        if module.module is None:
+            continue
+        module_bindings = bindings[id(module)]
+        accessed.update(attribute for _, attribute in module_bindings.attribute_loads)
+        accessed.update(module_bindings.from_imported)
+        module_aliases: dict[str, str] = {}
+        for alias, imported_module in module_bindings.imports:
+            if imported_module not in targets[id(module)]:
+                continue
+            path = targets[id(module)][imported_module]
+            module_aliases[alias] = path
+            aliases_of.setdefault(path, set()).add(alias)
+            if module_bindings.dynamic or alias in module_bindings.bare_uses:
+                unsealed.add(path)
+        for alias, attribute in module_bindings.attribute_loads:
+            # e.g. `alias.__dict__` can change the module's exports
+            if alias in module_aliases and attribute.startswith("__"):
+                unsealed.add(module_aliases[alias])
+    for path, aliases in aliases_of.items():
+        # another module can get at the module object through this one
+        if not aliases.isdisjoint(accessed):
+            unsealed.add(path)
+    return unsealed
+
+
+def find_direct_imports(modules: list[tuple[ProcessedModule, list[str]]],
+                        options: CompilerOptions,
+                        hoist_attributes: bool) -> dict[int, tuple[dict[str, str], list[tuple[str, str, str]]]]:
+    """
+    decides, for each of `modules` (with their edges), which imports become
+    factory parameters named after their alias and, with `hoist_attributes`,
+    which `alias.attribute` loads become parameters of their own, bound to
+    the attribute of the imported module's exports when the factory is
+    called. results are keyed by the `id` of the module.
+
+    an attribute is only hoisted if the module exporting it always binds it
+    and nothing can change it afterwards, see `find_unsealed`
+    """
+    bindings: dict[int, ModuleBindings] = {}
+    targets: dict[int, dict[str, str]] = {}
+    for module, edges in modules:
+        if module.module is not None:
+            bindings[id(module)] = get_bindings(module, options)
+            targets[id(module)] = get_import_targets(module, edges)
+
+    unsealed = find_unsealed(modules, bindings, targets)
+    by_path = {module.path: module for module, _ in modules}
+
+    results: dict[int, tuple[dict[str, str], list[tuple[str, str, str]]]] = {}
+    for module, _ in modules:
+        if module.module is None:
+            continue
+        module_bindings = bindings[id(module)]
+        direct_aliases = module_bindings.direct_aliases
+        attributes: list[tuple[str, str, str]] = []
+        if hoist_attributes:
+            alias_targets = {alias: targets[id(module)][imported_module]
+                             for imported_module, alias in direct_aliases.items()}
+            for alias, attribute in sorted(module_bindings.attribute_loads):
+                path = alias_targets.get(alias)
+                if path is None or path in unsealed:
+                    continue
+                if attribute in bindings[id(by_path[path])].final_names:
+                    attributes.append((alias, attribute, path))
+        results[id(module)] = (direct_aliases, attributes)
+    return results
+
+
+def set_direct_imports(module: ProcessedModule,
+                       direct_aliases: dict[str, str],
+                       direct_attributes: list[tuple[str, str, str]]) -> bool:
+    """
+    records which imports of `module` are passed directly to its factory,
+    returning False if it was already generated differently, in which case
+    it has to be processed again
+    """
+    if module.direct_aliases is not None:
+        return (module.direct_aliases == direct_aliases
+                and module.direct_attributes == direct_attributes)
+    module.direct_aliases = direct_aliases
+    module.direct_attributes = direct_attributes
+    return True
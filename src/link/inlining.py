@@ -0,0 +1,403 @@
+import ast
+import builtins
+import copy
+from dataclasses import dataclass, field
+from typing import Any
+
+from ..options import CompilerOptions
+from ..processedmodule import ProcessedModule
+from .constants import _find_imports
+from .direct import ModuleBindings, _find_final_names, find_bindings, find_unsealed
+from .summary import get_import_targets
+
+BUILTIN_NAMES = set(dir(builtins))
+
+
+@dataclass
+class InlinableFunction:
+    """ a top-level `def name(parameters): return expression` """
+    parameters: list[str]
+    # how many of `parameters` are positional-only
+    positional_only: int
+    expression: ast.expr
+    # the built-ins the expression uses, which mustn't be bound where it's inlined
+    builtins: set[str]
+    # the index of the statement defining the function
+    index: int
+
+
+@dataclass
+class ModuleFunctions:
+    """ what function inlining needs to know about a module """
+    bindings: ModuleBindings
+    # see `ModuleConstants.imports`
+    imports: dict[str, tuple[str, str | None, int]] = field(default_factory=dict)
+    functions: dict[str, InlinableFunction] = field(default_factory=dict)
+    # see `_find_final_names`
+    final_names: set[str] = field(default_factory=set)
+    # `name` and `alias.name` the module calls
+    calls: set[str] = field(default_factory=set)
+
+
+def _events(node: ast.expr, parameters: set[str], events: list[str | None]) -> bool:
+    """
+    appends the parameters `node` loads to `events` in the order they're
+    evaluated, with None wherever evaluating `node` might run other code or
+    stops being unconditional. returns False if `node` can't be inlined
+    """
+    def visit(*nodes: ast.expr | None) -> bool:
+        return all(child is None or _events(child, parameters, events) for child in nodes)
+
+    if isinstance(node, ast.Constant):
+        return True
+    if isinstance(node, ast.Name):
+        if node.id in parameters:
+            events.append(node.id)
+        return True
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return not any(isinstance(element, ast.Starred) for element in node.elts) and visit(*node.elts)
+    if isinstance(node, ast.Attribute):
+        result = visit(node.value)
+    elif isinstance(node, ast.Subscript):
+        result = visit(node.value, node.slice)
+    elif isinstance(node, ast.Slice):
+        return visit(node.lower, node.upper, node.step)
+    elif isinstance(node, ast.Call):
+        result = (not any(isinstance(argument, ast.Starred) for argument in node.args)
+                  and not any(keyword.arg is None for keyword in node.keywords)
+                  and visit(node.func, *node.args, *(keyword.value for keyword in node.keywords)))
+    elif isinstance(node, ast.BinOp):
+        result = visit(node.left, node.right)
+    elif isinstance(node, ast.UnaryOp):
+        result = visit(node.operand)
+    elif isinstance(node, ast.Compare):
+        result = visit(node.left)
+        for comparator in node.comparators:
+            result = result and visit(comparator)
+            events.append(None)
+    elif isinstance(node, ast.BoolOp):
+        result = visit(node.values[0])
+        for value in node.values[1:]:
+            events.append(None)
+            result = result and visit(value)
+    elif isinstance(node, ast.IfExp):
+        result = visit(node.test)
+        events.append(None)
+        result = result and visit(node.body, node.orelse)
+    elif isinstance(node, ast.Set):
+        result = not any(isinstance(element, ast.Starred) for element in node.elts) and visit(*node.elts)
+    elif isinstance(node, ast.Dict):
+        result = all(key is not None for key in node.keys) and visit(
+            *(child for pair in zip(node.keys, node.values) for child in pair))
+    elif isinstance(node, ast.JoinedStr):
+        result = visit(*node.values)
+    elif isinstance(node, ast.FormattedValue):
+        result = visit(node.value, node.format_spec)
+    else:
+        # anything with a scope of its own, binding names or suspending
+        return False
+    events.append(None)
+    return result
+
+
+def _find_function(statement: ast.FunctionDef, index: int, bindings: ModuleBindings,
+                   max_size: int) -> InlinableFunction | None:
+    arguments = statement.args
+    if (len(statement.decorator_list) > 0 or len(arguments.defaults) > 0
+            or len(arguments.kwonlyargs) > 0 or arguments.vararg is not None
+            or arguments.kwarg is not None):
+        return None
+    body = statement.body
+    if (len(body) > 1 and isinstance(body[0], ast.Expr)
+            and isinstance(body[0].value, ast.Constant) and isinstance(body[0].value.value, str)):
+        # skip the docstring
+        body = body[1:]
+    if len(body) != 1 or not isinstance(body[0], ast.Return) or body[0].value is None:
+        return None
+    expression = body[0].value
+    if sum(isinstance(node, ast.expr) for node in ast.walk(expression)) > max_size:
+        return None
+    parameters = [argument.arg for argument in arguments.posonlyargs + arguments.args]
+    if not _events(expression, set(parameters), []):
+        return None
+    # the expression is evaluated where it's inlined, so it can only use its
+    # parameters and built-ins, which also rules out recursion
+    free_names = {node.id for node in ast.walk(expression)
+                  if isinstance(node, ast.Name) and node.id not in parameters}
+    if not all(name in BUILTIN_NAMES and not name.startswith("__") and bindings.bindings[name] == 0
+               for name in free_names):
+        return None
+    return InlinableFunction(parameters, len(arguments.posonlyargs), expression, free_names, index)
+
+
+def get_functions(module: ProcessedModule, options: CompilerOptions) -> ModuleFunctions:
+    """
+    returns what function inlining needs to know about `module` (which must
+    have source), found the first time it's linked
+    """
+    assert module.module is not None
+    if module.link_functions is None:
+        bindings = find_bindings(module.module)
+        functions = ModuleFunctions(bindings, _find_imports(
+            module.module, bindings, {item.module for item in module.imports}))
+        functions.final_names = _find_final_names(
+            module.module, bindings, options)
+        if not bindings.dynamic:
+            for index, statement in enumerate(module.module.body):
+                if isinstance(statement, ast.FunctionDef) and bindings.bindings[statement.name] == 1:
+                    function = _find_function(
+                        statement, index, bindings, options.inline_max_size)
+                    if function is not None:
+                        functions.functions[statement.name] = function
+        for node in ast.walk(module.module):
+            if isinstance(node, ast.Call):
+                if isinstance(node.func, ast.Name):
+                    functions.calls.add(node.func.id)
+                elif isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name):
+                    functions.calls.add(f"{node.func.value.id}.{node.func.attr}")
+        module.link_functions = functions
+    return module.link_functions
+
+
+def _bound_names(node: ast.AST) -> set[str]:
+    """ the names bound in the scope of a function, lambda or comprehension which nothing else can rebind """
+    names: set[str] = set()
+    unstable: set[str] = set()
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        arguments = node.args
+        names.update(argument.arg for argument in arguments.posonlyargs + arguments.args + arguments.kwonlyargs)
+        names.update(argument.arg for argument in (arguments.vararg, arguments.kwarg) if argument is not None)
+    if isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+        for generator in node.generators:
+            names.update(child.id for child in ast.walk(generator.target) if isinstance(child, ast.Name))
+        return names
+    if isinstance(node, ast.Lambda):
+        return names
+    pending: list[ast.AST] = list(node.body)  # type: ignore
+    while len(pending) > 0:
+        child = pending.pop()
+        if isinstance(child, (ast.Global, ast.Nonlocal)):
+            unstable.update(child.names)
+        elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef,
+                                ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+            # nested scopes can rebind names with `nonlocal`
+            unstable.update(name for nested in ast.walk(child) if isinstance(nested, ast.Nonlocal)
+                            for name in nested.names)
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(child.name)
+        elif isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+            names.add(child.id)
+        else:
+            pending.extend(ast.iter_child_nodes(child))
+    return names - unstable
+
+
+class _FunctionInliner(ast.NodeTransformer):
+    functions: dict[str, InlinableFunction]
+    attributes: dict[tuple[str, str], InlinableFunction]
+    # names nothing but the current scope can rebind, innermost last
+    scopes: list[set[str]]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.functions = {}
+        self.attributes = {}
+        self.scopes = [set()]
+
+    def _visit_scope(self, node: ast.AST, stable: set[str]) -> Any:
+        self.scopes.append(stable)
+        self.generic_visit(node)
+        self.scopes.pop()
+        return node
+
+    def _visit_function(self, node: ast.FunctionDef | ast.AsyncFunctionDef | ast.Lambda) -> Any:
+        # decorators and defaults are evaluated outside the function
+        if not isinstance(node, ast.Lambda):
+            node.decorator_list = [self.visit(decorator) for decorator in node.decorator_list]
+        node.args.defaults = [self.visit(default) for default in node.args.defaults]
+        node.args.kw_defaults = [None if default is None else self.visit(default)
+                                 for default in node.args.kw_defaults]
+        self.scopes.append(_bound_names(node))
+        if isinstance(node, ast.Lambda):
+            node.body = self.visit(node.body)
+        else:
+            node.body = [self.visit(statement) for statement in node.body]
+        self.scopes.pop()
+        return node
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+    visit_Lambda = _visit_function
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> Any:
+        return self._visit_scope(node, set())
+
+    def _visit_comprehension(self, node: ast.AST) -> Any:
+        return self._visit_scope(node, self.scopes[-1] | _bound_names(node))
+
+    visit_ListComp = _visit_comprehension
+    visit_SetComp = _visit_comprehension
+    visit_DictComp = _visit_comprehension
+    visit_GeneratorExp = _visit_comprehension
+
+    def visit_Call(self, node: ast.Call) -> Any:
+        self.generic_visit(node)
+        function = None
+        if isinstance(node.func, ast.Name):
+            function = self.functions.get(node.func.id)
+        elif isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name):
+            function = self.attributes.get((node.func.value.id, node.func.attr))
+        if function is None:
+            return node
+        inlined = self._inline(function, node)
+        return node if inlined is None else ast.copy_location(inlined, node)
+
+    def _inline(self, function: InlinableFunction, call: ast.Call) -> ast.expr | None:
+        if (len(call.args) > len(function.parameters)
+                or any(isinstance(argument, ast.Starred) for argument in call.args)):
+            return None
+        # arguments by parameter, in the order they're evaluated
+        arguments: dict[str, ast.expr] = dict(zip(function.parameters, call.args))
+        for keyword in call.keywords:
+            if (keyword.arg is None or keyword.arg in arguments
+                    or keyword.arg not in function.parameters[function.positional_only:]):
+                return None
+            arguments[keyword.arg] = keyword.value
+        if len(arguments) != len(function.parameters):
+            return None
+        if any(isinstance(node, ast.NamedExpr)
+               for argument in arguments.values() for node in ast.walk(argument)):
+            # the names it binds could be loaded by other arguments, which
+            # might be evaluated in a different order or more than once
+            return None
+
+        # arguments which can be evaluated any number of times at any point
+        free = {parameter for parameter, argument in arguments.items()
+                if isinstance(argument, ast.Constant)
+                or (isinstance(argument, ast.Name) and argument.id in self.scopes[-1])}
+        # anything else has to be evaluated in the same order as the call
+        # would, and before anything else the function does
+        ordered = [parameter for parameter in arguments if parameter not in free]
+        used: list[str] = []
+        events: list[str | None] = []
+        _events(function.expression, set(function.parameters), events)
+        after_effects = False
+        for event in events:
+            if event is None:
+                after_effects = True
+            elif event not in free:
+                if after_effects:
+                    return None
+                if event not in used:
+                    used.append(event)
+                elif not isinstance(arguments[event], ast.Name):
+                    # it would be evaluated twice
+                    return None
+                if not isinstance(arguments[event], ast.Name):
+                    after_effects = True
+        if used != [parameter for parameter in ordered if parameter in used]:
+            return None
+        if any(parameter not in used and not isinstance(arguments[parameter], ast.Name)
+               for parameter in ordered):
+            # it wouldn't be evaluated at all
+            return None
+        return _Substituter(arguments).visit(copy.deepcopy(function.expression))
+
+
+class _Substituter(ast.NodeTransformer):
+    arguments: dict[str, ast.expr]
+
+    def __init__(self, arguments: dict[str, ast.expr]) -> None:
+        super().__init__()
+        self.arguments = arguments
+
+    def visit_Name(self, node: ast.Name) -> Any:
+        if node.id in self.arguments:
+            return copy.deepcopy(self.arguments[node.id])
+        return node
+
+
+def _inline(module: ast.Module, inlinable: dict[str, tuple[InlinableFunction, int]]) -> None:
+    # calls are only inlined after the statement binding the function
+    bound_by: dict[int, list[str]] = {}
+    for key, (_, index) in inlinable.items():
+        bound_by.setdefault(index, []).append(key)
+    inliner = _FunctionInliner()
+    for index, statement in enumerate(module.body):
+        inliner.visit(statement)
+        for key in bound_by.get(index, []):
+            function = inlinable[key][0]
+            if "." in key:
+                alias, attribute = key.split(".")
+                inliner.attributes[(alias, attribute)] = function
+            else:
+                inliner.functions[key] = function
+
+
+def inline_functions(modules: list[tuple[ProcessedModule, list[str]]],
+                     options: CompilerOptions,
+                     inline_attributes: bool) -> list[str]:
+    """
+    inlines calls to small functions, which only return an expression using
+    their parameters and built-ins, where the function called is known: it's
+    defined in the same module or imported from a bundled module (by `from
+    module import name`, or as `alias.name` with `inline_attributes`), and
+    nothing can rebind it. a call is only inlined if its arguments are
+    evaluated the same way, see `_FunctionInliner._inline`. plugins'
+    `hook_module_post_link` then get to simplify the modules which changed.
+
+    returns the paths of the modules which were already linked with other
+    functions inlined, which have to be processed again
+    """
+    functions: dict[int, ModuleFunctions] = {}
+    targets: dict[int, dict[str, str]] = {}
+    for module, edges in modules:
+        if module.module is not None:
+            functions[id(module)] = get_functions(module, options)
+            targets[id(module)] = get_import_targets(module, edges)
+    unsealed = find_unsealed(
+        modules, {key: value.bindings for key, value in functions.items()}, targets)
+    by_path = {module.path: module for module, _ in modules}
+
+    stale: list[str] = []
+    for module, _ in modules:
+        if module.module is None:
+            continue
+        module_functions = functions[id(module)]
+        bindings = module_functions.bindings
+        if bindings.dynamic:
+            continue
+        # functions by `name` or `alias.name` as they're called, with the
+        # index of the statement binding them
+        inlinable: dict[str, tuple[InlinableFunction, int]] = {}
+        for name, function in module_functions.functions.items():
+            inlinable[name] = (function, function.index)
+        for alias, (imported_module, name, index) in module_functions.imports.items():
+            path = targets[id(module)][imported_module]
+            if path in unsealed:
+                continue
+            imported = functions[id(by_path[path])]
+            for attribute, function in imported.functions.items():
+                if attribute not in imported.final_names:
+                    continue
+                if name is None and inline_attributes:
+                    inlinable[f"{alias}.{attribute}"] = (function, index)
+                elif name == attribute:
+                    inlinable[alias] = (function, index)
+        # the built-ins the functions use have to be the same here
+        inlinable = {key: (function, index) for key, (function, index) in inlinable.items()
+                     if key in module_functions.calls
+                     and all(bindings.bindings[name] == 0 for name in function.builtins)}
+        inlined = {key: repr((function.parameters, function.positional_only, ast.dump(function.expression)))
+                   for key, (function, _) in inlinable.items()}
+        if module.inlined_functions is not None:
+            if module.inlined_functions != inlined:
+                stale.append(module.path)
+            continue
+        module.inlined_functions = inlined
+        if len(inlined) > 0:
+            _inline(module.module, inlinable)
+            for plugin in options.plugins:
+                module.module = plugin.hook_module_post_link(
+                    module.path, module.module)
+    return stale
@@ -0,0 +1,72 @@
+from ..processedmodule import ProcessedModule
+from ..transformers import ImportVisitor
+from .summary import get_import_targets, get_summary, is_removable
+
+
+def get_pruned_imports(module: ProcessedModule) -> frozenset[int]:
+    """
+    returns the indices of the imports of `module` which none of its
+    statements import anymore, after link-time passes dropped some of them.
+    must be called before the module's factory is generated
+    """
+    if module.pruned_imports is None:
+        imported: set[str] = set()
+        if module.module is not None:
+            imported = {item.module for item in ImportVisitor.find_imports(
+                module.module, module.path)}
+        module.pruned_imports = frozenset(
+            index for index, item in enumerate(module.imports) if item.module not in imported)
+    return module.pruned_imports
+
+
+def prune_edges(module: ProcessedModule, dependency_tree_edges: list[str]) -> list[str]:
+    """ drops the edges of the imports which `module` doesn't use anymore """
+    pruned = get_pruned_imports(module)
+    return [path for index, path in enumerate(dependency_tree_edges) if index not in pruned]
+
+
+def is_side_effect_free(module: ProcessedModule, dependency_tree_edges: list[str]) -> bool:
+    """ whether running what's left of `module` can't do anything but bind names """
+    summary = get_summary(module)
+    if summary is None:
+        # built-in modules can do anything when they're imported
+        return False
+    targets = get_import_targets(module, dependency_tree_edges)
+    dropped = module.dropped_statements or frozenset()
+    return all(is_removable(statement, targets)
+               for index, statement in enumerate(summary.statements) if index not in dropped)
+
+
+def prune_modules(entry_path: str,
+                  dependencies: list[str],
+                  dependency_tree_edges: dict[str, list[str]],
+                  dependency_tree_modules: dict[str, ProcessedModule],
+                  side_effect_free_imports: list[str]) -> tuple[list[str], dict[str, list[str]]]:
+    """
+    drops the imports nothing uses from the dependency tree, then the modules
+    which nothing imports anymore, unless they might have side effects.
+    modules imported by a name in `side_effect_free_imports` are assumed not
+    to have any. returns the dependencies which are left, in the same order,
+    and their pruned edges
+    """
+    marked: set[str] = set()
+    pruned_edges: dict[str, list[str]] = {}
+    for path in dependencies:
+        module = dependency_tree_modules[path]
+        for item, target in zip(module.imports, dependency_tree_edges[path]):
+            if item.module in side_effect_free_imports:
+                marked.add(target)
+        pruned_edges[path] = prune_edges(module, dependency_tree_edges[path])
+
+    # everything which runs anyway keeps what it imports
+    stack = [path for path in dependencies
+             if path == entry_path or (path not in marked and not is_side_effect_free(
+                 dependency_tree_modules[path], dependency_tree_edges[path]))]
+    needed: set[str] = set()
+    while len(stack) > 0:
+        path = stack.pop()
+        if path not in needed:
+            needed.add(path)
+            stack.extend(pruned_edges[path])
+    return ([path for path in dependencies if path in needed],
+            {path: edges for path, edges in pruned_edges.items() if path in needed})
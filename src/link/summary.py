@@ -0,0 +1,264 @@
+import ast
+import builtins
+from dataclasses import dataclass, field
+
+from ..processedmodule import ProcessedModule
+
+# names which let a module look up its own bindings (or another module's) by
+# string, so nothing in a module which uses them can be assumed unused
+DYNAMIC_NAMES = {"locals", "globals", "vars", "eval", "exec", "__import__"}
+# module-level functions which Python calls for attribute lookups (PEP 562)
+MODULE_HOOK_NAMES = {"__getattr__", "__dir__"}
+# decorators in class bodies which don't run any of our code
+PURE_METHOD_DECORATORS = {"staticmethod", "classmethod", "property"}
+
+
+@dataclass
+class StatementSummary:
+    """ what a top-level statement binds and references """
+    # top-level names bound by the statement, only known for removable ones
+    bound: list[str] = field(default_factory=list)
+    # every name loaded or assigned anywhere in the statement, including
+    # nested scopes
+    loads: set[str] = field(default_factory=set)
+    # `name.attribute` lookups, which are how other modules' exports are used
+    attribute_loads: set[tuple[str, str]] = field(default_factory=set)
+    # names loaded other than as `name.attribute`
+    bare_loads: set[str] = field(default_factory=set)
+    # `import module as alias` and `from module import name as alias` as
+    # `(alias, module, name)`, with `name` None for the former. `from module
+    # import *` is recorded as `("*", module, None)`, since it uses the whole
+    # module object
+    imports: list[tuple[str, str, str | None]] = field(default_factory=list)
+    # whether dropping the statement can't change what the module does,
+    # besides not binding its names
+    removable: bool = False
+
+
+@dataclass
+class ModuleSummary:
+    statements: list[StatementSummary]
+    # whether the module looks up names dynamically, see `DYNAMIC_NAMES`, or
+    # binds names it doesn't spell out with a star import
+    dynamic: bool
+
+
+class _ReferenceVisitor(ast.NodeVisitor):
+    summary: StatementSummary
+
+    def __init__(self, summary: StatementSummary) -> None:
+        super().__init__()
+        self.summary = summary
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if isinstance(node.value, ast.Name):
+            self.summary.loads.add(node.value.id)
+            self.summary.attribute_loads.add((node.value.id, node.attr))
+        else:
+            self.visit(node.value)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        # a kept statement assigning to a name (e.g. `count += 1` or a loop
+        # rebinding it) needs the name's earlier bindings too
+        self.summary.loads.add(node.id)
+        if not isinstance(node.ctx, ast.Store):
+            self.summary.bare_loads.add(node.id)
+
+
+def _is_pure(node: ast.expr | None) -> bool:
+    """ whether evaluating `node` can't run any code or fail in a way that matters """
+    if node is None or isinstance(node, (ast.Constant, ast.Name)):
+        return True
+    if isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+        return all(_is_pure(element) for element in node.elts)
+    if isinstance(node, ast.Dict):
+        return all(_is_pure(key) and _is_pure(value) for key, value in zip(node.keys, node.values))
+    if isinstance(node, ast.Lambda):
+        return _are_defaults_pure(node.args)
+    if isinstance(node, ast.UnaryOp):
+        return isinstance(node.operand, ast.Constant)
+    return False
+
+
+def _is_pure_annotation(node: ast.expr | None) -> bool:
+    """ like `_is_pure`, but also allowing typing constructs like `list[int]` """
+    if node is None or isinstance(node, (ast.Constant, ast.Name)):
+        return True
+    if isinstance(node, ast.Attribute):
+        return _is_pure_annotation(node.value)
+    if isinstance(node, ast.Subscript):
+        return _is_pure_annotation(node.value) and _is_pure_annotation(node.slice)
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return all(_is_pure_annotation(element) for element in node.elts)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+        return _is_pure_annotation(node.left) and _is_pure_annotation(node.right)
+    return False
+
+
+def _are_defaults_pure(arguments: ast.arguments) -> bool:
+    return all(_is_pure(default) for default in arguments.defaults + arguments.kw_defaults)
+
+
+def _are_annotations_pure(function: ast.FunctionDef | ast.AsyncFunctionDef) -> bool:
+    arguments = function.args
+    all_arguments = arguments.posonlyargs + arguments.args + arguments.kwonlyargs
+    if arguments.vararg is not None:
+        all_arguments.append(arguments.vararg)
+    if arguments.kwarg is not None:
+        all_arguments.append(arguments.kwarg)
+    return (_is_pure_annotation(function.returns)
+            and all(_is_pure_annotation(argument.annotation) for argument in all_arguments))
+
+
+def _is_pure_function(function: ast.FunctionDef | ast.AsyncFunctionDef, in_class: bool = False) -> bool:
+    for decorator in function.decorator_list:
+        if not (in_class and isinstance(decorator, ast.Name) and decorator.id in PURE_METHOD_DECORATORS):
+            return False
+    return _are_defaults_pure(function.args) and _are_annotations_pure(function)
+
+
+def _is_pure_class(node: ast.ClassDef, pure_classes: set[str]) -> bool:
+    if len(node.decorator_list) > 0 or len(node.keywords) > 0:
+        return False
+    for base in node.bases:
+        # a base class from elsewhere could register its subclasses
+        if not isinstance(base, ast.Name):
+            return False
+        if base.id not in pure_classes and not isinstance(getattr(builtins, base.id, None), type):
+            return False
+    for statement in node.body:
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if statement.name == "__init_subclass__" or not _is_pure_function(statement, True):
+                return False
+        elif isinstance(statement, ast.Assign):
+            if not _is_pure(statement.value):
+                return False
+        elif isinstance(statement, ast.AnnAssign):
+            if not (_is_pure_annotation(statement.annotation) and _is_pure(statement.value)):
+                return False
+        elif not (isinstance(statement, ast.Pass)
+                  or (isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Constant))):
+            return False
+    return True
+
+
+def _assigned_names(target: ast.expr) -> list[str] | None:
+    if isinstance(target, ast.Name):
+        return [target.id]
+    if isinstance(target, (ast.Tuple, ast.List)):
+        names: list[str] = []
+        for element in target.elts:
+            element_names = _assigned_names(element)
+            if element_names is None:
+                return None
+            names.extend(element_names)
+        return names
+    return None
+
+
+def _is_star_import(statement: ast.stmt) -> bool:
+    return (isinstance(statement, ast.ImportFrom)
+            and any(alias.name == "*" for alias in statement.names))
+
+
+def summarize_statement(statement: ast.stmt, pure_classes: set[str]) -> StatementSummary:
+    summary = StatementSummary()
+    if isinstance(statement, ast.Import):
+        for alias in statement.names:
+            bound = alias.asname if alias.asname is not None else alias.name
+            summary.bound.append(bound)
+            summary.imports.append((bound, alias.name, None))
+        # `import package.module` binds the top-level package in Python, which
+        # isn't how bundled imports work, so leave those alone
+        summary.removable = all(alias.asname is not None or "." not in alias.name
+                                for alias in statement.names)
+        return summary
+    if isinstance(statement, ast.ImportFrom):
+        if statement.module is None:
+            return summary
+        if _is_star_import(statement):
+            # it binds names which can't be known here, so it's never removed
+            summary.imports.append(("*", statement.module, None))
+            return summary
+        for alias in statement.names:
+            bound = alias.asname if alias.asname is not None else alias.name
+            summary.bound.append(bound)
+            summary.imports.append((bound, statement.module, alias.name))
+        summary.removable = True
+        return summary
+
+    _ReferenceVisitor(summary).visit(statement)
+    if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        summary.bound = [statement.name]
+        summary.removable = _is_pure_function(statement)
+    elif isinstance(statement, ast.ClassDef):
+        summary.bound = [statement.name]
+        summary.removable = _is_pure_class(statement, pure_classes)
+    elif isinstance(statement, ast.Assign):
+        bound: list[str] = []
+        for target in statement.targets:
+            names = _assigned_names(target)
+            if names is None:
+                return summary
+            bound.extend(names)
+        summary.bound = bound
+        summary.removable = _is_pure(statement.value)
+    elif isinstance(statement, ast.AnnAssign) and isinstance(statement.target, ast.Name):
+        summary.bound = [statement.target.id]
+        summary.removable = (statement.simple == 1
+                             and _is_pure_annotation(statement.annotation)
+                             and _is_pure(statement.value))
+    if not summary.removable:
+        summary.bound = []
+    return summary
+
+
+def summarize_module(module: ast.Module) -> ModuleSummary:
+    statements: list[StatementSummary] = []
+    pure_classes: set[str] = set()
+    dynamic = False
+    for statement in module.body:
+        summary = summarize_statement(statement, pure_classes)
+        if isinstance(statement, ast.ClassDef) and summary.removable:
+            pure_classes.add(statement.name)
+        # the names a star import binds are only known at runtime, so loads
+        # of them can't be told apart from other loads
+        if (len(summary.loads & DYNAMIC_NAMES) > 0
+                or _is_star_import(statement)
+                or len(MODULE_HOOK_NAMES.intersection(summary.bound)) > 0
+                or (isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef))
+                    and statement.name in MODULE_HOOK_NAMES)):
+            dynamic = True
+        statements.append(summary)
+    return ModuleSummary(statements, dynamic)
+
+
+def get_summary(module: ProcessedModule) -> ModuleSummary | None:
+    """
+    returns the summary of a module's statements as they were before any
+    link-time pass changed them, None for modules without source
+    """
+    if module.module is None:
+        return None
+    if module.link_summary is None:
+        module.link_summary = summarize_module(module.module)
+    return module.link_summary
+
+
+def is_removable(statement: StatementSummary, targets: dict[str, str]) -> bool:
+    """
+    whether a statement can be dropped, given the modules its module's
+    imports resolved to. ignored and removed imports aren't bundled, so
+    they're real imports which are left alone
+    """
+    return statement.removable and all(
+        imported_module in targets for _, imported_module, _ in statement.imports)
+
+
+def get_import_targets(module: ProcessedModule, dependency_tree_edges: list[str]) -> dict[str, str]:
+    """ maps the names a module imports to the paths of the modules they resolved to """
+    targets: dict[str, str] = {}
+    for item, path in zip(module.imports, dependency_tree_edges):
+        # imports are transformed using the first import of each module
+        targets.setdefault(item.module, path)
+    return targets
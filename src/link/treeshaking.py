@@ -0,0 +1,213 @@
+from ..processedmodule import ProcessedModule
+from .summary import (ModuleSummary, StatementSummary, get_import_targets,
+                      get_summary, is_removable)
+
+
+class TreeShaker:
+    """
+    Finds the top-level statements of bundled modules which nothing uses.
+
+    A statement is kept if it might have side effects, if it binds a name
+    which a kept statement of the same module references, or if it binds a
+    name which another module looks up with `module.name` or `from module
+    import name`. References are found by name alone, ignoring scopes, so
+    anything which might be a reference counts as one.
+
+    Modules are treated as completely used ("escaped") when they look up
+    names dynamically (e.g. with `locals()`, `getattr` on themselves or
+    `eval`), or when a module object is used as a value rather than through
+    an attribute (e.g. passed to `getattr` or `vars`) or through a special
+    attribute (e.g. `module.__dict__`), since any of its names could be
+    looked up then.
+
+    With `imports_only`, only import statements are ever dropped, which finds
+    the imports of bundled modules that nothing references.
+    """
+    dependency_tree_edges: dict[str, list[str]]
+    dependency_tree_modules: dict[str, ProcessedModule]
+    imports_only: bool
+    # indices of the statements to keep by path
+    live: dict[str, set[int]]
+    # names used by other modules by path
+    exported: dict[str, set[str]]
+    escaped: set[str]
+    # statements of each module binding each name
+    binders: dict[str, dict[str, list[int]]]
+    # module imported by each import alias and by each imported module name,
+    # for each module
+    aliases: dict[str, dict[str, str]]
+    targets: dict[str, dict[str, str]]
+    # statements to keep and modules to escape which haven't been processed
+    pending: list[tuple[str, int]]
+    pending_escapes: list[str]
+
+    def __init__(self,
+                 dependency_tree_edges: dict[str, list[str]],
+                 dependency_tree_modules: dict[str, ProcessedModule],
+                 imports_only: bool = False) -> None:
+        self.dependency_tree_edges = dependency_tree_edges
+        self.dependency_tree_modules = dependency_tree_modules
+        self.imports_only = imports_only
+        self.live = {}
+        self.exported = {}
+        self.escaped = set()
+        self.binders = {}
+        self.aliases = {}
+        self.targets = {}
+        self.pending = []
+        self.pending_escapes = []
+        for path, module in dependency_tree_modules.items():
+            summary = get_summary(module)
+            if summary is None or module.name == "__main__":
+                continue
+            self.live[path] = set()
+            self.exported[path] = set()
+            self.binders[path] = {}
+            self.targets[path] = get_import_targets(
+                module, dependency_tree_edges[path])
+            self.aliases[path] = self._find_aliases(
+                summary, self.targets[path])
+            for index, statement in enumerate(summary.statements):
+                if self._is_removable(statement, self.targets[path]):
+                    for name in statement.bound:
+                        self.binders[path].setdefault(name, []).append(index)
+                else:
+                    self.pending.append((path, index))
+            if summary.dynamic:
+                self._escape(path)
+
+    def add_entry(self, module: ProcessedModule, dependency_tree_edges: list[str]) -> set[int]:
+        """
+        adds a main module, all of which is used except for its imports of
+        bundled modules whose names it never references. returns the indices
+        of those import statements
+        """
+        summary = get_summary(module)
+        if summary is None:
+            return set()
+        targets = get_import_targets(module, dependency_tree_edges)
+        aliases = self._find_aliases(summary, targets)
+        loads: set[str] = set()
+        for statement in summary.statements:
+            loads |= statement.loads
+        unused: set[int] = set()
+        for index, statement in enumerate(summary.statements):
+            if (not summary.dynamic and len(statement.imports) > 0
+                    and is_removable(statement, targets)
+                    and loads.isdisjoint(statement.bound)):
+                unused.add(index)
+                continue
+            self._use_references(statement, aliases)
+            for _, imported_module, name in statement.imports:
+                if name is not None and imported_module in targets:
+                    self._use_export(targets[imported_module], name)
+        if summary.dynamic:
+            for target in aliases.values():
+                self._escape(target)
+        self._process()
+        return unused
+
+    def unused_statements(self) -> dict[str, set[int]]:
+        """ returns the indices of the statements which can be dropped by path """
+        self._process()
+        unused: dict[str, set[int]] = {}
+        for path, live in self.live.items():
+            statements = get_summary(self.dependency_tree_modules[path]).statements  # type: ignore
+            unused[path] = set(range(len(statements))) - live
+        return unused
+
+    def _find_aliases(self, summary: ModuleSummary, targets: dict[str, str]) -> dict[str, str]:
+        aliases: dict[str, str] = {}
+        for statement in summary.statements:
+            for alias, imported_module, name in statement.imports:
+                if name is None and imported_module in targets:
+                    aliases[alias] = targets[imported_module]
+        return aliases
+
+    def _is_removable(self, statement: StatementSummary, targets: dict[str, str]) -> bool:
+        if self.imports_only and len(statement.imports) == 0:
+            return False
+        return is_removable(statement, targets)
+
+    def _process(self) -> None:
+        while len(self.pending) > 0 or len(self.pending_escapes) > 0:
+            if len(self.pending_escapes) > 0:
+                self._process_escape(self.pending_escapes.pop())
+                continue
+            path, index = self.pending.pop()
+            if index in self.live[path]:
+                continue
+            self.live[path].add(index)
+            statement = get_summary(
+                self.dependency_tree_modules[path]).statements[index]  # type: ignore
+            for name in statement.loads:
+                self._use_name(path, name)
+            self._use_references(statement, self.aliases[path])
+            targets = self.targets[path]
+            for alias, imported_module, name in statement.imports:
+                if imported_module not in targets:
+                    continue
+                if name is not None:
+                    self._use_export(targets[imported_module], name)
+                elif (path in self.escaped or alias in self.exported[path]
+                      or not self._is_removable(statement, targets)):
+                    # the module object is used by other modules
+                    self._escape(targets[imported_module])
+
+    def _use_references(self, statement: StatementSummary, aliases: dict[str, str]) -> None:
+        for name, attribute in statement.attribute_loads:
+            if name not in aliases:
+                continue
+            if attribute.startswith("__") and attribute.endswith("__"):
+                # e.g. `module.__dict__`, which any name can be looked up in
+                self._escape(aliases[name])
+            else:
+                self._use_export(aliases[name], attribute)
+        for name in statement.bare_loads:
+            if name in aliases:
+                self._escape(aliases[name])
+
+    def _use_name(self, path: str, name: str) -> None:
+        for index in self.binders[path].get(name, []):
+            self.pending.append((path, index))
+
+    def _use_export(self, path: str, name: str) -> None:
+        if path not in self.exported or name in self.exported[path]:
+            return
+        self.exported[path].add(name)
+        self._use_name(path, name)
+        if name in self.aliases[path]:
+            # another module uses this module's import of a third module
+            self._escape(self.aliases[path][name])
+
+    def _escape(self, path: str) -> None:
+        if path in self.live and path not in self.escaped:
+            self.escaped.add(path)
+            self.pending_escapes.append(path)
+
+    def _process_escape(self, path: str) -> None:
+        summary = get_summary(self.dependency_tree_modules[path])
+        assert summary is not None
+        for index in range(len(summary.statements)):
+            self.pending.append((path, index))
+        # kept import statements are escaped when they're processed, but ones
+        # which were processed before the module escaped need to be here
+        for index in self.live[path]:
+            for alias, _, name in summary.statements[index].imports:
+                if name is None and alias in self.aliases[path]:
+                    self._escape(self.aliases[path][alias])
+
+
+def drop_statements(module: ProcessedModule, dropped: frozenset[int]) -> bool:
+    """
+    drops the top-level statements of `module` at the indices in `dropped`,
+    returning False if different statements were already dropped from it, in
+    which case it has to be processed again
+    """
+    if module.dropped_statements is not None:
+        return module.dropped_statements == dropped
+    assert module.module is not None
+    module.module.body = [statement for index, statement in enumerate(module.module.body)
+                          if index not in dropped]
+    module.dropped_statements = dropped
+    return True
@@ -0,0 +1,155 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from .compiler import Compiler, FactoryCachingCompiler
+from .errors import NestedModuleRecursionError
+from .options import CompilerOptions
+from .processedmodule import ProcessedModule
+
+
+class MultiEntryCompiler(FactoryCachingCompiler):
+    """
+    Compiles several entry points which share modules in one go.
+
+    `entries` is a list of `(source, path)` pairs, and calling the compiler
+    returns one output per entry, in the same order, each identical to what
+    `Compiler` would produce for that entry on its own unless tree shaking or
+    import pruning is enabled. Those are done for all entries at once, so
+    the definitions and imports any entry uses are kept in every output.
+    Modules shared by several entries are only resolved, parsed, transformed
+    and unparsed once.
+    """
+    entries: list[tuple[str, str]]
+
+    def __init__(self, entries: list[tuple[str, str]], options: CompilerOptions = CompilerOptions()) -> None:
+        super().__init__(entries[0][0], entries[0][1], options)
+        self.entries = entries
+
+    def __call__(self) -> list[str]:  # type: ignore[override]
+        try:
+            cache = self._open_cache()
+            # every module that isn't an entry's main module, across entries
+            dependency_tree_edges: dict[str, list[str]] = {}
+            dependency_tree_modules: dict[str, ProcessedModule] = {}
+            builds: list[tuple[ProcessedModule, dict[str, list[str]], dict[str, ProcessedModule]]] = []
+            for source, path in self.entries:
+                main_processed_module = ProcessedModule(
+                    source, path, "__main__", self.options, cache)
+                # an entry can also be imported by another entry, in which
+                # case it's a different module here
+                entry_edges = {module_path: edges for module_path, edges in dependency_tree_edges.items()
+                               if module_path != path}
+                entry_modules = {module_path: module for module_path, module in dependency_tree_modules.items()
+                                 if module_path != path}
+                self._walk_dependencies(
+                    [main_processed_module], entry_edges, entry_modules, cache)
+                for module_path, module in entry_modules.items():
+                    if module_path != path:
+                        dependency_tree_modules[module_path] = module
+                        dependency_tree_edges[module_path] = entry_edges[module_path]
+                builds.append(
+                    (main_processed_module, self._reachable_edges(path, entry_edges), entry_modules))
+
+            # sort first so circular imports are reported before linking
+            dependencies = [self._sort_dependencies(entry_edges)
+                            for _, entry_edges, _ in builds]
+            # link all the entries together since they share their modules
+            self._link(dependency_tree_edges, dependency_tree_modules,
+                       [(main_processed_module, entry_edges[main_processed_module.path])
+                        for main_processed_module, entry_edges, _ in builds])
+
+            outputs: list[str] = []
+            for (main_processed_module, entry_edges, entry_modules), entry_dependencies in zip(builds, dependencies):
+                path = main_processed_module.path
+                entry_dependencies, entry_edges = self._prune(
+                    path, entry_dependencies, entry_edges, entry_modules)
+                # don't reuse the factory of the module at this path if it was
+                # imported by another entry, and don't keep this one either
+                library_factory = self.factories.pop(path, None)
+                library_factory_source = self.factory_sources.pop(path, None)
+                outputs.append(self._generate_output(
+                    entry_dependencies, entry_edges, entry_modules))
+                self.factories.pop(path, None)
+                self.factory_sources.pop(path, None)
+                if library_factory is not None:
+                    self.factories[path] = library_factory
+                if library_factory_source is not None:
+                    self.factory_sources[path] = library_factory_source
+            return outputs
+        except RecursionError:
+            raise NestedModuleRecursionError()
+
+    def _reachable_edges(self, path: str, dependency_tree_edges: dict[str, list[str]]) -> dict[str, list[str]]:
+        """
+        returns the part of the dependency tree imported by the module at
+        `path`, in the order `_walk_dependencies` would have visited it
+        starting from that module, so the output is the same as a single
+        entry build
+        """
+        edges: dict[str, list[str]] = {}
+        stack = [path]
+        while len(stack) > 0:
+            module_path = stack.pop()
+            if module_path not in edges:
+                edges[module_path] = dependency_tree_edges[module_path]
+                stack.extend(edges[module_path])
+        return edges
+
+
+class MultiEntryCompilerTestMethods(unittest.TestCase):
+    # two entries using different parts of the same modules
+    FILES = {
+        "helper.py": "def h():\n    return 'h'\n",
+        "lib.py": "import helper\nA = 1\nB = 2\n"
+                  "def only_one():\n    return 'one'\n"
+                  "def only_two():\n    return 'two'\n",
+        "one.py": "import lib\nprint(lib.only_one(), lib.A, lib.helper.h())\n",
+        "two.py": "import lib\nprint(lib.only_two(), lib.B)\n"
+    }
+
+    def _build(self, directory: str, **options) -> tuple[list[str], list[str]]:
+        """ builds both entries together and on their own """
+        for name, source in self.FILES.items():
+            with open(os.path.join(directory, name), "w") as file:
+                file.write(source)
+        entries = [(self.FILES[name], os.path.join(directory, name))
+                   for name in ["one.py", "two.py"]]
+        return (MultiEntryCompiler(entries, CompilerOptions(**options))(),
+                [Compiler(source, path, CompilerOptions(**options))() for source, path in entries])
+
+    def _run(self, output: str) -> str:
+        # somewhere the modules it imports can't be found
+        with tempfile.TemporaryDirectory() as directory:
+            return subprocess.run([sys.executable, "-B", "-c", output], cwd=directory,
+                                  capture_output=True, text=True, check=True).stdout
+
+    def test_same_as_single_entry(self):
+        for options in [{}, {"propagate_constants": True}, {"inline_functions": True},
+                        {"direct_imports": True}, {"scope_hoisting": True},
+                        {"lazy_modules": True}]:
+            with self.subTest(options=options), tempfile.TemporaryDirectory() as directory:
+                outputs, single_outputs = self._build(directory, **options)
+                self.assertEqual(outputs, single_outputs)
+
+    def test_union_of_used_definitions(self):
+        for options in [{"tree_shaking": True}, {"prune_imports": True},
+                        {"tree_shaking": True, "scope_hoisting": True}]:
+            with self.subTest(options=options), tempfile.TemporaryDirectory() as directory:
+                outputs, single_outputs = self._build(directory, **options)
+                for output, single_output in zip(outputs, single_outputs):
+                    self.assertEqual(self._run(output), self._run(single_output))
+                if options.get("tree_shaking"):
+                    # what the second entry uses is kept for the first
+                    self.assertIn("only_two", outputs[0])
+                    self.assertNotIn("only_two", single_outputs[0])
+                else:
+                    # `helper` is only imported for the first entry
+                    self.assertIn("def h()", outputs[1])
+                    self.assertNotIn("def h()", single_outputs[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,10 +12,45 @@ class CompilerOptions:
     export_dictionary_mode: (Literal["dict"]
                              | Literal["munch"]
                              | Literal["class"]
-                             | Literal["class_instance"]) = "dict"
+                             | Literal["class_instance"]
+                             | Literal["module"]) = "dict"
     export_names_mode: (Literal["locals"]
                         | Literal["static"]) = "locals"
     short_generated_names: bool = False
     hash_length: int = 8
+    cache_dir: str | None = None
+    cache_max_size: int = 256 * 1024 * 1024
+    jobs: int = 1
+    # only run each module's factory when one of its attributes is first used
+    lazy_modules: bool = False
+    # standard library and other modules without source (by imported name,
+    # including their submodules) to only import when one of their attributes
+    # is first used
+    lazy_builtins: list[str] = field(default_factory=lambda: [])
+    # drop top-level definitions of bundled modules which nothing uses
+    tree_shaking: bool = False
+    # drop imports nothing uses from factories' arguments, and modules which
+    # aren't imported anymore if they don't have side effects
+    prune_imports: bool = False
+    # modules (by imported name) to treat as not having side effects
+    side_effect_free_imports: list[str] = field(default_factory=lambda: [])
+    # name factory arguments after the aliases of imported modules, and pass
+    # attributes of them which can't change to factories directly
+    direct_imports: bool = False
+    # inline literals which modules bind once and never change where other
+    # modules use them, so plugins can simplify code depending on them
+    propagate_constants: bool = False
+    # replace calls of small functions which only return an expression with
+    # the expression, and the most nodes the expression can have
+    inline_functions: bool = False
+    inline_max_size: int = 16
+    # time the initialization of each module, reporting it as JSON at exit
+    # (see `exporthelper.PROFILE_HELPER_CONTENTS`)
+    profile_imports: bool = False
+    # emit the top-level names of bundled modules as globals of the output,
+    # renamed so they're unique, instead of wrapping each module in a factory.
+    # modules without source still get factories, which are the only ones
+    # `lazy_modules` and `profile_imports` then apply to
+    scope_hoisting: bool = False
 
     plugins: list[Plugin] = field(default_factory=lambda: [])
@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from .cache import ModuleCache
+from .options import CompilerOptions
+from .processedmodule import ModuleLocation, ProcessedModule
+
+# state of the current worker process, set up once by `_initialize_worker`
+# so the options (and all the plugins in them) aren't pickled for every module
+_worker_options: CompilerOptions | None = None
+_worker_cache: ModuleCache | None = None
+
+
+def _initialize_worker(options: CompilerOptions) -> None:
+    global _worker_options, _worker_cache
+    _worker_options = options
+    if options.cache_dir is not None:
+        _worker_cache = ModuleCache(
+            options.cache_dir, options.cache_max_size, options)
+
+
+def _load_in_worker(location: ModuleLocation, context_path: str) -> ProcessedModule:
+    assert _worker_options is not None
+    return ProcessedModule.load(location, context_path, _worker_options, _worker_cache)
+
+
+class ParallelResolver:
+    """
+    Reads, parses and transforms modules in a pool of worker processes.
+
+    The compiler still walks the dependency tree serially (so the output is
+    identical to a serial build) and locates imports itself, but as soon as a
+    module is known, all of its imports are submitted to the pool. By the time
+    the walk gets to them, they've usually been processed already.
+
+    Options, including plugins, are pickled and sent to each worker once when
+    it starts, so plugins must be picklable. Each worker gets its own copy of
+    every plugin, so state a plugin collects in `hook_module` or `hook_import`
+    isn't visible in the main process.
+    """
+    options: CompilerOptions
+    executor: ProcessPoolExecutor
+    pending: dict[str, Future[ProcessedModule]]
+
+    def __init__(self, jobs: int, options: CompilerOptions) -> None:
+        self.options = options
+        self.executor = ProcessPoolExecutor(
+            max_workers=jobs if jobs > 0 else os.cpu_count(),
+            initializer=_initialize_worker,
+            initargs=(options,))
+        self.pending = {}
+
+    def submit(self, location: ModuleLocation, context_path: str) -> None:
+        """ starts loading the module at `location` unless it's already loading """
+        if location.path not in self.pending:
+            self.pending[location.path] = self.executor.submit(
+                _load_in_worker, location, context_path)
+
+    def result(self, path: str) -> ProcessedModule:
+        """ waits for a submitted module to finish loading """
+        processed_module = self.pending[path].result()
+        # options aren't sent back from the workers, see
+        # `ProcessedModule.__getstate__`
+        processed_module.options = self.options
+        return processed_module
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
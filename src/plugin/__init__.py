@@ -1,11 +1,13 @@
+from .compress import CompressPlugin
 from .constants import ConstantsPlugin
+from .localize import LocalizePlugin
 from .minify import MinifyPlugin
 from .plugin import Plugin
 from .prelude import PreludePlugin
 from .simplify_if import SimplifyIfPlugin
 
-builtin_plugins = [ConstantsPlugin, MinifyPlugin,
-                   PreludePlugin, SimplifyIfPlugin]
+builtin_plugins = [CompressPlugin, ConstantsPlugin, LocalizePlugin,
+                   MinifyPlugin, PreludePlugin, SimplifyIfPlugin]
 
-__all__ = ["Plugin", "builtin_plugins",
-           "ConstantsPlugin", "MinifyPlugin", "PreludePlugin", "SimplifyIfPlugin"]
+__all__ = ["Plugin", "builtin_plugins", "CompressPlugin",
+           "ConstantsPlugin", "LocalizePlugin", "MinifyPlugin", "PreludePlugin", "SimplifyIfPlugin"]
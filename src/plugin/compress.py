@@ -0,0 +1,92 @@
+import binascii
+import lzma
+import marshal
+import re
+import sys
+import zlib
+from typing import Literal
+
+from .plugin import Plugin
+
+# the stub only uses names reserved for generated code, since the payload
+# runs in its globals
+STUB_TEMPLATE = """\
+# {plain_size} bytes of code{compiled} compressed with {algorithm} to {compressed_size} bytes
+import binascii as __generated_binascii__, {algorithm} as __generated_decompressor__{imports}
+{check}exec({load}
+{data}
+{close})
+"""
+
+# bytecode only runs on the version of Python which made it
+BYTECODE_CHECK_TEMPLATE = """\
+if __generated_sys__.version_info[:2] != {version!r}:
+    raise RuntimeError('this bundle was compiled to bytecode for Python {version_name}')
+"""
+
+# the width of the lines of the base64 payload
+LINE_LENGTH = 76
+
+_HEADER_PATTERN = re.compile(r"# (\d+) bytes of code.* to (\d+) bytes\n")
+
+
+class CompressPlugin(Plugin):
+    """
+    Replaces the output with a stub which decompresses its code (or its code
+    compiled to bytecode, with `bytecode`) and runs it. The first line of the
+    stub records the size of the code before and after compression.
+    """
+    algorithm: Literal["zlib"] | Literal["lzma"]
+    bytecode: bool
+    optimize: int
+
+    def __init__(self, algorithm: Literal["zlib"] | Literal["lzma"] = "zlib",
+                 bytecode: bool = False, optimize: int = 0):
+        if algorithm not in ("zlib", "lzma"):
+            raise ValueError(f"unknown compression algorithm {algorithm!r}")
+        self.algorithm = algorithm
+        self.bytecode = bytecode
+        self.optimize = optimize
+
+    def hook_output_source(self, source: str) -> str:
+        payload = plain = source.encode()
+        imports = check = ""
+        load = "__generated_decompressor__.decompress(__generated_binascii__.a2b_base64("
+        close = "))"
+        if self.bytecode:
+            payload = marshal.dumps(
+                compile(source, "<bundle>", "exec", optimize=self.optimize))
+            version = sys.version_info[:2]
+            check = BYTECODE_CHECK_TEMPLATE.format(
+                version=version, version_name=".".join(map(str, version)))
+            imports = ", marshal as __generated_marshal__, sys as __generated_sys__"
+            load = "__generated_marshal__.loads(" + load
+            close += ")"
+        if self.algorithm == "zlib":
+            compressed = zlib.compress(payload, 9)
+        else:
+            compressed = lzma.compress(payload, preset=9 | lzma.PRESET_EXTREME)
+        encoded = binascii.b2a_base64(compressed, newline=False).decode()
+        data = "\n".join(repr(encoded[start:start + LINE_LENGTH])
+                         for start in range(0, len(encoded), LINE_LENGTH))
+        return STUB_TEMPLATE.format(
+            plain_size=len(plain),
+            compiled=" compiled to bytecode and" if self.bytecode else "",
+            algorithm=self.algorithm,
+            compressed_size=len(compressed),
+            imports=imports,
+            check=check,
+            load=load,
+            close=close,
+            data=data if len(encoded) > 0 else "''")
+
+
+def read_sizes(stub: str) -> tuple[int, int] | None:
+    """
+    returns the size of the code compressed into a stub generated by
+    `CompressPlugin` and of its compressed payload, None if `stub` isn't one
+    """
+    match = _HEADER_PATTERN.match(stub)
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2))
@@ -20,6 +20,10 @@ class AssignmentToConstantError(Exception):
         self.lineno = lineno
         self.colno = colno
 
+    def __reduce__(self):
+        # see `CompilerError.__reduce__`
+        return (self.__class__.__new__, (self.__class__,), self.__dict__)
+
     def __str__(self) -> str:
         return f"illegal assignment to a defined compiler constant\n  {_terminal_colors.OKBLUE}{_terminal_colors.BOLD}note:{_terminal_colors.ENDC} the identifier was named {_terminal_colors.OKCYAN}{self.ident}{_terminal_colors.ENDC}\n  at {self.path} {self.lineno}:{self.colno}"
 
@@ -0,0 +1,314 @@
+import ast
+import builtins
+import unittest
+from typing import Iterator
+
+from .plugin import Plugin
+
+LOCAL_NAME_TEMPLATE = "__generated_local_{name}__"
+
+_BUILTINS = frozenset(name for name in dir(builtins) if not name.startswith("__"))
+# names which can read or change variables by name, so scopes using them are
+# left alone
+_DYNAMIC_NAMES = frozenset(["locals", "vars", "exec", "eval", "globals", "__builtins__"])
+
+_FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef)
+_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+def _own_children(node: ast.AST) -> list[ast.AST]:
+    """
+    returns the children of `node` which are evaluated in the scope `node` is
+    in, which for nested scopes is only what's evaluated when they're created
+    """
+    if isinstance(node, _FUNCTIONS):
+        return [*node.decorator_list, *node.args.defaults,
+                *[default for default in node.args.kw_defaults if default is not None]]
+    if isinstance(node, ast.Lambda):
+        return [*node.args.defaults,
+                *[default for default in node.args.kw_defaults if default is not None]]
+    if isinstance(node, ast.ClassDef):
+        return [*node.decorator_list, *node.bases, *node.keywords]
+    if isinstance(node, _COMPREHENSIONS):
+        return [node.generators[0].iter]
+    return list(ast.iter_child_nodes(node))
+
+
+def _own_nodes(roots: list[ast.AST]) -> Iterator[ast.AST]:
+    stack = list(reversed(roots))
+    while len(stack) > 0:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(_own_children(node)))
+
+
+def _bound_names(node: ast.AST) -> list[str]:
+    """ returns the names `node` binds in the scope it's in """
+    if isinstance(node, ast.Name):
+        return [node.id] if not isinstance(node.ctx, ast.Load) else []
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return [alias.asname if alias.asname is not None else alias.name.partition(".")[0]
+                for alias in node.names]
+    if isinstance(node, (*_FUNCTIONS, ast.ClassDef)):
+        return [node.name]
+    if isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar)):
+        return [node.name] if node.name is not None else []
+    if isinstance(node, ast.MatchMapping):
+        return [node.rest] if node.rest is not None else []
+    if isinstance(node, (ast.Global, ast.Nonlocal)):
+        return list(node.names)
+    if isinstance(node, _COMPREHENSIONS):
+        # assignment expressions in comprehensions bind in the enclosing scope
+        return [child.target.id for child in ast.walk(node)
+                if isinstance(child, ast.NamedExpr)]
+    return []
+
+
+class _Scope:
+    """ the names a module or function binds """
+    # how many times each name is bound, counting nested `nonlocal`s (and
+    # `global`s for modules)
+    bindings: dict[str, int]
+    # the index of the top-level statement binding each name, -1 for parameters
+    positions: dict[str, int]
+    star_import: bool
+    dynamic: bool
+
+    def __init__(self, node: ast.Module | ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        self.bindings = {}
+        self.positions = {}
+        self.star_import = False
+        self.dynamic = False
+        if isinstance(node, _FUNCTIONS):
+            arguments = node.args
+            for argument in [*arguments.posonlyargs, *arguments.args, *arguments.kwonlyargs,
+                             arguments.vararg, arguments.kwarg]:
+                if argument is not None:
+                    self._bind(argument.arg)
+                    self.positions[argument.arg] = -1
+        for index, statement in enumerate(node.body):
+            for child in _own_nodes([statement]):
+                if isinstance(child, ast.Name) and child.id in _DYNAMIC_NAMES:
+                    self.dynamic = True
+                if isinstance(child, ast.ImportFrom) and any(alias.name == "*" for alias in child.names):
+                    self.star_import = True
+                for name in _bound_names(child):
+                    self._bind(name)
+            if isinstance(statement, (ast.Import, ast.ImportFrom, *_FUNCTIONS, ast.ClassDef)):
+                for name in _bound_names(statement):
+                    self.positions[name] = index
+            elif (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                  and isinstance(statement.targets[0], ast.Name)):
+                self.positions[statement.targets[0].id] = index
+            elif (isinstance(statement, ast.AnnAssign) and statement.value is not None
+                  and isinstance(statement.target, ast.Name)):
+                self.positions[statement.target.id] = index
+        # nested functions can rebind the names with `nonlocal`, and any
+        # function can rebind the module's with `global`
+        for child in ast.walk(node):
+            if (isinstance(child, ast.Nonlocal)
+                    or (isinstance(node, ast.Module) and isinstance(child, ast.Global))):
+                for name in child.names:
+                    self._bind(name)
+
+    def _bind(self, name: str) -> None:
+        self.bindings[name] = self.bindings.get(name, 0) + 1
+
+    def is_constant(self, name: str, index: int) -> bool:
+        """
+        whether `name` is bound once, by the top-level statement before the
+        one at `index` (or as a parameter), so it never changes from there on
+        """
+        return self.bindings.get(name) == 1 and self.positions.get(name, index) < index
+
+
+def _nested_functions(body: list[ast.stmt]) -> Iterator[tuple[int, ast.FunctionDef | ast.AsyncFunctionDef]]:
+    """
+    yields the functions directly nested in a scope (including methods of
+    classes in it) with the index of the top-level statement they're in
+    """
+    for index, statement in enumerate(body):
+        stack: list[ast.AST] = [statement]
+        while len(stack) > 0:
+            node = stack.pop()
+            if isinstance(node, _FUNCTIONS):
+                yield index, node
+                continue
+            stack.extend(ast.iter_child_nodes(node))
+
+
+def _loop_loads(body: list[ast.stmt]) -> dict[str, int]:
+    """ counts the names loaded in loops of the scope `body` is in """
+    counts: dict[str, int] = {}
+    stack: list[tuple[ast.AST, bool]] = [(statement, False) for statement in reversed(body)]
+    while len(stack) > 0:
+        node, in_loop = stack.pop()
+        if in_loop and isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            counts[node.id] = counts.get(node.id, 0) + 1
+        if isinstance(node, (ast.For, ast.AsyncFor)):
+            children = [(node.target, True), (node.iter, in_loop),
+                        *[(child, True) for child in node.body],
+                        *[(child, in_loop) for child in node.orelse]]
+        elif isinstance(node, ast.While):
+            children = [(node.test, True),
+                        *[(child, True) for child in node.body],
+                        *[(child, in_loop) for child in node.orelse]]
+        else:
+            children = [(child, in_loop) for child in _own_children(node)]
+        stack.extend(reversed(children))
+    return counts
+
+
+def _localize(function: ast.FunctionDef | ast.AsyncFunctionDef,
+              scope: _Scope,
+              enclosing: list[tuple[_Scope, int]],
+              min_uses: int) -> None:
+    localized: list[str] = []
+    for name, count in sorted(_loop_loads(function.body).items()):
+        if count < min_uses or name in scope.bindings:
+            continue
+        for enclosing_scope, index in reversed(enclosing):
+            if name in enclosing_scope.bindings:
+                if enclosing_scope.is_constant(name, index):
+                    localized.append(name)
+                break
+        else:
+            if name in _BUILTINS and not any(item.star_import for item, _ in enclosing):
+                localized.append(name)
+    if len(localized) == 0:
+        return
+    # the generated names don't have locations, which tells them apart from
+    # reserved names in the source
+    for node in _own_nodes(list(function.body)):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id in localized:
+            node.id = LOCAL_NAME_TEMPLATE.format(name=node.id)
+            for attribute in node._attributes:
+                if hasattr(node, attribute):
+                    delattr(node, attribute)
+    prologue: list[ast.stmt] = [ast.Assign(
+        targets=[ast.Name(id=LOCAL_NAME_TEMPLATE.format(name=name), ctx=ast.Store())],
+        value=ast.Name(id=name, ctx=ast.Load())
+    ) for name in localized]
+    has_docstring = (isinstance(function.body[0], ast.Expr)
+                     and isinstance(function.body[0].value, ast.Constant)
+                     and isinstance(function.body[0].value.value, str))
+    function.body[int(has_docstring):int(has_docstring)] = prologue
+
+
+class LocalizePlugin(Plugin):
+    """
+    Binds the built-ins and names of enclosing scopes which functions load in
+    loops to local variables at the start of the functions, so the loops load
+    them as fast locals instead of globals or closure cells. A name is only
+    bound where it's proven not to change while the function runs: a
+    built-in the module never binds, or a name its enclosing function (or
+    module) binds once, before the function is defined. Names loaded fewer
+    than `min_uses` times in loops are left alone.
+    """
+    min_uses: int
+
+    def __init__(self, min_uses: int = 1):
+        self.min_uses = min_uses
+
+    def hook_module(self, path: str, module: ast.Module) -> ast.Module:
+        module_scope = _Scope(module)
+        if module_scope.dynamic:
+            return module
+        # nested functions are found before the prologues shift statements
+        stack: list[tuple[list[tuple[_Scope, int]], _Scope, list[tuple[int, ast.FunctionDef | ast.AsyncFunctionDef]]]] = [
+            ([], module_scope, list(_nested_functions(module.body)))]
+        while len(stack) > 0:
+            enclosing, scope, functions = stack.pop()
+            for index, function in functions:
+                function_enclosing = enclosing + [(scope, index)]
+                function_scope = _Scope(function)
+                nested = list(_nested_functions(function.body))
+                if not function_scope.dynamic:
+                    _localize(function, function_scope,
+                              function_enclosing, self.min_uses)
+                stack.append((function_enclosing, function_scope, nested))
+        return module
+
+
+class LocalizePluginTestMethods(unittest.TestCase):
+    def _localize(self, source: str) -> ast.Module:
+        return LocalizePlugin().hook_module("/main.py", ast.parse(source))
+
+    def _assert_same_result(self, source: str) -> ast.Module:
+        """ runs `source` before and after localizing, comparing `result` """
+        expected: dict = {}
+        exec(compile(source, "/main.py", "exec"), expected)
+        module = self._localize(source)
+        actual: dict = {}
+        exec(compile(ast.fix_missing_locations(module), "/main.py", "exec"), actual)
+        self.assertEqual(actual["result"], expected["result"])
+        return module
+
+    def _localized(self, module: ast.Module) -> set[str]:
+        return {node.id for node in ast.walk(module) if isinstance(node, ast.Name)
+                and node.id.startswith("__generated_local_")}
+
+    def test_builtins(self):
+        module = self._assert_same_result(
+            "def f(values):\n    total = 0\n    for value in values:\n"
+            "        total += len(value)\n    return total\n"
+            "result = f(['a', 'bc'])\n")
+        self.assertEqual(self._localized(module), {"__generated_local_len__"})
+
+    def test_shadowed_builtin(self):
+        # the module binds `len` after the function is defined
+        module = self._assert_same_result(
+            "def f(values):\n    total = 0\n    for value in values:\n"
+            "        total += len(value)\n    return total\n"
+            "def len(value):\n    return 10\nresult = f(['a', 'bc'])\n")
+        self.assertEqual(self._localized(module), set())
+
+    def test_nonlocal(self):
+        module = self._assert_same_result(
+            "def outer():\n    step = 1\n    def inner():\n        seen = []\n"
+            "        for _ in range(3):\n            seen.append(step)\n"
+            "            bump()\n        return seen\n    def bump():\n"
+            "        nonlocal step\n        step += 1\n    return inner()\n"
+            "result = outer()\n")
+        self.assertNotIn("__generated_local_step__", self._localized(module))
+
+    def test_bound_after_definition(self):
+        module = self._assert_same_result(
+            "def f():\n    seen = []\n    for _ in range(2):\n"
+            "        seen.append(LIMIT)\n    return seen\n"
+            "LIMIT = 1\nresult = f()\n")
+        self.assertEqual(self._localized(module), set())
+        # bound once before the definition, it's constant
+        module = self._assert_same_result(
+            "LIMIT = 1\ndef f():\n    seen = []\n    for _ in range(2):\n"
+            "        seen.append(LIMIT)\n    return seen\nresult = f()\n")
+        self.assertEqual(self._localized(module), {"__generated_local_LIMIT__"})
+
+    def test_docstring(self):
+        module = self._assert_same_result(
+            "def f(values):\n    \"\"\"sums lengths\"\"\"\n    total = 0\n"
+            "    for value in values:\n        total += len(value)\n    return total\n"
+            "result = (f(['a']), f.__doc__)\n")
+        function = module.body[0]
+        assert isinstance(function, ast.FunctionDef)
+        self.assertEqual(ast.get_docstring(function), "sums lengths")
+        self.assertEqual(ast.unparse(function.body[1]),
+                         "__generated_local_len__ = len")
+
+    def test_dynamic(self):
+        sources = [
+            "def f(values):\n    total = 0\n    for value in values:\n"
+            "        total += len(value)\n    return total, sorted(locals())\n"
+            "result = f(['a'])\n",
+            "def f(values):\n    total = 0\n    for value in values:\n"
+            "        total += len(value)\n    return total\n"
+            "result = eval('f([\"a\"])')\n"
+        ]
+        for source in sources:
+            with self.subTest(source=source):
+                module = self._assert_same_result(source)
+                self.assertEqual(ast.dump(module), ast.dump(ast.parse(source)))
+
+
+if __name__ == "__main__":
+    unittest.main()
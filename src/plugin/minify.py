@@ -1,35 +1,89 @@
-from ast import Module, fix_missing_locations, parse, unparse
+from ast import Module
 from typing import Any
 
-from ..python_minifier import minify, unparse  # type:ignore
+from ..errors import MinificationError
+from ..python_minifier import (VERIFY_POLICIES, MinifyStats,  # type:ignore
+                               UnstableMinification, minify_ast)
 from .plugin import Plugin
 
 
 class MinifyPlugin(Plugin):
+    """ Minifies the output with `python-minifier`
+
+    `verify` is how the minified code is checked to parse back into the
+    bundled code: "full", "sampled" (a random part of the top-level
+    statements), "deferred" (all of it, in a background thread while the
+    output is written, failing the build in `Compiler.finish`) or "off". The
+    statistics of the outputs minified in the last finished build are kept in
+    `stats`.
+    """
     minify_kwargs: dict[str, Any]
+    verify: str
+    stats: list[MinifyStats]
+    # outputs whose deferred verification `hook_finish` hasn't waited for
+    pending: list[MinifyStats]
 
-    def __init__(self, **minify_kwargs) -> None:
+    def __init__(self, verify: str = "full", **minify_kwargs) -> None:
+        if verify not in VERIFY_POLICIES:
+            raise ValueError(
+                f"verify must be one of {', '.join(VERIFY_POLICIES)}")
         self.minify_kwargs = minify_kwargs
+        self.verify = verify
+        self.stats = []
+        self.pending = []
         return super().__init__()
 
+    def fingerprint(self) -> str:
+        # the statistics change with every build, but not the modules
+        return f"{type(self).__qualname__}{self.minify_kwargs!r}{self.verify!r}"
+
+    def __getstate__(self) -> dict:
+        # threads verifying the output can't be pickled, and workers don't
+        # unparse anything
+        return {**vars(self), "stats": [], "pending": []}
+
     def hook_unparse(self, module: Module) -> str:
-        source = unparse(fix_missing_locations(module))
-        source = minify(
-            remove_annotations=True,
-            combine_imports=True,
-            hoist_literals=True,
-            rename_locals=True,
-            rename_globals=True,
-            remove_pass=True,
-            remove_object_base=True,
-            remove_literal_statements=True,
-            constant_folding=True,
-            convert_posargs_to_args=True,
-            remove_explicit_return_none=True,
-            remove_debug=True,
-            # user overrides
-            **self.minify_kwargs,
-            # input source
-            source=source,
-        )
+        stats = MinifyStats()
+        # the output AST is minified directly, instead of being unparsed only
+        # to be parsed again. this modifies it in place
+        try:
+            source = minify_ast(
+                module,
+                remove_annotations=True,
+                combine_imports=True,
+                hoist_literals=True,
+                rename_locals=True,
+                rename_globals=True,
+                remove_pass=True,
+                remove_object_base=True,
+                remove_literal_statements=True,
+                constant_folding=True,
+                convert_posargs_to_args=True,
+                remove_explicit_return_none=True,
+                remove_debug=True,
+                # user overrides
+                **self.minify_kwargs,
+                verify=self.verify,
+                stats=stats
+            )
+        except UnstableMinification as err:
+            raise MinificationError(str(err.exception))
+        self.pending.append(stats)
         return source
+
+    def report(self) -> list[dict[str, Any]]:
+        """ the statistics of the last finished build, as JSON objects """
+        return [{
+            "verify": stats.verify,
+            "verify_ms": stats.verify_time * 1000 if stats.verify_time is not None else None,
+            "verified_statements": stats.verified_statements,
+            "total_statements": stats.total_statements
+        } for stats in self.stats]
+
+    def hook_finish(self) -> None:
+        self.stats, self.pending = self.pending, []
+        for stats in self.stats:
+            try:
+                stats.wait()
+            except UnstableMinification as err:
+                raise MinificationError(str(err.exception))
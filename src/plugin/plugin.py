@@ -9,9 +9,30 @@ if TYPE_CHECKING:
 
 
 class Plugin:
+    """ The base class for all plugins
+
+    When `CompilerOptions.jobs` isn't 1, plugins are pickled and sent to each
+    worker process once when it starts, so they must be picklable (i.e. defined
+    at the top level of a module and only holding picklable state; implement
+    `__getstate__`/`__setstate__` otherwise). `hook_module` and `hook_import`
+    then run on the workers' copies, so any state they collect isn't visible
+    to the other hooks, which run in the main process.
+    """
+
     def __init__(self, *args, **kwargs) -> None:
         pass
 
+    def fingerprint(self) -> str:
+        """ A string identifying this plugin and its configuration
+
+        This is used to key the module cache, which stores modules after
+        `hook_module` and `hook_import` have run, so any change to the plugin
+        that affects those hooks must change the fingerprint. The default is
+        the plugin's class and a `repr` of its attributes; override it if that
+        isn't stable across runs.
+        """
+        return f"{type(self).__module__}.{type(self).__qualname__}{vars(self)!r}"
+
     def hook_module(self, path: str, module: ast.Module) -> ast.Module:
         """ A hook run before name translation is performed and modules are bundled
 
@@ -30,6 +51,14 @@ class Plugin:
         """
         return module
 
+    def hook_module_post_link(self, path: str, module: ast.Module) -> ast.Module:
+        """ A hook run on modules which link-time passes inlined code into
+
+        It runs before the module is transformed, like `hook_module`, so it can
+        e.g. simplify branches on constants propagated from other modules.
+        """
+        return module
+
     def hook_import(self, imp: "FoundImport") -> "FoundImport":
         """ A hook run on all imports a module imports.
 
@@ -46,6 +75,9 @@ class Plugin:
         element is the path of the imported module or the string "built-in" if it's
         generated or a stdlib module or b) None to fall back to the default
         resolution.
+
+        Resolution only depends on the directory of `path`, so within a build
+        the result is reused for every import of `module` from that directory.
         """
         return None
 
@@ -56,3 +88,20 @@ class Plugin:
     def hook_unparse(self, module: ast.Module) -> str | None:
         """ A hook called to customize unparsing. There can only be one of these. """
         return None
+
+    def hook_output_source(self, source: str) -> str:
+        """ A hook called with the generated code, after unparsing
+
+        This can be used to e.g. wrap or compress the code. Unlike
+        `hook_unparse`, every plugin's hook runs, in the order of the plugins.
+        """
+        return source
+
+    def hook_finish(self) -> None:
+        """ A hook called after the output of a build was written
+
+        `Compiler.finish` calls it, so plugins can wait for work they started
+        in the background, like deferred verification, and raise a
+        `CompilerError` to fail the build.
+        """
+        pass
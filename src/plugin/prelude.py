@@ -1,4 +1,4 @@
-from ast import Module, parse, stmt
+from ast import Module, dump, parse, stmt
 
 from .plugin import Plugin
 
@@ -11,6 +11,10 @@ class PreludePlugin(Plugin):
             prelude = parse(prelude).body
         self.prelude_ast = prelude
 
+    def fingerprint(self) -> str:
+        # the default repr of the prelude AST contains object addresses
+        return f"{type(self).__qualname__}{[dump(item) for item in self.prelude_ast]!r}"
+
     def hook_output(self, module: Module) -> Module:
         module.body = self.prelude_ast + module.body
         return module
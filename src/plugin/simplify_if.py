@@ -1,4 +1,6 @@
 import ast
+import math
+import operator
 import typing
 from ast import Module
 from typing import Any
@@ -6,6 +8,18 @@ from typing import Any
 from .plugin import Plugin
 
 
+_COMPARISONS: dict[type, typing.Callable[[Any, Any], Any]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+
 class SimplifyIfTransformer(ast.NodeTransformer):
     def __init__(self) -> None:
         super().__init__()
@@ -99,11 +113,51 @@ class SimplifyIfTransformer(ast.NodeTransformer):
                 operand=operand
             )
 
+    def visit_Compare(self, node: ast.Compare) -> Any:
+        visit = super().visit
+        left = visit(node.left)
+        comparators = [visit(comparator) for comparator in node.comparators]
+        operands = [left] + comparators
+        if all(isinstance(operand, ast.Constant) for operand in operands):
+            operands = typing.cast(list[ast.Constant], operands)
+            result = True
+            for op, a, b in zip(node.ops, operands, operands[1:]):
+                comparison = _COMPARISONS.get(type(op))
+                if comparison is None:
+                    # identity of constants other than singletons isn't
+                    # guaranteed, so leave `is` alone
+                    return ast.Compare(left=left, ops=node.ops, comparators=comparators)
+                try:
+                    result = comparison(a.value, b.value)
+                except TypeError:
+                    # it fails at runtime, and should keep doing so there
+                    return ast.Compare(left=left, ops=node.ops, comparators=comparators)
+                if not result:
+                    break
+            return ast.Constant(value=result)
+        else:
+            return ast.Compare(
+                left=left,
+                ops=node.ops,
+                comparators=comparators
+            )
+
+    def _visit_body(self, body: list[ast.stmt]) -> list[ast.stmt]:
+        # folded `if`s are replaced by their statements
+        statements: list[ast.stmt] = []
+        for stmt in body:
+            result = super().visit(stmt)
+            if isinstance(result, list):
+                statements.extend(result)
+            elif result is not None:
+                statements.append(result)
+        return statements
+
     def visit_If(self, node: ast.If) -> Any:
         visit = super().visit
         test = visit(node.test)
-        body = [visit(stmt) for stmt in node.body]
-        orelse = [visit(stmt) for stmt in node.orelse]
+        body = self._visit_body(node.body)
+        orelse = self._visit_body(node.orelse)
         if isinstance(test, ast.Constant):
             if test.value:
                 return body
@@ -112,7 +166,7 @@ class SimplifyIfTransformer(ast.NodeTransformer):
         else:
             return ast.If(
                 test=test,
-                body=body,
+                body=body or [ast.Pass()],
                 orelse=orelse
             )
 
@@ -133,6 +187,32 @@ class SimplifyIfTransformer(ast.NodeTransformer):
             )
 
 
+class _NegativeConstantTransformer(ast.NodeTransformer):
+    # `ast.unparse` doesn't parenthesize negative constants, so a folded
+    # `(-1) ** 2` would come out as `-1 ** 2`
+    def visit_Constant(self, node: ast.Constant) -> Any:
+        if type(node.value) in (int, float) and math.copysign(1, node.value) < 0:
+            return ast.UnaryOp(op=ast.USub(), operand=ast.Constant(value=-node.value))
+        return node
+
+
+def _fill_empty_bodies(module: Module) -> Module:
+    # folding every statement of a block away leaves it empty
+    for node in ast.walk(module):
+        if isinstance(node, Module):
+            continue
+        if isinstance(getattr(node, "body", None), list) and len(node.body) == 0:  # type: ignore
+            node.body = [ast.Pass()]  # type: ignore
+        if isinstance(node, ast.Try) and len(node.handlers) == 0 and len(node.finalbody) == 0:
+            node.finalbody = [ast.Pass()]
+    return module
+
+
 class SimplifyIfPlugin(Plugin):
     def hook_module(self, path: str, module: Module) -> Module:
-        return SimplifyIfTransformer().visit(module)
+        module = SimplifyIfTransformer().visit(module)
+        return _fill_empty_bodies(_NegativeConstantTransformer().visit(module))
+
+    def hook_module_post_link(self, path: str, module: Module) -> Module:
+        # constants from other modules may have been inlined
+        return self.hook_module(path, module)
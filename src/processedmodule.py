@@ -1,17 +1,27 @@
 import ast
 import hashlib
 import os
-import sys
-from importlib import util as import_utils
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
+from .cache import ModuleCache
 from .errors import ImportResolutionError, ModuleSyntaxError, TransformError
-from .exporthelper import EXPORT_HELPER_NAME
+from .exporthelper import (EXPORT_HELPER_NAME, LAZY_HELPER_NAME,
+                           MODULE_HELPER_NAME, PROFILE_HELPER_NAME)
 from .options import CompilerOptions
+from .resolver import BUILTIN_ORIGIN, ModuleResolver
 from .transformers import (FoundImport, ImportVisitor, ModuleTransformer,
-                           purify_identifier)
+                           generate_attribute_identifier, purify_identifier)
+
+if TYPE_CHECKING:
+    from .link.constants import ModuleConstants
+    from .link.direct import ModuleBindings
+    from .link.inlining import ModuleFunctions
+    from .link.summary import ModuleSummary
 
 BUILTIN_EXPORT_INTERNAL_NAME = "exports_builtin"
 CLASS_EXPORT_CLASS_NAME = "exports"
+SLOTS_EXPORT_INSTANCE_NAME = "exports_instance"
 
 
 class ModuleUniqueIdentifierGenerator:
@@ -49,6 +59,29 @@ class ModuleUniqueIdentifierGenerator:
     def get_export_property_name(self, name: str):
         return self.get_internal_name(f"export_{name}")
 
+    def get_hoisted_name(self, name: str):
+        # hoisted names are used in class bodies, so they can't start with
+        # "__" without ending with it too, or they'd be mangled
+        if self.minified:
+            return f"h{self.unique_module_name}_{name}"
+        else:
+            return f"__generated_hoisted_{self.unique_module_name}_{name}__"
+
+
+@dataclass
+class ModuleLocation:
+    imported_name: str
+    # the path passed to `ProcessedModule`, "built-in" for built-in modules
+    origin: str
+    source: str | None = None
+    # whether the source still needs to be read from `origin`
+    read_source: bool = False
+
+    @property
+    def path(self) -> str:
+        """ the path of the `ProcessedModule` this location will load """
+        return f"built-in:{self.imported_name}" if self.origin == "built-in" else self.origin
+
 
 class ProcessedModule:
     name: str
@@ -57,9 +90,40 @@ class ProcessedModule:
     path: str
     name_generator: ModuleUniqueIdentifierGenerator
     options: CompilerOptions
+    # set by link-time passes, see `link`
+    link_constants: "ModuleConstants | None"
+    # reprs of the literals inlined into the module, by the name or
+    # `alias.attribute` they replaced
+    propagated_constants: dict[str, str] | None
+    link_functions: "ModuleFunctions | None"
+    # descriptions of the functions inlined into the module, by the name or
+    # `alias.attribute` they were called as
+    inlined_functions: dict[str, str] | None
+    link_summary: "ModuleSummary | None"
+    dropped_statements: frozenset[int] | None
+    # indices of `imports` left out of the factory's arguments
+    pruned_imports: frozenset[int] | None
+    # aliases to name the arguments of imported modules after by module, and
+    # `(alias, attribute, path)` of the attributes passed as arguments
+    direct_aliases: dict[str, str] | None
+    direct_attributes: list[tuple[str, str, str]] | None
+    link_bindings: "ModuleBindings | None"
+    # the module's top-level names, which scope hoisting renames, see `hoisting`
+    hoisted_names: list[str] | None
 
-    def __init__(self, source: str | None, path: str, imported_name: str, options: CompilerOptions) -> None:
+    def __init__(self, source: str | None, path: str, imported_name: str, options: CompilerOptions, cache: ModuleCache | None = None) -> None:
         self.options = options
+        self.link_constants = None
+        self.propagated_constants = None
+        self.link_functions = None
+        self.inlined_functions = None
+        self.link_summary = None
+        self.dropped_statements = None
+        self.pruned_imports = None
+        self.direct_aliases = None
+        self.direct_attributes = None
+        self.link_bindings = None
+        self.hoisted_names = None
         if path == "built-in":
             self.name = f"built-in:{imported_name}"
         elif imported_name == "__main__":
@@ -67,44 +131,61 @@ class ProcessedModule:
         else:
             self.name = os.path.splitext(os.path.basename(path))[0]
         self.path = f"built-in:{imported_name}" if path == "built-in" else path
-        try:
-            if source is None:
-                # module is probably built-in or for some reason we don't have
-                # its raw Python source
-                self.module = None
-            else:
-                self.module = ast.parse(source, self.name)
-                # let plugins do their thing
-                for plugin in self.options.plugins:
-                    self.module = plugin.hook_module(self.path, self.module)
-        except SyntaxError as err:
-            raise ModuleSyntaxError(path, err)
         self.imports = []
         self.name_generator = ModuleUniqueIdentifierGenerator(
             self.name, self.path, options.short_generated_names, options.hash_length)
-        if self.module is not None:
-            for item in ImportVisitor.find_imports(self.module, self.path):
-                if item.module not in self.options.ignore_imports and item.module not in self.options.remove_imports:
-                    # ask plugins for their take on this import
-                    for plugin in self.options.plugins:
-                        item = plugin.hook_import(item)
-                    self.imports.append(item)
+        if source is None:
+            # module is probably built-in or for some reason we don't have
+            # its raw Python source
+            self.module = None
+            return
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.key(source, self.path)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                # the module hasn't changed since the last build, so skip
+                # parsing it and running the plugins
+                self.module, self.imports = cached
+                return
+        try:
+            self.module = ast.parse(source, self.name)
+            # let plugins do their thing
+            for plugin in self.options.plugins:
+                self.module = plugin.hook_module(self.path, self.module)
+        except SyntaxError as err:
+            raise ModuleSyntaxError(path, err)
+        for item in ImportVisitor.find_imports(self.module, self.path):
+            if item.module not in self.options.ignore_imports and item.module not in self.options.remove_imports:
+                # ask plugins for their take on this import
+                for plugin in self.options.plugins:
+                    item = plugin.hook_import(item)
+                self.imports.append(item)
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, self.module, self.imports)
 
-    @classmethod
-    def resolve(cls, module: str, context_path: str, options: CompilerOptions):
-        old_path = sys.path.copy()
-        # this assumes that the directory of this current file is always the first
-        # search path
-        sys.path[0] = os.path.dirname(context_path)
-        spec = import_utils.find_spec(module)
-        sys.path = old_path
+    def __getstate__(self) -> dict:
+        # the options are shared by every module in a build (and can be large
+        # because of plugins), so they're left out when sending modules back
+        # from worker processes and re-attached by the receiver
+        state = self.__dict__.copy()
+        del state["options"]
+        return state
 
+    @classmethod
+    def locate(cls, module: str, context_path: str, options: CompilerOptions, resolver: ModuleResolver | None = None) -> ModuleLocation:
+        """
+        finds where `module`, imported from `context_path`, comes from without
+        reading or parsing it, so callers can tell if it's already been loaded
+        """
+        if resolver is None:
+            resolver = ModuleResolver()
+        origin = resolver.resolve(module, context_path)
         # resolve stdlib modules and add a stub for ignored modules
-        if (spec is not None and (spec.origin == "built-in"
-                                  or module in options.ignore_imports
-                                  or module in options.remove_imports
-                                  or module in sys.stdlib_module_names)):
-            return cls(None, "built-in", module, options)
+        if (origin == BUILTIN_ORIGIN
+                or module in options.ignore_imports
+                or module in options.remove_imports):
+            return ModuleLocation(module, "built-in")
 
         # ask plugins for a resolution
         for plugin in options.plugins:
@@ -113,26 +194,32 @@ class ProcessedModule:
             # if the plugin didn't delegate resolution to us, then use it
             # maybe_resolved[0] is source, maybe_resolved[1] is path
             if maybe_resolved is not None:
-                return cls(
-                    maybe_resolved[0],
-                    maybe_resolved[1],
-                    module,
-                    options
-                )
+                return ModuleLocation(module, maybe_resolved[1], source=maybe_resolved[0])
 
-        # use find_spec's resolution or error if not found
-        if spec is None or spec.origin is None:
+        # use the resolver's resolution or error if not found
+        if origin is None:
             raise ImportResolutionError(path=context_path, module=module)
-        else:
+        return ModuleLocation(module, origin, read_source=True)
+
+    @classmethod
+    def load(cls, location: ModuleLocation, context_path: str, options: CompilerOptions, cache: ModuleCache | None = None):
+        """ reads, parses and transforms a module found by `locate` """
+        if location.read_source:
             try:
-                with open(spec.origin, "r") as file:
-                    return cls(file.read(), spec.origin, module, options)
+                with open(location.origin, "r") as file:
+                    return cls(file.read(), location.origin, location.imported_name, options, cache)
             except OSError:
                 raise ImportResolutionError(
-                    path=context_path, module=module, os_error_read_path=spec.origin)
+                    path=context_path, module=location.imported_name, os_error_read_path=location.origin)
+        return cls(location.source, location.origin, location.imported_name, options, cache)
+
+    @classmethod
+    def resolve(cls, module: str, context_path: str, options: CompilerOptions, cache: ModuleCache | None = None):
+        return cls.load(cls.locate(module, context_path, options), context_path, options, cache)
 
     def _globals_names(self, module: ast.Module) -> list[str]:
-        names: list[str] = []
+        # imports bound directly as arguments don't have an assignment
+        names: list[str] = list((self.direct_aliases or {}).values())
         for top_level_stmt in module.body:
             if isinstance(top_level_stmt, ast.FunctionDef):
                 names.append(top_level_stmt.name)
@@ -160,6 +247,67 @@ class ProcessedModule:
             values=[ast.Name(id=name, ctx=ast.Load()) for name in names]
         )
 
+    def _module_exports(self, module: ast.Module) -> list[ast.stmt]:
+        """
+        generates the end of a factory in "module" mode, which returns a real
+        module object, or an instance of a class with a slot for each export
+        if the exports are known statically
+        """
+        if self.options.export_names_mode == "locals":
+            return [ast.Return(
+                value=ast.Call(
+                    func=ast.Name(id=MODULE_HELPER_NAME, ctx=ast.Load()),
+                    args=[
+                        ast.Constant(value=self.name),
+                        ast.Call(
+                            func=ast.Name(id="locals", ctx=ast.Load()),
+                            args=[],
+                            keywords=[]
+                        )
+                    ],
+                    keywords=[]
+                )
+            )]
+        globals_names = self._globals_names(module)
+        class_name = self.name_generator.get_internal_name(
+            CLASS_EXPORT_CLASS_NAME)
+        instance_name = self.name_generator.get_internal_name(
+            SLOTS_EXPORT_INSTANCE_NAME)
+        return [
+            ast.ClassDef(
+                name=class_name,
+                bases=[],
+                keywords=[],
+                body=[ast.Assign(
+                    targets=[ast.Name(id="__slots__", ctx=ast.Store())],
+                    value=ast.Tuple(
+                        elts=[ast.Constant(value=name)
+                              for name in globals_names],
+                        ctx=ast.Load()
+                    )
+                )],
+                decorator_list=[],
+                type_params=[]
+            ),
+            ast.Assign(
+                targets=[ast.Name(id=instance_name, ctx=ast.Store())],
+                value=ast.Call(
+                    func=ast.Name(id=class_name, ctx=ast.Load()),
+                    args=[],
+                    keywords=[]
+                )
+            ),
+            *[ast.Assign(
+                targets=[ast.Attribute(
+                    value=ast.Name(id=instance_name, ctx=ast.Load()),
+                    attr=name,
+                    ctx=ast.Store()
+                )],
+                value=ast.Name(id=name, ctx=ast.Load())
+            ) for name in globals_names],
+            ast.Return(value=ast.Name(id=instance_name, ctx=ast.Load()))
+        ]
+
     def generate_factory_ast(self) -> ast.FunctionDef | ast.Import:
         if self.module is None:
             # we don't have the code for the module, so it must be built-in
@@ -197,18 +345,32 @@ class ProcessedModule:
         else:
             # we have the code, so let's transform it
             argument_import_names: list[str] = []
+            imports = [item for index, item in enumerate(self.imports)
+                       if self.pruned_imports is None or index not in self.pruned_imports]
 
             # get the argument names of the imports
-            for item in self.imports:
-                argument_import_names.append(item.generate_unique_identifier(
-                    self.options.short_generated_names, self.options.hash_length))
+            direct_aliases = dict(self.direct_aliases or {})
+            for item in imports:
+                if item.module in direct_aliases:
+                    # imports are transformed using the first import of each
+                    # module, so that's the one named after the alias
+                    argument_import_names.append(
+                        direct_aliases.pop(item.module))
+                else:
+                    argument_import_names.append(item.generate_unique_identifier(
+                        self.options.short_generated_names, self.options.hash_length))
+            attribute_arguments: dict[tuple[str, str], str] = {}
+            for index, (alias, attribute, _) in enumerate(self.direct_attributes or []):
+                attribute_arguments[(alias, attribute)] = generate_attribute_identifier(
+                    alias, attribute, index, self.options.short_generated_names, self.options.hash_length)
 
             transformed_module: ast.Module = ModuleTransformer(
                 self.path,
-                self.imports,
+                imports,
                 argument_import_names,
                 self.name,
-                self.options
+                self.options,
+                attribute_arguments
             ).visit(self.module)
 
             body: list[ast.AST] = []
@@ -291,6 +453,8 @@ class ProcessedModule:
                             keywords=[]
                         )
                     ))
+                elif self.options.export_dictionary_mode == "module":
+                    body.extend(self._module_exports(transformed_module))
                 else:
                     body.append(ast.Return(
                         value=ast.Call(
@@ -318,7 +482,7 @@ class ProcessedModule:
                 args=ast.arguments(
                     posonlyargs=[],
                     args=[ast.arg(arg=item)
-                          for item in argument_import_names],
+                          for item in argument_import_names + list(attribute_arguments.values())],
                     defaults=[],
                     kwargs=[],
                     kw_defaults=[],
@@ -328,19 +492,64 @@ class ProcessedModule:
                 decorator_list=[]
             )
 
-    def generate_evaluated_factory_ast(self, argument_imports: list[str]) -> ast.AST:
+    def is_lazy(self) -> bool:
+        """ whether the module's factory only runs when one of its attributes is first used """
+        if self.options.lazy_modules:
+            return True
+        if not self.name.startswith("built-in:"):
+            return False
+        name = self.name.removeprefix("built-in:")
+        return any(name == item or name.startswith(item + ".")
+                   for item in self.options.lazy_builtins)
+
+    def generate_evaluated_factory_ast(self, argument_imports: list[str], argument_attributes: list[tuple[str, str]] = [], import_paths: list[str] = []) -> ast.AST:
+        """
+        generates the call of the factory with the evaluated factories in
+        `argument_imports`, followed by the `(evaluated factory, attribute)`
+        lookups in `argument_attributes`. `import_paths` are the paths of the
+        modules imported, which profiling reports modules under
+        """
+        arguments: list[ast.expr] = [ast.Name(id=name, ctx=ast.Load())
+                                     for name in argument_imports]
+        arguments.extend(ast.Attribute(
+            value=ast.Name(id=name, ctx=ast.Load()),
+            attr=attribute,
+            ctx=ast.Load()
+        ) for name, attribute in argument_attributes)
+        factory: ast.expr = ast.Name(
+            id=self.name_generator.get_factory(),
+            ctx=ast.Load()
+        )
+        if self.options.profile_imports and self.name != "__main__":
+            # call the profiling helper instead, with the factory and its
+            # imports' arguments after the module's path and its imports' paths
+            arguments = [
+                ast.Constant(value=self.path),
+                ast.Tuple(elts=[ast.Constant(value=path) for path in import_paths],
+                          ctx=ast.Load()),
+                factory,
+                *arguments
+            ]
+            factory = ast.Name(id=PROFILE_HELPER_NAME, ctx=ast.Load())
         if self.name == "__main__":
             return ast.Expr(value=ast.Call(
-                func=ast.Name(
-                    id=self.name_generator.get_factory(),
-                    ctx=ast.Load()
-                ),
-                args=[ast.Name(
-                    id=name,
-                    ctx=ast.Load()
-                ) for name in argument_imports],
+                func=factory,
+                args=arguments,
                 keywords=[]
             ))
+        elif self.is_lazy():
+            # hand the factory and its imports to a proxy which calls it later
+            return ast.Assign(
+                targets=[
+                    ast.Name(
+                        id=self.name_generator.get_evaluated_factory(), ctx=ast.Store())
+                ],
+                value=ast.Call(
+                    func=ast.Name(id=LAZY_HELPER_NAME, ctx=ast.Load()),
+                    args=[factory, *arguments],
+                    keywords=[]
+                )
+            )
         else:
             return ast.Assign(
                 targets=[
@@ -348,15 +557,8 @@ class ProcessedModule:
                         id=self.name_generator.get_evaluated_factory(), ctx=ast.Store())
                 ],
                 value=ast.Call(
-                    func=ast.Name(
-                        id=self.name_generator.get_factory(),
-                        ctx=ast.Load()
-                    ),
-                    args=[
-                        ast.Name(
-                            id=name,
-                            ctx=ast.Load()
-                        ) for name in argument_imports],
+                    func=factory,
+                    args=arguments,
                     keywords=[]
                 )
             )
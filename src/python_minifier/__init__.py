@@ -5,7 +5,12 @@ a 'minified' representation of the same source code.
 """
 
 import ast
+import copy
+import gc
+import random
 import re
+import threading
+import time
 
 from .ast_compare import CompareError, compare_ast
 from .ast_printer import print_ast
@@ -45,6 +50,50 @@ class UnstableMinification(RuntimeError):
         return 'Minification was unstable! Please create an issue at https://github.com/dflook/python-minifier/issues'
 
 
+#: The policies for verifying that minified code parses back into the original module
+VERIFY_POLICIES = ('full', 'sampled', 'deferred', 'off')
+
+
+class MinifyStats(object):
+    """
+    Statistics about the verification of a minified module
+
+    Pass an instance to :func:`minify`, :func:`minify_ast` or :func:`unparse` to fill it in.
+    A deferred verification runs in a background thread, so its statistics and result
+    are only known after :meth:`wait` returns.
+
+    :ivar str verify: The verification policy used
+    :ivar verify_time: Seconds spent verifying, or None if nothing was verified (yet)
+    :type verify_time: float or NoneType
+    :ivar int verified_statements: How many top level statements were compared with the original module
+    :ivar int total_statements: How many top level statements the module has
+
+    """
+
+    def __init__(self):
+        self.verify = None
+        self.verify_time = None
+        self.verified_statements = 0
+        self.total_statements = 0
+        self._thread = None
+        self._error = None
+
+    def wait(self):
+        """
+        Wait for a deferred verification to finish
+
+        :raises UnstableMinification: If the minified code doesn't parse back into the original module
+
+        """
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        if self._error is not None:
+            raise self._error
+
+
 def minify(
     source,
     filename=None,
@@ -64,7 +113,9 @@ def minify(
     remove_debug=False,
     remove_explicit_return_none=True,
     remove_builtin_exception_brackets=True,
-    constant_folding=True
+    constant_folding=True,
+    verify='full',
+    stats=None
 ):
     """
     Minify a python module
@@ -98,6 +149,9 @@ def minify(
     :param bool remove_explicit_return_none: If explicit return None statements should be replaced with a bare return
     :param bool remove_builtin_exception_brackets: If brackets should be removed when raising exceptions with no arguments
     :param bool constant_folding: If literal expressions should be evaluated
+    :param str verify: How the minified code is checked to parse back into the module, see :func:`unparse`
+    :param stats: Filled in with statistics about the verification, required for deferred verification
+    :type stats: MinifyStats or NoneType
 
     :rtype: str
 
@@ -108,6 +162,100 @@ def minify(
     # This will raise if the source file can't be parsed
     module = ast.parse(source, filename)
 
+    minified = minify_ast(
+        module,
+        remove_annotations=remove_annotations,
+        remove_pass=remove_pass,
+        remove_literal_statements=remove_literal_statements,
+        combine_imports=combine_imports,
+        hoist_literals=hoist_literals,
+        rename_locals=rename_locals,
+        preserve_locals=preserve_locals,
+        rename_globals=rename_globals,
+        preserve_globals=preserve_globals,
+        remove_object_base=remove_object_base,
+        convert_posargs_to_args=convert_posargs_to_args,
+        remove_asserts=remove_asserts,
+        remove_debug=remove_debug,
+        remove_explicit_return_none=remove_explicit_return_none,
+        remove_builtin_exception_brackets=remove_builtin_exception_brackets,
+        constant_folding=constant_folding,
+        verify=verify,
+        stats=stats
+    )
+
+    if preserve_shebang is True:
+        shebang_line = _find_shebang(source)
+        if shebang_line is not None:
+            return shebang_line + '\n' + minified
+
+    return minified
+
+
+def minify_ast(
+    module,
+    remove_annotations=RemoveAnnotationsOptions(),
+    remove_pass=True,
+    remove_literal_statements=False,
+    combine_imports=True,
+    hoist_literals=True,
+    rename_locals=True,
+    preserve_locals=None,
+    rename_globals=False,
+    preserve_globals=None,
+    remove_object_base=True,
+    convert_posargs_to_args=True,
+    remove_asserts=False,
+    remove_debug=False,
+    remove_explicit_return_none=True,
+    remove_builtin_exception_brackets=True,
+    constant_folding=True,
+    verify='full',
+    stats=None
+):
+    """
+    Minify a python module from its AST
+
+    This is the same as :func:`minify`, but takes an :class:`ast.Module` instead of source code,
+    so a module which is already parsed (or was built by other tools) isn't unparsed and parsed again.
+    Nodes don't need locations, and may appear more than once in the tree.
+    The module is transformed in place and shouldn't be used afterwards.
+
+    :param module: The module to minify
+    :type module: ast.Module
+
+    :param remove_annotations: Configures the removal of type annotations. True removes all annotations, False removes none. RemoveAnnotationsOptions can be used to configure the removal of specific annotations.
+    :type remove_annotations: bool or RemoveAnnotationsOptions
+    :param bool remove_pass: If Pass statements should be removed where possible
+    :param bool remove_literal_statements: If statements consisting of a single literal should be removed, including docstrings
+    :param bool combine_imports: Combine adjacent import statements where possible
+    :param bool hoist_literals: If str and byte literals may be hoisted to the module level where possible.
+    :param bool rename_locals: If local names may be shortened
+    :param preserve_locals: Locals names to leave unchanged when rename_locals is True
+    :type preserve_locals: list[str]
+    :param bool rename_globals: If global names may be shortened
+    :param preserve_globals: Global names to leave unchanged when rename_globals is True
+    :type preserve_globals: list[str]
+    :param bool remove_object_base: If object as a base class may be removed
+    :param bool convert_posargs_to_args: If positional-only arguments will be converted to normal arguments
+    :param bool remove_asserts: If assert statements should be removed
+    :param bool remove_debug: If conditional statements that test '__debug__ is True' should be removed
+    :param bool remove_explicit_return_none: If explicit return None statements should be replaced with a bare return
+    :param bool remove_builtin_exception_brackets: If brackets should be removed when raising exceptions with no arguments
+    :param bool constant_folding: If literal expressions should be evaluated
+    :param str verify: How the minified code is checked to parse back into the module, see :func:`unparse`
+    :param stats: Filled in with statistics about the verification, required for deferred verification
+    :type stats: MinifyStats or NoneType
+
+    :rtype: str
+
+    """
+
+    assert isinstance(module, ast.Module)
+
+    ast.fix_missing_locations(module)
+    _unshare_nodes(module)
+
     add_namespace(module)
 
     if remove_literal_statements:
@@ -172,14 +320,34 @@ def minify(
     if convert_posargs_to_args:
         module = remove_posargs(module)
 
-    minified = unparse(module)
+    return unparse(module, verify=verify, stats=stats)
 
-    if preserve_shebang is True:
-        shebang_line = _find_shebang(source)
-        if shebang_line is not None:
-            return shebang_line + '\n' + minified
 
-    return minified
+def _unshare_nodes(module):
+    """
+    Replace nodes which appear more than once in the module with copies
+
+    Each node is annotated with its parent and namespace, so it can only be in one place.
+    Nodes without fields (like ast.Load) are shared by ast.parse itself, and are left alone.
+    """
+
+    seen = set()
+    stack = [module]
+    while stack:
+        node = stack.pop()
+        for field, value in ast.iter_fields(node):
+            items = value if isinstance(value, list) else [value]
+            for index, item in enumerate(items):
+                if not isinstance(item, ast.AST) or not item._fields:
+                    continue
+                if id(item) in seen:
+                    item = copy.deepcopy(item)
+                    if isinstance(value, list):
+                        value[index] = item
+                    else:
+                        setattr(node, field, item)
+                seen.add(id(item))
+                stack.append(item)
 
 
 def _find_shebang(source):
@@ -199,36 +367,102 @@ def _find_shebang(source):
     return None
 
 
-def unparse(module):
+def unparse(module, verify='full', stats=None, sample_rate=0.1):
     """
     Turn a module AST into python code
 
     This returns an exact representation of the given module,
     such that it can be parsed back into the same AST.
 
+    The code is verified by parsing it and comparing the result with the module, according to `verify`:
+
+    - ``'full'`` compares the whole module
+    - ``'sampled'`` compares a random `sample_rate` of the top level statements, at least one.
+      The whole code is still parsed, so syntax errors are always found.
+    - ``'deferred'`` compares the whole module in a background thread.
+      :meth:`MinifyStats.wait` raises if it failed, so `stats` is required.
+      The module must not be changed until then.
+    - ``'off'`` doesn't verify the code
+
     :param module: The module to turn into python code
     :type: module: :class:`ast.Module`
+    :param str verify: The verification policy, one of :data:`VERIFY_POLICIES`
+    :param stats: Filled in with statistics about the verification
+    :type stats: MinifyStats or NoneType
+    :param float sample_rate: The fraction of top level statements compared by sampled verification
     :rtype: str
 
     """
 
     assert isinstance(module, ast.Module)
 
+    if verify not in VERIFY_POLICIES:
+        raise ValueError('verify must be one of ' + ', '.join(VERIFY_POLICIES))
+    if verify == 'deferred' and stats is None:
+        raise ValueError('deferred verification needs a MinifyStats to wait for')
+
+    if stats is None:
+        stats = MinifyStats()
+    stats.verify = verify
+    stats.total_statements = len(module.body)
+
     printer = ModulePrinter()
     printer(module)
+    code = printer.code
 
-    try:
-        minified_module = ast.parse(
-            printer.code, 'python_minifier.unparse output')
-    except SyntaxError as syntax_error:
-        raise UnstableMinification(syntax_error, '', printer.code)
+    if verify == 'full':
+        _verify(module, code, stats)
+    elif verify == 'sampled':
+        _verify(module, code, stats, sample_rate)
+    elif verify == 'deferred':
+        stats._thread = threading.Thread(target=_verify_deferred, args=(module, code, stats), daemon=True)
+        stats._thread.start()
+
+    return code
 
-    try:
-        compare_ast(module, minified_module)
-    except CompareError as compare_error:
-        raise UnstableMinification(compare_error, '', printer.code)
 
-    return printer.code
+def _verify(module, code, stats, sample_rate=None, pause_gc=True):
+    """
+    Check that code parses back into module, comparing a sample of its top level statements if sample_rate is given
+    """
+
+    start = time.perf_counter()
+    # verifying creates a lot of objects without reference cycles, which would
+    # trigger many useless garbage collections of everything already allocated.
+    # the collector is process-wide, so it's only paused while the caller waits
+    gc_enabled = pause_gc and gc.isenabled()
+    if gc_enabled:
+        gc.disable()
+    try:
+        try:
+            minified_module = ast.parse(code, 'python_minifier.unparse output')
+        except SyntaxError as syntax_error:
+            raise UnstableMinification(syntax_error, '', code)
+
+        try:
+            if sample_rate is None or len(module.body) != len(minified_module.body):
+                compare_ast(module, minified_module)
+                stats.verified_statements = len(module.body)
+            else:
+                count = min(len(module.body), max(1, round(len(module.body) * sample_rate)))
+                for index in random.sample(range(len(module.body)), count):
+                    compare_ast(module.body[index], minified_module.body[index])
+                stats.verified_statements = count
+        except CompareError as compare_error:
+            raise UnstableMinification(compare_error, '', code)
+    finally:
+        if gc_enabled:
+            gc.enable()
+        stats.verify_time = time.perf_counter() - start
+
+
+def _verify_deferred(module, code, stats):
+    try:
+        # other threads keep running while this one verifies
+        _verify(module, code, stats, pause_gc=False)
+    except Exception as error:
+        # raised by MinifyStats.wait in the thread waiting for the result
+        stats._error = error
 
 
 def awslambda(source, filename=None, entrypoint=None):
@@ -1,5 +1,5 @@
 import ast
-from typing import Any, AnyStr, List, Optional, Text, Union
+from typing import Any, AnyStr, List, Optional, Text, Tuple, Union
 
 from .remove_annotations_options import \
     RemoveAnnotationsOptions as RemoveAnnotationsOptions
@@ -9,6 +9,19 @@ class UnstableMinification(RuntimeError):
     def __init__(self, exception: Any, source: Any, minified: Any): ...
 
 
+VERIFY_POLICIES: Tuple[Text, ...]
+
+
+class MinifyStats:
+    verify: Optional[Text]
+    verify_time: Optional[float]
+    verified_statements: int
+    total_statements: int
+
+    def __init__(self) -> None: ...
+    def wait(self) -> None: ...
+
+
 def minify(
     source: AnyStr,
     filename: Optional[str] = ...,
@@ -28,11 +41,41 @@ def minify(
     remove_debug: bool = ...,
     remove_explicit_return_none: bool = ...,
     remove_builtin_exception_brackets: bool = ...,
-    constant_folding: bool = ...
+    constant_folding: bool = ...,
+    verify: Text = ...,
+    stats: Optional[MinifyStats] = ...
+) -> Text: ...
+
+
+def minify_ast(
+    module: ast.Module,
+    remove_annotations: Union[bool, RemoveAnnotationsOptions] = ...,
+    remove_pass: bool = ...,
+    remove_literal_statements: bool = ...,
+    combine_imports: bool = ...,
+    hoist_literals: bool = ...,
+    rename_locals: bool = ...,
+    preserve_locals: Optional[List[Text]] = ...,
+    rename_globals: bool = ...,
+    preserve_globals: Optional[List[Text]] = ...,
+    remove_object_base: bool = ...,
+    convert_posargs_to_args: bool = ...,
+    remove_asserts: bool = ...,
+    remove_debug: bool = ...,
+    remove_explicit_return_none: bool = ...,
+    remove_builtin_exception_brackets: bool = ...,
+    constant_folding: bool = ...,
+    verify: Text = ...,
+    stats: Optional[MinifyStats] = ...
 ) -> Text: ...
 
 
-def unparse(module: ast.Module) -> Text: ...
+def unparse(
+    module: ast.Module,
+    verify: Text = ...,
+    stats: Optional[MinifyStats] = ...,
+    sample_rate: float = ...
+) -> Text: ...
 
 
 def awslambda(
@@ -50,58 +50,57 @@ def compare_ast(l_ast, r_ast):
     >>> compare_ast(l_ast, r_ast)
 
     If the AST's are not identical, an exception will be raised.
+    Nodes are compared using an explicit stack, so the trees can be deeper than the recursion limit.
 
     """
 
-    def counter():
-        i = 0
-        while True:
-            yield i
-            i += 1
+    stack = [(l_ast, r_ast)]
+    while stack:
+        l_ast, r_ast = stack.pop()
 
-    if type(l_ast) != type(r_ast):
-        raise CompareError(
-            l_ast, r_ast, msg='Nodes do not match! %r != %r' % (l_ast, r_ast))
+        if type(l_ast) != type(r_ast):
+            raise CompareError(
+                l_ast, r_ast, msg='Nodes do not match! %r != %r' % (l_ast, r_ast))
 
-    for field in set(l_ast._fields + r_ast._fields):
+        for field in set(l_ast._fields + r_ast._fields):
 
-        if field == 'kind' and isinstance(l_ast, ast.Constant):
-            continue
+            if field == 'kind' and isinstance(l_ast, ast.Constant):
+                continue
 
-        if isinstance(getattr(l_ast, field, None), list):
+            if isinstance(getattr(l_ast, field, None), list):
 
-            l_list = getattr(l_ast, field, None)
-            r_list = getattr(r_ast, field, None)
+                l_list = getattr(l_ast, field, None)
+                r_list = getattr(r_ast, field, None)
 
-            if len(l_list) != len(r_list):
-                raise CompareError(
-                    l_list,
-                    r_list,
-                    'List does not have the same number of elements! len(%s.%s)=%r, len(%s.%s)=%r'
-                    % (type(l_ast), field, len(l_list), type(r_ast), field, len(r_list)),
-                )
+                if len(l_list) != len(r_list):
+                    raise CompareError(
+                        l_list,
+                        r_list,
+                        'List does not have the same number of elements! len(%s.%s)=%r, len(%s.%s)=%r'
+                        % (type(l_ast), field, len(l_list), type(r_ast), field, len(r_list)),
+                    )
+
+                for i, l, r in zip(range(len(l_list)), l_list, r_list):
+                    if isinstance(l, ast.AST) or isinstance(r, ast.AST):
+                        stack.append((l, r))
+                    elif l != r:
+                        raise CompareError(
+                            l_ast,
+                            r_ast,
+                            'Fields do not match! %s.%s[%i]=%r, %s.%s[%i]=%r'
+                            % (type(l_ast), field, i, l, type(r_ast), field, i, r),
+                        )
+
+            else:
+                l = getattr(l_ast, field, None)
+                r = getattr(r_ast, field, None)
 
-            for i, l, r in zip(counter(), l_list, r_list):
                 if isinstance(l, ast.AST) or isinstance(r, ast.AST):
-                    compare_ast(l, r)
+                    stack.append((l, r))
                 elif l != r:
                     raise CompareError(
                         l_ast,
                         r_ast,
-                        'Fields do not match! %s.%s[%i]=%r, %s.%s[%i]=%r'
-                        % (type(l_ast), field, i, l, type(r_ast), field, i, r),
+                        'Fields do not match! %s.%s=%r, %s.%s=%r' % (
+                            type(l_ast), field, l, type(r_ast), field, r),
                     )
-
-        else:
-            l = getattr(l_ast, field, None)
-            r = getattr(r_ast, field, None)
-
-            if isinstance(l, ast.AST) or isinstance(r, ast.AST):
-                compare_ast(l, r)
-            elif l != r:
-                raise CompareError(
-                    l_ast,
-                    r_ast,
-                    'Fields do not match! %s.%s=%r, %s.%s=%r' % (
-                        type(l_ast), field, l, type(r_ast), field, r),
-                )
@@ -231,7 +231,7 @@ class FormattedValue(ExpressionPrinter):
 
     def _finalize(self):
         self.candidates = [x + str(self.printer) for x in self.candidates]
-        self.printer._code = ''
+        self.printer.clear()
 
     def _append(self, candidates):
         self._finalize()
@@ -2,7 +2,7 @@ import ast
 import sys
 
 from .expression_printer import ExpressionPrinter
-from .token_printer import Delimiter
+from .token_printer import Delimiter, TokenPrinter
 from .util import is_ast_node
 
 
@@ -11,9 +11,15 @@ class ModulePrinter(ExpressionPrinter):
     Builds the smallest possible exact representation of an ast
     """
 
-    def __init__(self, indent_char='\t'):
+    def __init__(self, indent_char='\t', file=None):
+        """
+        :param indent_char: The character to indent blocks with
+        :param file: If given, a text file the code is written to as it's generated instead of being returned
+        """
+
         super(ModulePrinter, self).__init__()
         self.indent_char = indent_char
+        self.printer = TokenPrinter(file=file)
 
     def __call__(self, module):
         """
@@ -28,11 +34,14 @@ class ModulePrinter(ExpressionPrinter):
         assert isinstance(module, ast.Module)
 
         self.visit_Module(module)
-        return str(self.printer).rstrip('\n' + self.indent_char + ';')
+        self.printer.rstrip('\n' + self.indent_char + ';')
+        self.printer.flush()
+        return str(self.printer)
 
     @property
     def code(self):
-        return str(self.printer).rstrip('\n' + self.indent_char + ';')
+        self.printer.rstrip('\n' + self.indent_char + ';')
+        return str(self.printer)
 
     # region Simple Statements
 
@@ -4,114 +4,116 @@ For each node in an AST set the namespace to use for name binding and resolution
 
 import ast
 
+from ..util import child_nodes
 from .util import is_ast_node, is_namespace
 
 
-def add_parent_to_arguments(arguments, func):
+def add_parent_to_arguments(arguments, func, children):
     arguments.parent = func
     arguments.namespace = func
 
     for arg in getattr(arguments, 'posonlyargs', []) + arguments.args:
-        add_parent(arg, arguments, func)
+        children.append((arg, arguments, func))
         if hasattr(arg, 'annotation') and arg.annotation is not None:
-            add_parent(arg.annotation, arguments, func.namespace)
+            children.append((arg.annotation, arguments, func.namespace))
 
     if hasattr(arguments, 'kwonlyargs'):
         for arg in arguments.kwonlyargs:
-            add_parent(arg, arguments, func)
+            children.append((arg, arguments, func))
             if arg.annotation is not None:
-                add_parent(arg.annotation, arguments, func.namespace)
+                children.append((arg.annotation, arguments, func.namespace))
 
         for node in arguments.kw_defaults:
             if node is not None:
-                add_parent(node, arguments, func.namespace)
+                children.append((node, arguments, func.namespace))
 
     for node in arguments.defaults:
-        add_parent(node, arguments, func.namespace)
+        children.append((node, arguments, func.namespace))
 
     if arguments.vararg:
         if hasattr(arguments, 'varargannotation') and arguments.varargannotation is not None:
-            add_parent(arguments.varargannotation, arguments, func.namespace)
+            children.append((arguments.varargannotation, arguments, func.namespace))
         elif isinstance(arguments.vararg, str):
             pass
         else:
-            add_parent(arguments.vararg, arguments, func)
+            children.append((arguments.vararg, arguments, func))
 
     if arguments.kwarg:
         if hasattr(arguments, 'kwargannotation') and arguments.kwargannotation is not None:
-            add_parent(arguments.kwargannotation, arguments, func.namespace)
+            children.append((arguments.kwargannotation, arguments, func.namespace))
         elif isinstance(arguments.kwarg, str):
             pass
         else:
-            add_parent(arguments.kwarg, arguments, func)
+            children.append((arguments.kwarg, arguments, func))
 
 
-def add_parent_to_functiondef(functiondef):
+def add_parent_to_functiondef(functiondef, children):
     """
     Add correct parent and namespace attributes to functiondef nodes
+
+    The (node, parent, namespace) of each child is appended to children
     """
 
     if functiondef.args is not None:
-        add_parent_to_arguments(functiondef.args, func=functiondef)
+        add_parent_to_arguments(functiondef.args, func=functiondef, children=children)
 
     for node in functiondef.body:
-        add_parent(node, parent=functiondef, namespace=functiondef)
+        children.append((node, functiondef, functiondef))
 
     for node in functiondef.decorator_list:
-        add_parent(node, parent=functiondef, namespace=functiondef.namespace)
+        children.append((node, functiondef, functiondef.namespace))
 
     if hasattr(functiondef, 'returns') and functiondef.returns is not None:
-        add_parent(functiondef.returns, parent=functiondef,
-                   namespace=functiondef.namespace)
+        children.append((functiondef.returns, functiondef, functiondef.namespace))
 
 
-def add_parent_to_classdef(classdef):
+def add_parent_to_classdef(classdef, children):
     """
     Add correct parent and namespace attributes to classdef nodes
+
+    The (node, parent, namespace) of each child is appended to children
     """
 
     for node in classdef.bases:
-        add_parent(node, parent=classdef, namespace=classdef.namespace)
+        children.append((node, classdef, classdef.namespace))
 
     if hasattr(classdef, 'keywords'):
         for node in classdef.keywords:
-            add_parent(node, parent=classdef, namespace=classdef.namespace)
+            children.append((node, classdef, classdef.namespace))
 
     if hasattr(classdef, 'starargs') and classdef.starargs is not None:
-        add_parent(classdef.starargs, parent=classdef,
-                   namespace=classdef.namespace)
+        children.append((classdef.starargs, classdef, classdef.namespace))
 
     if hasattr(classdef, 'kwargs') and classdef.kwargs is not None:
-        add_parent(classdef.kwargs, parent=classdef,
-                   namespace=classdef.namespace)
+        children.append((classdef.kwargs, classdef, classdef.namespace))
 
     for node in classdef.body:
-        add_parent(node, parent=classdef, namespace=classdef)
+        children.append((node, classdef, classdef))
 
     for node in classdef.decorator_list:
-        add_parent(node, parent=classdef, namespace=classdef.namespace)
+        children.append((node, classdef, classdef.namespace))
 
 
-def add_parent_to_comprehension(node, namespace):
+def add_parent_to_comprehension(node, namespace, children):
     assert is_ast_node(
         node, (ast.GeneratorExp, 'SetComp', 'DictComp', 'ListComp'))
 
     if hasattr(node, 'elt'):
-        add_parent(node.elt, parent=node, namespace=node)
+        children.append((node.elt, node, node))
     elif hasattr(node, 'key'):
-        add_parent(node.key, parent=node, namespace=node)
-        add_parent(node.value, parent=node, namespace=node)
+        children.append((node.key, node, node))
+        children.append((node.value, node, node))
 
     iter_namespace = namespace
     for generator in node.generators:
         generator.parent = node
         generator.namespace = node
 
-        add_parent(generator.target, parent=generator, namespace=node)
-        add_parent(generator.iter, parent=generator, namespace=iter_namespace)
+        children.append((generator.target, generator, node))
+        children.append((generator.iter, generator, iter_namespace))
         iter_namespace = node
         for if_ in generator.ifs:
-            add_parent(if_, parent=generator, namespace=node)
+            children.append((if_, generator, node))
 
 
 def add_parent(node, parent=None, namespace=None):
@@ -119,6 +121,8 @@ def add_parent(node, parent=None, namespace=None):
     Add a parent attribute to child nodes
     Add a namespace attribute to child nodes
 
+    The tree is walked with an explicit stack, so it can be deeper than the recursion limit.
+
     :param node: The tree to add parent and namespace properties to
     :type node: :class:`ast.AST`
     :param parent: The parent node of this node
@@ -128,6 +132,22 @@ def add_parent(node, parent=None, namespace=None):
 
     """
 
+    stack = [(node, parent, namespace)]
+    while stack:
+        node, parent, namespace = stack.pop()
+        children = []
+        add_parent_to_node(node, parent, namespace, children)
+        # children are visited in order
+        stack.extend(reversed(children))
+
+
+def add_parent_to_node(node, parent, namespace, children):
+    """
+    Add parent and namespace attributes to a node
+
+    The (node, parent, namespace) of each child is appended to children
+    """
+
     node.parent = parent if parent is not None else node
     node.namespace = namespace if namespace is not None else node
 
@@ -137,17 +157,17 @@ def add_parent(node, parent=None, namespace=None):
         node.nonlocal_names = set()
 
         if is_ast_node(node, (ast.FunctionDef, 'AsyncFunctionDef')):
-            add_parent_to_functiondef(node)
+            add_parent_to_functiondef(node, children)
         elif is_ast_node(node, (ast.GeneratorExp, 'SetComp', 'DictComp', 'ListComp')):
-            add_parent_to_comprehension(node, namespace=namespace)
+            add_parent_to_comprehension(node, namespace=namespace, children=children)
         elif isinstance(node, ast.Lambda):
-            add_parent_to_arguments(node.args, func=node)
-            add_parent(node.body, parent=node, namespace=node)
+            add_parent_to_arguments(node.args, func=node, children=children)
+            children.append((node.body, node, node))
         elif isinstance(node, ast.ClassDef):
-            add_parent_to_classdef(node)
+            add_parent_to_classdef(node, children)
         else:
-            for child in ast.iter_child_nodes(node):
-                add_parent(child, parent=node, namespace=node)
+            for child in child_nodes(node):
+                children.append((child, node, node))
 
         return
 
@@ -156,8 +176,8 @@ def add_parent(node, parent=None, namespace=None):
     if is_ast_node(node, 'Nonlocal'):
         namespace.nonlocal_names.update(node.names)
 
-    for child in ast.iter_child_nodes(node):
-        add_parent(child, parent=node, namespace=namespace)
+    for child in child_nodes(node):
+        children.append((child, node, namespace))
 
 
 def add_namespace(module):
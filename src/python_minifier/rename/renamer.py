@@ -1,5 +1,6 @@
 import ast
 
+from ..util import push_child_nodes
 from .binding import NameBinding
 from .name_generator import name_filter
 from .util import is_namespace
@@ -15,13 +16,15 @@ def all_bindings(node):
 
     """
 
-    if is_namespace(node):
-        for binding in node.bindings:
-            yield node, binding
+    stack = [node]
+    while stack:
+        node = stack.pop()
 
-    for child in ast.iter_child_nodes(node):
-        for namespace, binding in all_bindings(child):
-            yield namespace, binding
+        if is_namespace(node):
+            for binding in node.bindings:
+                yield node, binding
+
+        push_child_nodes(stack, node)
 
 
 def sorted_bindings(module):
@@ -34,11 +37,24 @@ def sorted_bindings(module):
 
     """
 
+    return sort_bindings(all_bindings(module))
+
+
+def sort_bindings(bindings):
+    """
+    Sort bindings by descending number of references, keeping the order of bindings with the same number
+
+    :param bindings: The (namespace, binding) pairs to sort
+    :type bindings: Iterable[ast.AST, Binding]
+    :rtype: list[ast.AST, Binding]
+
+    """
+
     def comp(tup):
         namespace, binding = tup
         return binding.new_mention_count()
 
-    return sorted(all_bindings(module), key=comp, reverse=True)
+    return sorted(bindings, key=comp, reverse=True)
 
 
 def reservation_scope(namespace, binding):
@@ -59,8 +75,11 @@ def reservation_scope(namespace, binding):
 
     for node in binding.references:
         while node is not namespace:
-            namespaces.add(node.namespace)
             node = node.namespace
+            if node in namespaces:
+                # The rest of the chain up to the binding's namespace is already in the scope
+                break
+            namespaces.add(node)
 
     return namespaces
 
@@ -74,11 +93,14 @@ def add_assigned(node):
 
     """
 
-    if is_namespace(node):
-        node.assigned_names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
 
-    for child in ast.iter_child_nodes(node):
-        add_assigned(child)
+        if is_namespace(node):
+            node.assigned_names = set()
+
+        push_child_nodes(stack, node)
 
 
 def reserve_name(name, reservation_scope):
@@ -130,29 +152,84 @@ class NameAssigner(object):
 
     Bindings are assigned names in order of most references, with names assigned shortest first.
 
+    Each generated name has an index in the order names are assigned. For each name prefix, the names reserved in a
+    namespace are kept as a bitset of these indices, so the first available name in a reservation scope is the lowest
+    bit not set in any of its namespaces.
+
     """
 
     def __init__(self, name_generator=None):
         self.name_generator = name_generator if name_generator is not None else name_filter()
         self.names = []
 
+        # The namespaces each name has been reserved in
+        self.reservations = {}
+
+        # For each prefix, the index of each prefixed generated name
+        self.indices = {}
+
+        # For each prefix, the bitset of prefixed generated names reserved in each namespace
+        self.occupied = {}
+
     def iter_names(self):
         for name in self.names:
             yield name
 
         while True:
-            name = next(self.name_generator)
-            self.names.append(name)
-            yield name
+            yield self.add_name()
+
+    def add_name(self):
+        """
+        Generate the next name, marking it as reserved in the namespaces that already reserved it
+        """
+
+        name = next(self.name_generator)
+        self.names.append(name)
+
+        for prefix in self.indices:
+            self.index_name(prefix, len(self.names) - 1)
+
+        return name
+
+    def index_name(self, prefix, index):
+        name = prefix + self.names[index]
+        self.indices[prefix][name] = index
+
+        occupied = self.occupied[prefix]
+        for namespace in self.reservations.get(name, []):
+            occupied[namespace] = occupied.get(namespace, 0) | (1 << index)
+
+    def add_prefix(self, prefix):
+        self.indices[prefix] = {}
+        self.occupied[prefix] = {}
+
+        for index in range(len(self.names)):
+            self.index_name(prefix, index)
 
     def available_name(self, reservation_scope, prefix=''):
         """
         Search for the first name that is not in reservation scope
         """
 
-        for name in self.iter_names():
-            if self.is_available(prefix + name, reservation_scope):
-                return prefix + name
+        if prefix not in self.indices:
+            self.add_prefix(prefix)
+
+        occupied = self.occupied[prefix]
+
+        while True:
+            reserved = 0
+            for namespace in reservation_scope:
+                reserved |= occupied.get(namespace, 0)
+
+            # The lowest unset bit
+            index = (~reserved & (reserved + 1)).bit_length() - 1
+
+            if index < len(self.names):
+                return prefix + self.names[index]
+
+            # Names generated now may already be reserved in the scope, so check again
+            while len(self.names) <= index:
+                self.add_name()
 
     def is_available(self, name, reservation_scope):
         """
@@ -171,20 +248,41 @@ class NameAssigner(object):
 
         return True
 
+    def reserve_name(self, name, reservation_scope):
+        """
+        Reserve a name in a reservation scope
+
+        :param str name: The name to reserve
+        :param reservation_scope:
+        :type reservation_scope: Iterable[:class:`ast.AST`]
+
+        """
+
+        reserve_name(name, reservation_scope)
+        self.reservations.setdefault(name, []).extend(reservation_scope)
+
+        for prefix, indices in self.indices.items():
+            if name in indices:
+                occupied = self.occupied[prefix]
+                bit = 1 << indices[name]
+                for namespace in reservation_scope:
+                    occupied[namespace] = occupied.get(namespace, 0) | bit
+
     def __call__(self, module, prefix_globals, reserved_globals=None):
         assert isinstance(module, ast.Module)
         add_assigned(module)
+        bindings = list(all_bindings(module))
 
-        for namespace, binding in all_bindings(module):
+        for namespace, binding in bindings:
             if binding.reserved is not None:
                 scope = reservation_scope(namespace, binding)
-                reserve_name(binding.reserved, scope)
+                self.reserve_name(binding.reserved, scope)
 
         if reserved_globals is not None:
             for name in reserved_globals:
-                module.assigned_names.add(name)
+                self.reserve_name(name, [module])
 
-        for namespace, binding in sorted_bindings(module):
+        for namespace, binding in sort_bindings(bindings):
             scope = reservation_scope(namespace, binding)
 
             if binding.allow_rename:
@@ -221,7 +319,7 @@ class NameAssigner(object):
                     binding.disallow_rename()
 
             if binding.name is not None:
-                reserve_name(binding.name, scope)
+                self.reserve_name(binding.name, scope)
 
         return module
 
@@ -1,38 +1,44 @@
 import ast
 
+from ..util import push_child_nodes
 from .binding import BuiltinBinding, NameBinding
 from .util import (builtins, get_global_namespace, get_nonlocal_namespace,
                    is_ast_node)
 
 
 def get_binding(name, namespace):
-    if name in namespace.global_names and not isinstance(namespace, ast.Module):
-        return get_binding(name, get_global_namespace(namespace))
-    elif name in namespace.nonlocal_names and not isinstance(namespace, ast.Module):
-        return get_binding(name, get_nonlocal_namespace(namespace))
+    while not isinstance(namespace, ast.Module):
+        if name in namespace.global_names:
+            namespace = get_global_namespace(namespace)
+            continue
+        elif name in namespace.nonlocal_names:
+            namespace = get_nonlocal_namespace(namespace)
+            continue
+
+        for binding in namespace.bindings:
+            if binding.name == name:
+                return binding
+
+        namespace = get_nonlocal_namespace(namespace)
 
     for binding in namespace.bindings:
         if binding.name == name:
             return binding
 
-    if not isinstance(namespace, ast.Module):
-        return get_binding(name, get_nonlocal_namespace(namespace))
+    # This is unresolved at global scope - is it a builtin?
+    if name in dir(builtins):
+        if name in ['exec', 'eval', 'locals', 'globals', 'vars']:
+            namespace.tainted = True
 
-    else:
-        # This is unresolved at global scope - is it a builtin?
-        if name in dir(builtins):
-            if name in ['exec', 'eval', 'locals', 'globals', 'vars']:
-                namespace.tainted = True
+        binding = BuiltinBinding(name, namespace)
+        namespace.bindings.append(binding)
+        return binding
 
-            binding = BuiltinBinding(name, namespace)
-            namespace.bindings.append(binding)
-            return binding
-
-        else:
-            binding = NameBinding(name)
-            binding.disallow_rename()
-            namespace.bindings.append(binding)
-            return binding
+    else:
+        binding = NameBinding(name)
+        binding.disallow_rename()
+        namespace.bindings.append(binding)
+        return binding
 
 
 def resolve_names(node):
@@ -44,6 +50,18 @@ def resolve_names(node):
 
     """
 
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        resolve_node_names(node)
+        push_child_nodes(stack, node)
+
+
+def resolve_node_names(node):
+    """
+    Resolve the names a single node references
+    """
+
     if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
         get_binding(node.id, node.namespace).add_reference(node)
     elif isinstance(node, ast.Name) and node.id in node.namespace.nonlocal_names:
@@ -83,6 +101,3 @@ def resolve_names(node):
 
     elif is_ast_node(node, 'Exec'):
         get_global_namespace(node).tainted = True
-
-    for child in ast.iter_child_nodes(node):
-        resolve_names(child)
@@ -1,7 +1,7 @@
 import ast
 import sys
 
-from ..util import is_ast_node
+from ..util import is_ast_node, push_child_nodes
 
 
 def create_is_namespace():
@@ -32,10 +32,10 @@ def get_global_namespace(node):
 
     """
 
-    if node.namespace is node:
-        return node
+    while node.namespace is not node:
+        node = node.namespace
 
-    return get_global_namespace(node.namespace)
+    return node
 
 
 def get_nonlocal_namespace(node):
@@ -45,8 +45,8 @@ def get_nonlocal_namespace(node):
     The nonlocal namespace is the closest parent function scope's namespace.
     """
 
-    if isinstance(node.namespace, ast.ClassDef):
-        return get_nonlocal_namespace(node.namespace)
+    while isinstance(node.namespace, ast.ClassDef):
+        node = node.namespace
 
     return node.namespace
 
@@ -134,15 +134,18 @@ def allow_rename_locals(node, rename_locals, preserve_locals=None):
     if preserve_locals is None:
         preserve_locals = []
 
-    if not isinstance(node, ast.Module) and is_namespace(node):
-        for binding in node.bindings:
-            if rename_locals is False:
-                binding.disallow_rename()
-            elif binding.name in preserve_locals:
-                binding.disallow_rename()
+    stack = [node]
+    while stack:
+        node = stack.pop()
 
-    for child in ast.iter_child_nodes(node):
-        allow_rename_locals(child, rename_locals, preserve_locals)
+        if not isinstance(node, ast.Module) and is_namespace(node):
+            for binding in node.bindings:
+                if rename_locals is False:
+                    binding.disallow_rename()
+                elif binding.name in preserve_locals:
+                    binding.disallow_rename()
+
+        push_child_nodes(stack, node)
 
 
 def find__all__(module):
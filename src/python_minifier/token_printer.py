@@ -3,6 +3,9 @@
 import re
 import sys
 
+# how many fragments of code to keep before writing them to the file
+FLUSH_CHUNKS = 4096
+
 class TokenTypes(object):
     NoToken = 0
     Identifier = 1
@@ -79,23 +82,54 @@ class TokenPrinter(object):
     Concatenates terminal symbols of the python grammar
     """
 
-    def __init__(self, prefer_single_line=False, allow_invalid_num_warnings=False):
+    def __init__(self, prefer_single_line=False, allow_invalid_num_warnings=False, file=None):
         """
         :param prefer_single_line: If True, chooses to put as much code as possible on a single line.
         :param allow_invalid_num_warnings: If True, allows invalid number literals to be printe that may cause warnings.
+        :param file: If given, a text file the code is written to as complete lines are printed, instead of being kept in memory. Call flush() when done.
         """
 
         self._prefer_single_line = prefer_single_line
         self._allow_invalid_num_warnings = allow_invalid_num_warnings
 
-        self._code = ''
+        # the code is kept as a list of non-empty fragments, since appending to
+        # a string copies it. only the end of the code is ever changed
+        self._chunks = []
+        self._file = file
+        self._written = False
         self.indent = 0
         self.unicode_literals = False
         self.previous_token = TokenTypes.NoToken
 
     def __str__(self):
-        """Return the output code."""
-        return self._code
+        """Return the output code, or the part of it not written to the file yet."""
+        if len(self._chunks) > 1:
+            self._chunks = [''.join(self._chunks)]
+        return self._chunks[0] if self._chunks else ''
+
+    def _add(self, s):
+        if s:
+            self._chunks.append(s)
+
+    def clear(self):
+        """Discard the output code not written to the file yet."""
+        self._chunks = []
+
+    def rstrip(self, chars):
+        """Remove any of the characters in chars from the end of the output code."""
+        while self._chunks:
+            stripped = self._chunks[-1].rstrip(chars)
+            if stripped:
+                self._chunks[-1] = stripped
+                return
+            self._chunks.pop()
+
+    def flush(self):
+        """Write the output code to the file."""
+        if self._file is not None and self._chunks:
+            self._file.write(''.join(self._chunks))
+            self._chunks = []
+            self._written = True
 
     def identifier(self, name):
         """Add an identifier to the output code."""
@@ -104,7 +138,7 @@ class TokenPrinter(object):
         if self.previous_token in [TokenTypes.Identifier, TokenTypes.Keyword, TokenTypes.SoftKeyword, TokenTypes.NumberLiteral]:
             self.delimiter(' ')
 
-        self._code += name
+        self._add(name)
         self.previous_token = TokenTypes.Identifier
 
     def keyword(self, kw):
@@ -123,7 +157,7 @@ class TokenPrinter(object):
         if self.previous_token in [TokenTypes.Identifier, TokenTypes.Keyword, TokenTypes.SoftKeyword, TokenTypes.NumberLiteral]:
             self.delimiter(' ')
 
-        self._code += kw
+        self._add(kw)
 
         if kw in ['_', 'case', 'match']:
             self.previous_token = TokenTypes.SoftKeyword
@@ -145,7 +179,7 @@ class TokenPrinter(object):
         if len(s) > 0 and s[0].isalpha() and self.previous_token in [TokenTypes.Identifier, TokenTypes.Keyword, TokenTypes.SoftKeyword]:
             self.delimiter(' ')
 
-        self._code += s
+        self._add(s)
         self.previous_token = TokenTypes.NonNumberLiteral
 
     def bytesliteral(self, value):
@@ -155,7 +189,7 @@ class TokenPrinter(object):
         if len(s) > 0 and s[0].isalpha() and self.previous_token in [TokenTypes.Identifier, TokenTypes.Keyword, TokenTypes.SoftKeyword]:
             self.delimiter(' ')
 
-        self._code += s
+        self._add(s)
         self.previous_token = TokenTypes.NonNumberLiteral
 
     def fstring(self, s):
@@ -165,7 +199,7 @@ class TokenPrinter(object):
         if self.previous_token in [TokenTypes.Identifier, TokenTypes.Keyword, TokenTypes.SoftKeyword]:
             self.delimiter(' ')
 
-        self._code += s
+        self._add(s)
         self.previous_token = TokenTypes.NonNumberLiteral
 
     def delimiter(self, d):
@@ -178,7 +212,7 @@ class TokenPrinter(object):
             '`'
         ]
 
-        self._code += d
+        self._add(d)
         self.previous_token = TokenTypes.Delimiter
 
     def operator(self, o):
@@ -189,7 +223,7 @@ class TokenPrinter(object):
             '<', '>', '<=', '>=', '==', '!='
         ]
 
-        self._code += o
+        self._add(o)
         self.previous_token = TokenTypes.Operator
 
     def integer(self, v):
@@ -203,7 +237,7 @@ class TokenPrinter(object):
         elif self.previous_token in [TokenTypes.Identifier, TokenTypes.Keyword]:
             self.delimiter(' ')
 
-        self._code += h if len(h) < len(s) else s
+        self._add(h if len(h) < len(s) else s)
 
         self.previous_token = TokenTypes.NumberLiteral
 
@@ -223,7 +257,7 @@ class TokenPrinter(object):
         elif self.previous_token in [TokenTypes.Identifier, TokenTypes.Keyword]:
             self.delimiter(' ')
 
-        self._code += s
+        self._add(s)
 
         self.previous_token = TokenTypes.NumberLiteral
 
@@ -255,18 +289,20 @@ class TokenPrinter(object):
         elif self.previous_token in [TokenTypes.Identifier, TokenTypes.Keyword]:
             self.delimiter(' ')
 
-        self._code += s
+        self._add(s)
 
         self.previous_token = TokenTypes.NumberLiteral
 
     def newline(self):
         """ Add a newline to the code. """
-        if self._code == '':
+        if not self._chunks and not self._written:
             return
 
-        self._code = self._code.rstrip('\n\t;')
-        self._code += '\n'
-        self._code += '\t' * self.indent
+        self.rstrip('\n\t;')
+        if self._file is not None and len(self._chunks) >= FLUSH_CHUNKS:
+            # nothing before a newline is changed after it's added
+            self.flush()
+        self._add('\n' + '\t' * self.indent)
 
         self.previous_token = TokenTypes.NewLine
 
@@ -286,12 +322,12 @@ class TokenPrinter(object):
         if self.indent == 0:
             self.newline()
         else:
-            if self._code[-1] != ';':
-                self._code += ';'
+            if not self._chunks or self._chunks[-1][-1] != ';':
+                self._add(';')
 
         self.previous_token = TokenTypes.EndStatement
 
     def append(self, code, token_type):
         """ Append arbitrary string to the output."""
-        self._code += code
+        self._add(code)
         self.previous_token = token_type
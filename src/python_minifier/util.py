@@ -1,5 +1,49 @@
 import ast
 
+
+def child_nodes(node):
+    """
+    The direct child nodes of a node, in the same order as :func:`ast.iter_child_nodes`
+
+    :type node: ast.AST
+    :rtype: list[ast.AST]
+
+    """
+
+    children = []
+    for field in node._fields:
+        value = getattr(node, field, None)
+        if isinstance(value, list):
+            for item in value:
+                if isinstance(item, ast.AST):
+                    children.append(item)
+        elif isinstance(value, ast.AST):
+            children.append(value)
+    return children
+
+
+def push_child_nodes(stack, node):
+    """
+    Push the direct child nodes of a node onto a stack, so they are popped in order
+
+    This is how the passes walk trees without recursing, so trees can be deeper than the recursion limit.
+
+    :param stack: The stack of nodes to visit
+    :type stack: list[ast.AST]
+    :type node: ast.AST
+
+    """
+
+    for field in reversed(node._fields):
+        value = getattr(node, field, None)
+        if isinstance(value, list):
+            for item in reversed(value):
+                if isinstance(item, ast.AST):
+                    stack.append(item)
+        elif isinstance(value, ast.AST):
+            stack.append(value)
+
+
 def is_ast_node(node, types):
     """
     Is a node one of the specified node types
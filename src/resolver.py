@@ -0,0 +1,171 @@
+import importlib.machinery
+import os
+import sys
+import tempfile
+import unittest
+
+BUILTIN_ORIGIN = "built-in"
+
+# directory entry name -> whether it's a directory
+DirectoryListing = dict[str, bool]
+
+
+class ModuleResolver:
+    """
+    Finds the file a module would be imported from without importing anything.
+
+    This follows what the default path-based import system does: the
+    importing file's directory is searched first, then the rest of `sys.path`
+    (as it was when the resolver was created), preferring packages over
+    modules and modules over namespace packages. Standard library and
+    built-in modules are recognized by name before touching the filesystem,
+    and extension modules are treated like built-in ones since there's no
+    source to inline.
+
+    Every directory is listed at most once and every resolution (including
+    failed ones) is remembered, so call `invalidate` when files may have
+    been added or removed since.
+    """
+    search_path: list[str]
+    listings: dict[str, DirectoryListing | None]
+    resolutions: dict[tuple[str, str], str | None]
+
+    def __init__(self, search_path: list[str] | None = None) -> None:
+        # the first entry of `sys.path` is the compiler's own directory, which
+        # is replaced by the importing file's directory
+        self.search_path = [self._absolute(entry) for entry in (
+            search_path if search_path is not None else sys.path[1:])]
+        self.listings = {}
+        self.resolutions = {}
+
+    def invalidate(self) -> None:
+        """ forgets all directory listings and resolutions """
+        self.listings.clear()
+        self.resolutions.clear()
+
+    def resolve(self, module: str, context_path: str) -> str | None:
+        """
+        returns the path of the source of `module` imported from
+        `context_path`, "built-in" for modules without source, or None if it
+        can't be found
+        """
+        top_level = module.partition(".")[0]
+        if top_level in sys.stdlib_module_names or top_level in sys.builtin_module_names:
+            return BUILTIN_ORIGIN
+        key = (module, os.path.dirname(context_path))
+        if key not in self.resolutions:
+            self.resolutions[key] = self._find(
+                module.split("."), [key[1]] + self.search_path)
+        return self.resolutions[key]
+
+    def _find(self, parts: list[str], search_path: list[str]) -> str | None:
+        for i, part in enumerate(parts):
+            is_last = i == len(parts) - 1
+            namespace_portions: list[str] = []
+            package_path = None
+            for entry in search_path:
+                listing = self._listing(entry)
+                if listing is None:
+                    continue
+                if listing.get(part, False):
+                    directory = os.path.join(entry, part)
+                    init = self._find_file(directory, "__init__")
+                    if init is not None:
+                        if is_last:
+                            return init
+                        package_path = [directory]
+                        break
+                    namespace_portions.append(directory)
+                found = self._find_file(entry, part)
+                if found is not None:
+                    # submodules can't be imported from a plain module
+                    return found if is_last else None
+            if package_path is not None:
+                search_path = package_path
+            elif len(namespace_portions) > 0 and not is_last:
+                search_path = namespace_portions
+            else:
+                # either not found or a namespace package, which has no source
+                return None
+        return None
+
+    def _find_file(self, directory: str, name: str) -> str | None:
+        listing = self._listing(directory)
+        if listing is None:
+            return None
+        for suffix in importlib.machinery.EXTENSION_SUFFIXES:
+            if listing.get(name + suffix) is False:
+                return BUILTIN_ORIGIN
+        for suffix in importlib.machinery.SOURCE_SUFFIXES:
+            if listing.get(name + suffix) is False:
+                return os.path.join(directory, name + suffix)
+        return None
+
+    def _listing(self, directory: str) -> DirectoryListing | None:
+        if directory not in self.listings:
+            try:
+                with os.scandir(directory) as entries:
+                    listing: DirectoryListing | None = {}
+                    for entry in entries:
+                        try:
+                            listing[entry.name] = entry.is_dir()  # type: ignore
+                        except OSError:
+                            listing[entry.name] = False  # type: ignore
+            except OSError:
+                # doesn't exist, isn't a directory or can't be read
+                listing = None
+            self.listings[directory] = listing
+        return self.listings[directory]
+
+    @staticmethod
+    def _absolute(entry: str) -> str:
+        if entry in ("", "."):
+            return os.getcwd()
+        return entry if os.path.isabs(entry) else os.path.join(os.getcwd(), entry)
+
+
+class ModuleResolverTestMethods(unittest.TestCase):
+    def _make_files(self, directory: str, paths: list[str]):
+        for path in paths:
+            path = os.path.join(directory, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, "w").close()
+
+    def test_packages(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self._make_files(directory, [
+                "pkg/__init__.py", "pkg/mod.py", "ns/mod.py", "both/x.py", "both.py"])
+            resolver = ModuleResolver([])
+            context = os.path.join(directory, "main.py")
+            self.assertEqual(resolver.resolve("pkg", context),
+                             os.path.join(directory, "pkg", "__init__.py"))
+            self.assertEqual(resolver.resolve("pkg.mod", context),
+                             os.path.join(directory, "pkg", "mod.py"))
+            self.assertEqual(resolver.resolve("ns.mod", context),
+                             os.path.join(directory, "ns", "mod.py"))
+            # modules take precedence over namespace packages
+            self.assertEqual(resolver.resolve("both", context),
+                             os.path.join(directory, "both.py"))
+            self.assertIsNone(resolver.resolve("ns", context))
+            self.assertIsNone(resolver.resolve("both.x", context))
+
+    def test_stdlib(self):
+        resolver = ModuleResolver([])
+        self.assertEqual(resolver.resolve(
+            "os.path", "/nonexistent/main.py"), BUILTIN_ORIGIN)
+        self.assertEqual(len(resolver.listings), 0)
+
+    def test_invalidate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            resolver = ModuleResolver([])
+            context = os.path.join(directory, "main.py")
+            self.assertIsNone(resolver.resolve("mod", context))
+            self._make_files(directory, ["mod.py"])
+            self.assertIsNone(resolver.resolve("mod", context))
+            resolver.invalidate()
+            self.assertEqual(resolver.resolve("mod", context),
+                             os.path.join(directory, "mod.py"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -41,6 +41,23 @@ class FoundImport:
             return f"__generated_import_{purify_identifier(self.module)}_{id}__"
 
 
+def generate_attribute_identifier(alias: str, attribute: str, index: int, minified: bool, hash_length: int):
+    """
+    names the factory argument bound to `alias.attribute`, the `index`th of
+    its module's attribute arguments
+    """
+    if minified:
+        # arguments are local to their factory, so numbering them per module
+        # keeps the names the same between builds. unlike import arguments
+        # these are used in class bodies, so they need to end in "__" not to
+        # be mangled
+        return f"__{index}__"
+    else:
+        id = hashlib.md5(f"{alias}.{attribute}".encode(),
+                         usedforsecurity=False).hexdigest()[:hash_length]
+        return f"__generated_attribute_{alias}_{attribute}_{id}__"
+
+
 class ImportVisitor(ast.NodeVisitor):
     imports: list[FoundImport]
     context_path: str
@@ -86,13 +103,16 @@ class ModuleTransformer(ast.NodeTransformer):
     name: str
     path: str
     options: CompilerOptions
+    # arguments to replace `alias.attribute` loads with
+    attribute_arguments: dict[tuple[str, str], str]
 
-    def __init__(self, path: str, imports: list[FoundImport], argument_import_names: list[str], name: str, options: CompilerOptions) -> None:
+    def __init__(self, path: str, imports: list[FoundImport], argument_import_names: list[str], name: str, options: CompilerOptions, attribute_arguments: dict[tuple[str, str], str] = {}) -> None:
         self.imports = imports
         self.argument_import_names = argument_import_names
         self.name = name
         self.options = options
         self.path = path
+        self.attribute_arguments = attribute_arguments
         super().__init__()
 
     def _resolve_module_argument_identifier(self, module_name: str) -> str:
@@ -114,6 +134,9 @@ class ModuleTransformer(ast.NodeTransformer):
             else:
                 resolved_argument = self._resolve_module_argument_identifier(
                     alias.name)
+                if resolved_argument == (alias.asname if alias.asname is not None else alias.name):
+                    # the argument is already named after the alias
+                    continue
                 output.append(ast.Assign(
                     targets=[
                         ast.Name(
@@ -165,6 +188,12 @@ class ModuleTransformer(ast.NodeTransformer):
             ))
         return [self.generic_visit(item) for item in output]
 
+    def visit_Attribute(self, node: ast.Attribute) -> Any:
+        if (isinstance(node.ctx, ast.Load) and isinstance(node.value, ast.Name)
+                and (node.value.id, node.attr) in self.attribute_arguments):
+            return ast.Name(id=self.attribute_arguments[(node.value.id, node.attr)], ctx=ast.Load())
+        return self.generic_visit(node)
+
     def visit_Name(self, node: ast.Name) -> Any:
         if isinstance(node.ctx, ast.Load):
             if node.id == "__name__":